@@ -0,0 +1,49 @@
+"""Compares the cost of wrapping a boto client with method_decorator (every routine, eagerly) against MethodProxy
+(on first access). No AWS credentials or network access are needed.
+
+Usage: python -m benchmarks.bench_client_wrapping [-n ITERATIONS] [-s SERVICE]
+"""
+
+import timeit
+from argparse import ArgumentParser
+
+from botocore.session import get_session
+
+from summoner.lib.boto import boto_wrapper
+from summoner.lib.decorators import lazy_method_decorator, method_decorator
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark boto client error wrapping.")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("-s", "--service", type=str, default="ec2")
+    args = parser.parse_args()
+
+    session = get_session()
+    session.set_credentials("benchmark", "benchmark")
+
+    def new_client():
+        return session.create_client(args.service, region_name="us-east-1")
+
+    clients = [new_client() for _ in range(args.iterations * 2)]
+
+    def eager():
+        method_decorator(boto_wrapper)(clients.pop())
+
+    def lazy():
+        # Include the first access of the methods a typical Summoner call path uses
+        client = lazy_method_decorator(boto_wrapper)(clients.pop())
+        client.describe_instances
+        client.get_paginator
+
+    eager_s = timeit.timeit(eager, number=args.iterations) / args.iterations
+    lazy_s = timeit.timeit(lazy, number=args.iterations) / args.iterations
+
+    print(f"{args.service} client, {args.iterations} iterations")
+    print(f"  method_decorator (eager): {eager_s * 1e6:10.1f} us/client")
+    print(f"  MethodProxy (lazy):       {lazy_s * 1e6:10.1f} us/client")
+    print(f"  speedup:                  {eager_s / lazy_s:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
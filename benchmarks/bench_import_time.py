@@ -0,0 +1,63 @@
+"""Measures Summoner's CLI startup cost with python -X importtime, in fresh interpreters. Exits non-zero when the
+median cost of importing the CLI entry point exceeds the budget, so it can guard against import regressions.
+
+Usage: python -m benchmarks.bench_import_time [-n RUNS] [-m MODULE] [-b BUDGET_MS] [-t TOP]
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+
+
+def import_times(module: str) -> dict:
+    """Returns the cumulative import time of every module imported by :param:`module`, in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark Summoner CLI import time.")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("-m", "--module", type=str, default="summoner.__main__")
+    parser.add_argument("-b", "--budget", type=float, default=100, help="Median import budget in milliseconds.")
+    parser.add_argument("-t", "--top", type=int, default=10, help="Number of slowest imports to list.")
+    args = parser.parse_args()
+
+    runs = defaultdict(list)
+    for _ in range(args.runs):
+        for name, cumulative in import_times(args.module).items():
+            runs[name].append(cumulative)
+
+    wall_times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "summoner", "--version"], capture_output=True, check=True)
+        wall_times.append(time.perf_counter() - start)
+
+    medians = {name: statistics.median(times) for name, times in runs.items()}
+    total_ms = medians[args.module] / 1000
+
+    print(f"{args.module}, median of {args.runs} runs")
+    print(f"  import:                {total_ms:8.1f} ms (budget {args.budget:.0f} ms)")
+    print(f"  summoner --version:    {statistics.median(wall_times) * 1000:8.1f} ms wall, including interpreter start")
+    print("  slowest imports (cumulative):")
+    slowest = sorted((item for item in medians.items() if item[0] != args.module), key=lambda item: -item[1])
+    for name, cumulative in slowest[: args.top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+    sys.exit(0 if total_ms <= args.budget else 1)
+
+
+if __name__ == "__main__":
+    main()
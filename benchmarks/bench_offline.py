@@ -0,0 +1,226 @@
+"""Benchmarks Summoner end to end against benchmarks.fake_aws and a fake session-manager-plugin, so no AWS account or
+network access is needed. Measures startup, time to connect to running and stopped Instances, reconnect latency after
+a session drops, fleet status checks, and the API calls each makes. Exits non-zero when an API call count grows past
+the baseline in baseline.json. Times depend on the machine that recorded the baseline, so they are only reported
+against it, unless --check-times is given to also fail when they grow by more than the tolerance, e.g. when comparing
+two branches on the same machine.
+
+Usage: python -m benchmarks.bench_offline [-n RUNS] [-s SCENARIO] [-t TOLERANCE] [--check-times] [--update-baseline]
+"""
+
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict
+
+from benchmarks.bench_import_time import import_times
+from benchmarks.fake_aws import FakeCloud
+
+BENCHMARKS_FOLDER = Path(__file__).parent
+BASELINE_FILE = Path(BENCHMARKS_FOLDER, "baseline.json")
+FAKE_PLUGIN_FOLDER = Path(BENCHMARKS_FOLDER, "fake_plugin")
+
+PROFILE = "summoner-benchmark"
+REGIONS = ["us-east-1", "eu-west-1", "ap-southeast-2"]
+
+# Times within this many milliseconds of the baseline never fail, however small the baseline
+SLACK_MS = 25
+
+
+def sandbox(folder: Path):
+    """Points HOME, the AWS config and PATH at :param:`folder` and the fake plugin, so Summoner's state files and the
+    user's AWS profiles are left alone. Must run before Summoner is imported."""
+    Path(folder, "config").write_text(f"[profile {PROFILE}]\nregion = {REGIONS[0]}\n")
+    Path(folder, "credentials").write_text(
+        f"[{PROFILE}]\naws_access_key_id = benchmark\naws_secret_access_key = benchmark\n"
+    )
+    for variable in ["AWS_PROFILE", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"]:
+        os.environ.pop(variable, None)
+    os.environ.update(
+        HOME=str(folder),
+        AWS_CONFIG_FILE=str(Path(folder, "config")),
+        AWS_SHARED_CREDENTIALS_FILE=str(Path(folder, "credentials")),
+        PATH=f"{FAKE_PLUGIN_FOLDER}{os.pathsep}{os.environ['PATH']}",
+    )
+
+
+def new_session(cloud: FakeCloud):
+    from summoner.lib.boto import BotoEnhanced
+
+    boto_session = BotoEnhanced(REGIONS[0], PROFILE)
+    cloud.attach(boto_session)
+    return boto_session
+
+
+def to_instance(fake_instance):
+    from summoner.lib.instance import Instance
+
+    return Instance(fake_instance.name, fake_instance.region, fake_instance.instance_id, "ssh")
+
+
+def time_to_connect(boto_session, instance) -> float:
+    """Returns the seconds from choosing :param:`instance` until its tunnel is ready, as in the connect menu."""
+    from summoner.evocation import Evocation
+    from summoner.util import status_manager
+
+    start = time.perf_counter()
+    if not status_manager(boto_session, instance, connecting=True):
+        raise RuntimeError(f"{instance.name} could not be prepared for connection.")
+    evocation = Evocation(boto_session, instance)
+    try:
+        if not evocation.open():
+            raise RuntimeError(f"The tunnel to {instance.name} did not become ready.")
+        return time.perf_counter() - start
+    finally:
+        evocation.stop()
+
+
+def startup() -> Dict[str, float]:
+    import summoner.lib.boto  # noqa: F401 - Imports are measured separately, in fresh interpreters
+
+    cloud = FakeCloud()
+    start = time.perf_counter()
+    boto_session = new_session(cloud)
+    boto_session.client("ec2", region_name=REGIONS[0])
+    session_ms = (time.perf_counter() - start) * 1000
+    return {
+        "cli_import_ms": import_times("summoner.__main__")["summoner.__main__"] / 1000,
+        "summoner_import_ms": import_times("summoner.summoner")["summoner.summoner"] / 1000,
+        "session_ms": session_ms,
+    }
+
+
+def connect_running() -> Dict[str, float]:
+    cloud = FakeCloud()
+    instance = to_instance(cloud.add_instance("running"))
+    boto_session = new_session(cloud)
+    return {"time_to_connect_ms": time_to_connect(boto_session, instance) * 1000, "api_calls": cloud.calls.total()}
+
+
+def connect_stopped() -> Dict[str, float]:
+    import summoner.util
+
+    cloud = FakeCloud()
+    instance = to_instance(cloud.add_instance("stopped", state="stopped"))
+    boto_session = new_session(cloud)
+
+    # The fixed wait for the SSM agent after boot would dwarf everything else, so it is left out
+    boot_grace, summoner.util.BOOT_GRACE = summoner.util.BOOT_GRACE, 0
+    try:
+        elapsed = time_to_connect(boto_session, instance)
+    finally:
+        summoner.util.BOOT_GRACE = boot_grace
+    return {"time_to_connect_ms": elapsed * 1000, "api_calls": cloud.calls.total()}
+
+
+def reconnect() -> Dict[str, float]:
+    from summoner.evocation import Evocation
+
+    cloud = FakeCloud()
+    instance = to_instance(cloud.add_instance("flaky", session_lifetime=1))
+    boto_session = new_session(cloud)
+
+    evocation = Evocation(boto_session, instance)
+    try:
+        if not evocation.open():
+            raise RuntimeError("The tunnel did not become ready.")
+        deadline = time.monotonic() + 30
+        while not evocation.recovery_times and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if not evocation.recovery_times:
+            raise RuntimeError("The tunnel did not recover after its session ended.")
+    finally:
+        evocation.stop()
+    return {"reconnect_ms": evocation.recovery_times[0] * 1000, "api_calls": cloud.calls.total()}
+
+
+def fleet_status() -> Dict[str, float]:
+    from summoner.lib.boto import get_fleet_status
+
+    cloud = FakeCloud()
+    instances = [to_instance(cloud.add_instance(f"fleet-{i}", REGIONS[i % len(REGIONS)])) for i in range(1500)]
+    boto_session = new_session(cloud)
+
+    start = time.perf_counter()
+    statuses = get_fleet_status(boto_session, instances)
+    elapsed = time.perf_counter() - start
+    if None in statuses.values():
+        raise RuntimeError("Some Instance statuses were missing.")
+    return {"time_ms": elapsed * 1000, "api_calls": cloud.calls.total()}
+
+
+SCENARIOS: Dict[str, Callable[[], Dict[str, float]]] = {
+    "startup": startup,
+    "connect_running": connect_running,
+    "connect_stopped": connect_stopped,
+    "reconnect": reconnect,
+    "fleet_status": fleet_status,
+}
+
+
+def regressions(
+    results: Dict[str, float], baseline: Dict[str, float], tolerance: float, check_times: bool = False
+) -> list:
+    failures = []
+    for metric, value in results.items():
+        is_count = metric.endswith("api_calls")
+        if (expected := baseline.get(metric)) is None or not (is_count or check_times):
+            continue
+        limit = expected if is_count else expected * (1 + tolerance) + SLACK_MS
+        if value > limit:
+            failures.append(f"{metric}: {value:.1f} exceeds {limit:.1f} (baseline {expected:.1f})")
+    return failures
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark Summoner against a local EC2/SSM stand-in.")
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    parser.add_argument("-s", "--scenario", action="append", choices=list(SCENARIOS), help="Defaults to all.")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.5, help="Allowed fractional increase in times.")
+    parser.add_argument(
+        "--check-times", action="store_true", help="Also fail when times grow, against a baseline from this machine."
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="Record these results as the new baseline.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(message)s")
+    with tempfile.TemporaryDirectory(prefix="summoner-benchmark-") as folder:
+        sandbox(Path(folder))
+
+        samples = defaultdict(list)
+        for name in args.scenario or SCENARIOS:
+            for _ in range(args.runs):
+                for metric, value in SCENARIOS[name]().items():
+                    samples[f"{name}.{metric}"].append(value)
+
+    results = {metric: statistics.median(values) for metric, values in samples.items()}
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+
+    print(f"Median of {args.runs} runs")
+    for metric, value in results.items():
+        expected = f"(baseline {baseline[metric]:.1f})" if metric in baseline else ""
+        print(f"  {metric:<36}{value:10.1f} {expected}")
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(
+            json.dumps({**baseline, **{m: round(v, 1) for m, v in results.items()}}, indent=2, sort_keys=True) + "\n"
+        )
+        print(f"Baseline written to {BASELINE_FILE}.")
+        return
+
+    if failures := regressions(results, baseline, args.tolerance, args.check_times):
+        print("Regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
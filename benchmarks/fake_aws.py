@@ -0,0 +1,323 @@
+"""A local stand-in for the EC2, SSM and STS APIs Summoner uses, so it can be benchmarked without AWS. Requests are
+answered in-process once botocore has built and signed them, so client creation, retries and rate limiting are still
+exercised. Instances boot and stop on modelled timings, compressed so benchmarks finish quickly.
+"""
+
+import json
+import time
+import uuid
+from collections import Counter
+from fnmatch import fnmatchcase
+from threading import Lock
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from botocore.awsrequest import AWSResponse
+
+EC2_NAMESPACE = "http://ec2.amazonaws.com/doc/2016-11-15/"
+STS_NAMESPACE = "https://sts.amazonaws.com/doc/2011-06-15/"
+STATE_CODES = {"pending": 0, "running": 16, "shutting-down": 32, "terminated": 48, "stopping": 64, "stopped": 80}
+CALLER_ARN = "arn:aws:iam::123456789012:user/summoner-benchmark"
+
+
+class _Body:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def stream(self, **_):
+        yield self.content
+
+
+class FakeInstance:
+    def __init__(
+        self,
+        instance_id: str,
+        name: str,
+        region: str,
+        state: str,
+        session_lifetime: float | None,
+        platform: str = "Linux/UNIX",
+        vpc_id: str = "vpc-benchmark",
+        tags: Dict[str, str] | None = None,
+    ):
+        self.instance_id = instance_id
+        self.name = name
+        self.region = region
+        self.session_lifetime = session_lifetime
+        self.platform = platform
+        self.vpc_id = vpc_id
+        self.tags = {**(tags or {}), "Name": name}
+
+        self._state = state
+        self._next_state = None
+        self._changes_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if self._next_state and time.monotonic() >= self._changes_at:
+            self._state, self._next_state = self._next_state, None
+        return self._state
+
+    def transition(self, state: str, next_state: str, delay: float):
+        self._state = state
+        self._next_state = next_state
+        self._changes_at = time.monotonic() + delay
+
+
+class FakeCloud:
+    """Answers the requests of every client created by a session it is attached to. :param:`boot_time` and
+    :param:`stop_time` are how long Instances stay pending and stopping, :param:`latency` is added to every call, and
+    :param:`handshake_time` is how long the fake plugin takes to open its port."""
+
+    def __init__(
+        self,
+        boot_time: float = 3,
+        stop_time: float = 2,
+        latency: float = 0.02,
+        handshake_time: float = 0.3,
+    ):
+        self.boot_time = boot_time
+        self.stop_time = stop_time
+        self.latency = latency
+        self.handshake_time = handshake_time
+
+        self.instances: Dict[str, FakeInstance] = {}
+        self.sessions: Dict[str, str] = {}
+        self.calls = Counter()
+        self._lock = Lock()
+
+    def add_instance(
+        self,
+        name: str,
+        region: str = "us-east-1",
+        state: str = "running",
+        session_lifetime: float | None = None,
+        platform: str = "Linux/UNIX",
+        vpc_id: str = "vpc-benchmark",
+        tags: Dict[str, str] | None = None,
+    ) -> FakeInstance:
+        """Adds an Instance. Its sessions end after :param:`session_lifetime` seconds, if given, like a dropped
+        connection. :param:`tags` are in addition to its Name tag."""
+        instance = FakeInstance(
+            f"i-{uuid.uuid4().hex[:17]}", name, region, state, session_lifetime, platform, vpc_id, tags
+        )
+        self.instances[instance.instance_id] = instance
+        return instance
+
+    def attach(self, boto_session):
+        """Answers requests from clients :param:`boto_session` creates from now on."""
+        boto_session._session.register("before-send", self)
+
+    def __call__(self, request, **_) -> AWSResponse:
+        time.sleep(self.latency)
+        # e.g. ec2.us-east-1.amazonaws.com, or sts.amazonaws.com for global endpoints
+        service, *region = (urlparse(request.url).hostname or "").split(".")[:-2]
+        region = region[0] if region else None
+        body = request.body.decode() if isinstance(request.body, bytes) else request.body or ""
+
+        if target := request.headers.get("X-Amz-Target"):
+            operation = (target.decode() if isinstance(target, bytes) else target).split(".")[-1]
+            params = json.loads(body or "{}")
+        else:
+            params = {key: values[0] for key, values in parse_qs(body).items()}
+            operation = params.pop("Action")
+
+        with self._lock:
+            self.calls[operation] += 1
+            if not (handler := getattr(self, f"_{operation}", None)):
+                return self._error(request.url, service, "InvalidAction", f"{operation} is not modelled.")
+            try:
+                content_type, content = handler(region, params)
+            except _FakeError as ex:
+                return self._error(request.url, service, ex.code, ex.message)
+        return AWSResponse(request.url, 200, {"Content-Type": content_type}, _Body(content.encode()))
+
+    def _error(self, url: str, service: str, code: str, message: str) -> AWSResponse:
+        if service == "ssm":
+            content_type = "application/x-amz-json-1.1"
+            content = json.dumps({"__type": code, "message": message})
+        else:
+            content_type = "text/xml"
+            content = (
+                f"<Response><Errors><Error><Code>{code}</Code><Message>{message}</Message></Error></Errors>"
+                f"<RequestID>{uuid.uuid4()}</RequestID></Response>"
+            )
+        return AWSResponse(url, 400, {"Content-Type": content_type}, _Body(content.encode()))
+
+    def _get(self, instance_id: str) -> FakeInstance:
+        if instance_id not in self.instances:
+            raise _FakeError("InvalidInstanceID.NotFound", f"The instance ID '{instance_id}' does not exist")
+        return self.instances[instance_id]
+
+    # EC2
+
+    def _DescribeInstances(self, region: str, params: dict) -> Tuple[str, str]:
+        filters = _query_filters(params)
+        instance_ids = set(_query_list(params, "InstanceId"))
+
+        items = []
+        for instance in self.instances.values():
+            if instance.region != region or (instance_ids and instance.instance_id not in instance_ids):
+                continue
+            state = instance.state
+            if not all(_matches(instance, state, name, values) for name, values in filters.items()):
+                continue
+            tags = "".join(
+                f"<item><key>{key}</key><value>{value}</value></item>" for key, value in instance.tags.items()
+            )
+            items.append(
+                f"<item><instanceId>{instance.instance_id}</instanceId>"
+                f"<instanceState><code>{STATE_CODES[state]}</code><name>{state}</name></instanceState>"
+                f"<platformDetails>{instance.platform}</platformDetails><vpcId>{instance.vpc_id}</vpcId>"
+                f"<tagSet>{tags}</tagSet></item>"
+            )
+        reservations = (
+            f"<item><reservationId>r-benchmark</reservationId><instancesSet>{''.join(items)}</instancesSet></item>"
+        )
+        return "text/xml", (
+            f'<DescribeInstancesResponse xmlns="{EC2_NAMESPACE}"><requestId>{uuid.uuid4()}</requestId>'
+            f"<reservationSet>{reservations if items else ''}</reservationSet></DescribeInstancesResponse>"
+        )
+
+    def _change_states(self, operation: str, params: dict, allowed: List[str], state: str, next_state: str, delay):
+        instances = [self._get(instance_id) for instance_id in _query_list(params, "InstanceId")]
+        for instance in instances:
+            if instance.state not in allowed:
+                raise _FakeError(
+                    "IncorrectInstanceState", f"The instance '{instance.instance_id}' is not in a valid state."
+                )
+
+        items = []
+        for instance in instances:
+            previous = instance.state
+            if previous not in (state, next_state):
+                instance.transition(state, next_state, delay)
+            items.append(
+                f"<item><instanceId>{instance.instance_id}</instanceId>"
+                f"<currentState><code>{STATE_CODES[instance.state]}</code><name>{instance.state}</name></currentState>"
+                f"<previousState><code>{STATE_CODES[previous]}</code><name>{previous}</name></previousState></item>"
+            )
+        return "text/xml", (
+            f'<{operation}Response xmlns="{EC2_NAMESPACE}"><requestId>{uuid.uuid4()}</requestId>'
+            f"<instancesSet>{''.join(items)}</instancesSet></{operation}Response>"
+        )
+
+    def _StartInstances(self, region: str, params: dict) -> Tuple[str, str]:
+        return self._change_states(
+            "StartInstances", params, ["pending", "running", "stopped"], "pending", "running", self.boot_time
+        )
+
+    def _StopInstances(self, region: str, params: dict) -> Tuple[str, str]:
+        return self._change_states(
+            "StopInstances",
+            params,
+            ["pending", "running", "stopping", "stopped"],
+            "stopping",
+            "stopped",
+            self.stop_time,
+        )
+
+    def _RebootInstances(self, region: str, params: dict) -> Tuple[str, str]:
+        for instance_id in _query_list(params, "InstanceId"):
+            if self._get(instance_id).state != "running":
+                raise _FakeError("IncorrectInstanceState", f"The instance '{instance_id}' is not running.")
+        return "text/xml", (
+            f'<RebootInstancesResponse xmlns="{EC2_NAMESPACE}"><requestId>{uuid.uuid4()}</requestId>'
+            "<return>true</return></RebootInstancesResponse>"
+        )
+
+    # SSM
+
+    def _StartSession(self, region: str, params: dict) -> Tuple[str, str]:
+        instance = self._get(params["Target"])
+        if instance.state != "running":
+            raise _FakeError("TargetNotConnected", f"{instance.instance_id} is not connected.")
+
+        session_id = f"summoner-benchmark-{uuid.uuid4().hex[:17]}"
+        self.sessions[session_id] = instance.instance_id
+        # The fake plugin reads its port and timings from the stream URL
+        options = {
+            "port": params.get("Parameters", {}).get("localPortNumber", [0])[0],
+            "handshake": self.handshake_time,
+            "lifetime": instance.session_lifetime or "",
+        }
+        return "application/x-amz-json-1.1", json.dumps(
+            {
+                "SessionId": session_id,
+                "TokenValue": uuid.uuid4().hex,
+                "StreamUrl": f"wss://ssmmessages.{region}.amazonaws.com/v1/data-channel/{session_id}?{urlencode(options)}",
+            }
+        )
+
+    def _TerminateSession(self, region: str, params: dict) -> Tuple[str, str]:
+        self.sessions.pop(params["SessionId"], None)
+        return "application/x-amz-json-1.1", json.dumps({"SessionId": params["SessionId"]})
+
+    def _DescribeSessions(self, region: str, params: dict) -> Tuple[str, str]:
+        sessions = [
+            {"SessionId": session_id, "Target": instance_id, "Status": "Connected", "Owner": CALLER_ARN}
+            for session_id, instance_id in self.sessions.items()
+            if self.instances[instance_id].region == region
+        ]
+        return "application/x-amz-json-1.1", json.dumps({"Sessions": sessions})
+
+    def _DescribeInstanceInformation(self, region: str, params: dict) -> Tuple[str, str]:
+        information = [
+            {
+                "InstanceId": instance.instance_id,
+                "PingStatus": "Online" if instance.state == "running" else "ConnectionLost",
+            }
+            for instance in self.instances.values()
+            if instance.region == region
+        ]
+        return "application/x-amz-json-1.1", json.dumps({"InstanceInformationList": information})
+
+    # STS
+
+    def _GetCallerIdentity(self, region: str, params: dict) -> Tuple[str, str]:
+        return "text/xml", (
+            f'<GetCallerIdentityResponse xmlns="{STS_NAMESPACE}"><GetCallerIdentityResult><Arn>{CALLER_ARN}</Arn>'
+            "<UserId>AIDABENCHMARK</UserId><Account>123456789012</Account></GetCallerIdentityResult>"
+            f"<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></GetCallerIdentityResponse>"
+        )
+
+
+class _FakeError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _query_list(params: dict, prefix: str) -> List[str]:
+    """Returns the values of a query protocol list, e.g. InstanceId.1, InstanceId.2, in order."""
+    keys = [key for key in params if key.startswith(f"{prefix}.") and key.removeprefix(f"{prefix}.").isdigit()]
+    return [params[key] for key in sorted(keys, key=lambda key: int(key.rsplit(".", 1)[1]))]
+
+
+def _matches(instance: FakeInstance, state: str, name: str, values: List[str]) -> bool:
+    """Returns whether :param:`instance` passes the DescribeInstances filter :param:`name`, which matches any of
+    :param:`values`. Values may use the * and ? wildcards."""
+    if name == "instance-id":
+        candidates = [instance.instance_id]
+    elif name == "instance-state-name":
+        candidates = [state]
+    elif name == "platform-details":
+        candidates = [instance.platform]
+    elif name == "vpc-id":
+        candidates = [instance.vpc_id]
+    elif name == "tag-key":
+        candidates = list(instance.tags)
+    elif name.startswith("tag:"):
+        candidates = [instance.tags[name[4:]]] if name[4:] in instance.tags else []
+    else:
+        raise _FakeError("InvalidParameterValue", f"The filter '{name}' is not modelled.")
+    return any(fnmatchcase(candidate, value) for candidate in candidates for value in values)
+
+
+def _query_filters(params: dict) -> Dict[str, List[str]]:
+    filters = {}
+    for key, name in params.items():
+        if key.startswith("Filter.") and key.endswith(".Name"):
+            filters[name] = _query_list(params, key.removesuffix(".Name") + ".Value")
+    return filters
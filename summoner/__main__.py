@@ -5,12 +5,96 @@ from argparse import ArgumentParser
 from pathlib import Path
 
 from summoner.conf.connection_types import CONNECTION_TYPES
-from summoner.lib.const import SUMMONER_FOLDER
-from summoner.summoner import Summoner
+from summoner.lib.const import INSTANCE_STATES, SUMMONER_FOLDER
 
 LOGGER = logging.getLogger()
 
 
+def add_target_args(parser, default_states: str):
+    """Adds the arguments which pick the Instances a fleet-wide mode acts on."""
+    parser.add_argument(
+        "--account",
+        help="Account config file to load Instances from.",
+        dest="config_file",
+        type=str,
+        default="default",
+    )
+    parser.add_argument(
+        "-n",
+        "--name",
+        help="Name of an Instance in the config file. May be repeated. Prompts if not given.",
+        dest="names",
+        action="append",
+        type=str,
+    )
+    parser.add_argument(
+        "-a",
+        "--aws_profile",
+        help="AWS Profile name. Targets every Instance matching the filters, instead of the config file.",
+        dest="aws_profile",
+        type=str,
+    )
+    parser.add_argument(
+        "-s",
+        "--sts_arn",
+        help="Assume role ARN.",
+        dest="sts_arn",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "-r",
+        "--region",
+        help="AWS Region to search. Several may be given, comma-separated, or 'all' for every enabled region. "
+        "Required with an AWS profile unless a filter or name is given, when it defaults to 'all'.",
+        dest="region",
+        type=str,
+    )
+    parser.add_argument(
+        "-t",
+        "--tag",
+        help="Only target Instances with this tag, as Key=Value or Key. May be repeated.",
+        dest="tags",
+        action="append",
+        type=str,
+    )
+    parser.add_argument(
+        "--state",
+        help=f"Only target Instances in this state. May be repeated. Defaults to {default_states}.",
+        dest="states",
+        action="append",
+        choices=INSTANCE_STATES,
+        type=str,
+    )
+    parser.add_argument(
+        "--platform",
+        help="Only target Instances with this platform, e.g. 'Windows*' or 'Linux/UNIX'. May be repeated.",
+        dest="platforms",
+        action="append",
+        type=str,
+    )
+    parser.add_argument(
+        "--vpc",
+        help="Only target Instances in this VPC. May be repeated.",
+        dest="vpc_ids",
+        action="append",
+        type=str,
+    )
+    parser.add_argument(
+        "-y",
+        "--yes",
+        help="Act on the targeted Instances without asking for confirmation.",
+        dest="yes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--dry_run",
+        help="List the targeted Instances without acting on them.",
+        dest="dry_run",
+        action="store_true",
+    )
+
+
 def get_args():
     parser = ArgumentParser(
         prog="Summoner",
@@ -50,11 +134,41 @@ def get_args():
     select.add_argument(
         "-r",
         "--region",
-        help="AWS Region the Instance in.",
+        help="AWS Region the Instance is in. Several may be given, comma-separated, or 'all' for every enabled region.",
         dest="region",
         type=str,
         required=True,
     )
+    select.add_argument(
+        "-t",
+        "--tag",
+        help="Only list Instances with this tag, as Key=Value or Key. May be repeated.",
+        dest="tags",
+        action="append",
+        type=str,
+    )
+    select.add_argument(
+        "--state",
+        help="Only list Instances in this state. May be repeated. Defaults to any state but terminated.",
+        dest="states",
+        action="append",
+        choices=INSTANCE_STATES + ["shutting-down", "terminated"],
+        type=str,
+    )
+    select.add_argument(
+        "--platform",
+        help="Only list Instances with this platform, e.g. 'Windows*' or 'Linux/UNIX'. May be repeated.",
+        dest="platforms",
+        action="append",
+        type=str,
+    )
+    select.add_argument(
+        "--vpc",
+        help="Only list Instances in this VPC. May be repeated.",
+        dest="vpc_ids",
+        action="append",
+        type=str,
+    )
 
     instance = subparser.add_parser("instance", description="Provide profile and Instance details as CLI args.")
     instance.add_argument(
@@ -65,7 +179,7 @@ def get_args():
         type=str,
         required=True,
     )
-    select.add_argument(
+    instance.add_argument(
         "-s",
         "--sts_arn",
         help="Assume role ARN.",
@@ -102,7 +216,7 @@ def get_args():
         "-p",
         "--port",
         help="Local port number to forward.",
-        dest="port",
+        dest="local_port",
         default=None,
         type=int,
     )
@@ -123,6 +237,172 @@ def get_args():
         type=str,
     )
 
+    execute = subparser.add_parser(
+        "exec",
+        description="Run a command on many Instances with SSM Run Command. Targets Instances in an account config "
+        "file, or every matching Instance when an AWS profile is given.",
+    )
+    execute.add_argument("command", help="Command to run.", type=str)
+    add_target_args(execute, default_states="running")
+    execute.add_argument(
+        "--document",
+        help="SSM document to run. Defaults to AWS-RunPowerShellScript for rdp Instances, else AWS-RunShellScript.",
+        dest="document",
+        type=str,
+    )
+    execute.add_argument(
+        "--max_concurrency",
+        help="Most Instances to run on at once across every region, as a count or percentage. Defaults to 50.",
+        dest="max_concurrency",
+        type=str,
+        default="50",
+    )
+    execute.add_argument(
+        "--max_errors",
+        help="Errors allowed across every region before the command is cancelled on remaining Instances, as a count "
+        "or percentage. Defaults to 10%%.",
+        dest="max_errors",
+        type=str,
+        default="10%",
+    )
+    execute.add_argument(
+        "--timeout",
+        help="Seconds the command may run for. Defaults to 600.",
+        dest="timeout",
+        type=int,
+        default=600,
+    )
+
+    manage = subparser.add_parser(
+        "manage",
+        description="Start, stop, reboot or restart many Instances at once, and wait for them. Targets Instances in an "
+        "account config file, or every matching Instance when an AWS profile is given.",
+    )
+    manage.add_argument("action", help="Action to take.", choices=["start", "stop", "reboot", "restart"], type=str)
+    add_target_args(manage, default_states="any state but terminated")
+
+    proxy = subparser.add_parser(
+        "proxy",
+        description="Relay stdin and stdout to SSH on an Instance, for use as an OpenSSH ProxyCommand. Starts the "
+        "Instance if it is stopped.",
+    )
+    proxy.add_argument("target", help="Name or ID of the Instance, e.g. %%h in an SSH config.", type=str)
+    proxy.add_argument(
+        "--account",
+        help="Account config file to load the Instance from.",
+        dest="config_file",
+        type=str,
+        default="default",
+    )
+    proxy.add_argument(
+        "-a",
+        "--aws_profile",
+        help="AWS Profile name. Looks the Instance up by ID or Name tag, instead of in the config file.",
+        dest="aws_profile",
+        type=str,
+    )
+    proxy.add_argument(
+        "-s",
+        "--sts_arn",
+        help="Assume role ARN.",
+        dest="sts_arn",
+        type=str,
+        default=None,
+    )
+    proxy.add_argument(
+        "-r",
+        "--region",
+        help="AWS Region to look the Instance up in. Defaults to the profile's region.",
+        dest="region",
+        type=str,
+    )
+    proxy.add_argument(
+        "-p",
+        "--port",
+        help="Remote port to relay to. Defaults to 22.",
+        dest="port",
+        type=int,
+        default=22,
+    )
+
+    copy = subparser.add_parser(
+        "cp",
+        description="Copy a file to or from an Instance over several SSM tunnels at once, with SSH. Give the remote "
+        "path as NAME:PATH. Interrupted copies resume when run again.",
+    )
+    copy.add_argument("source", help="File to copy, e.g. ./build.tar or web-1:/var/log/app.log.", type=str)
+    copy.add_argument("destination", help="Where to copy it to, e.g. web-1:/tmp/ or ./logs/.", type=str)
+    copy.add_argument(
+        "--account",
+        help="Account config file to load the Instance from.",
+        dest="config_file",
+        type=str,
+        default="default",
+    )
+    copy.add_argument(
+        "-a",
+        "--aws_profile",
+        help="AWS Profile name. Looks the Instance up by ID or Name tag, instead of in the config file.",
+        dest="aws_profile",
+        type=str,
+    )
+    copy.add_argument(
+        "-s",
+        "--sts_arn",
+        help="Assume role ARN.",
+        dest="sts_arn",
+        type=str,
+        default=None,
+    )
+    copy.add_argument(
+        "-r",
+        "--region",
+        help="AWS Region to look the Instance up in. Defaults to the profile's region.",
+        dest="region",
+        type=str,
+    )
+    copy.add_argument(
+        "-u",
+        "--username",
+        help="SSH username. Defaults to the Instance's username in the config file.",
+        dest="username",
+        default=None,
+        type=str,
+    )
+    copy.add_argument(
+        "--streams",
+        help="Number of tunnels to copy over at once. Defaults to 4.",
+        dest="streams",
+        type=int,
+        default=4,
+    )
+    copy.add_argument(
+        "--chunk_mb",
+        help="Size of each chunk in MiB. Defaults to 64.",
+        dest="chunk_size",
+        type=lambda mb: int(mb) * 1024 * 1024,
+        default=64 * 1024 * 1024,
+    )
+
+    stats = subparser.add_parser(
+        "stats", description="Report how long each phase of connecting took, from traces recorded locally."
+    )
+    stats.add_argument(
+        "--days",
+        help="Only include connections from the last DAYS days. Defaults to all recorded connections.",
+        dest="days",
+        type=float,
+        default=None,
+    )
+    stats.add_argument(
+        "--by",
+        help="Break each phase down by region, Instance, SSM engine, or whether the tunnel was warm.",
+        dest="by",
+        choices=["region", "instance", "engine", "warm"],
+        type=str,
+        default=None,
+    )
+
     parser.add_argument(
         "-l",
         "--log_lvl",
@@ -150,7 +430,10 @@ def menu_wrapper(func):
             sys.exit(1)
         except Exception as ex:
             LOGGER.exception(ex)
-            time.sleep(3)
+            # Give interactive users a moment to read the error, and scripts a non-zero exit code
+            if sys.stdin.isatty():
+                time.sleep(3)
+            sys.exit(1)
 
     return inner
 
@@ -159,14 +442,28 @@ def menu_wrapper(func):
 def main():
     args_dict = dict(get_args()._get_kwargs())
 
+    if args_dict["mode"] == "stats":
+        # Reads local traces only, so neither the log file nor boto3 are needed
+        from summoner.lib.tracing import print_stats
+
+        print_stats(args_dict["days"], args_dict["by"])
+        sys.exit(0)
+
+    SUMMONER_FOLDER.mkdir(exist_ok=True)
     logging.basicConfig(
         level=args_dict.pop("log_lvl"),
-        format=f"%(acstime)s | %(message)s",
-        handlers=[logging.FileHandler(Path(SUMMONER_FOLDER, "log"), "w"), logging.StreamHandler()],
+        format="%(asctime)s | %(message)s",
+        # Proxies run alongside each other and other Summoners, so they add to the log rather than replace it
+        handlers=[
+            logging.FileHandler(Path(SUMMONER_FOLDER, "log"), "a" if args_dict["mode"] == "proxy" else "w"),
+            logging.StreamHandler(),
+        ],
     )
 
-    Summoner(**args_dict)
-    sys.exit(0)
+    # Imported here, so --help, --version and argument errors don't pay for importing boto3
+    from summoner.summoner import Summoner
+
+    sys.exit(Summoner(**args_dict).exit_code)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,10 @@
-import summoner.connectors as connectors
+from summoner.lib.registry import LazyRegistry
 
-CONNECTION_FUNCS = {
-    "rdp": connectors.rdp_connection,
-    "vnc": connectors.vnc_connection,
-    "ssh": connectors.ssh_connection,
-}
+# Connectors are imported when first used
+CONNECTION_FUNCS = LazyRegistry(
+    {
+        "rdp": "summoner.connectors.rdp_connection",
+        "vnc": "summoner.connectors.vnc_connection",
+        "ssh": "summoner.connectors.ssh_connection",
+    }
+)
@@ -1,36 +1,47 @@
 import logging
-import shutil
+import os
 import subprocess
 import sys
 import time
 from pathlib import Path
 
 from summoner.evocation import Evocation
-from summoner.lib.const import RDP_TEMPLATE, SUMMONER_FOLDER, VNC_TEMPLATE
 from summoner.lib.instance import Instance
+from summoner.lib.profiles import measure_rtt, render_profile, rtt_tier
 
 LOGGER = logging.getLogger()
 
 
+def _tuned_profile(target: Instance, **fields) -> Path:
+    """Renders the connection file for :param:`target`, tuned to the round trip time measured through its tunnel."""
+    rtt = measure_rtt(target)
+    tier = rtt_tier(rtt)
+    LOGGER.info(f"Tunnel round trip {f'{rtt}ms' if rtt is not None else 'not measured'}, using {tier} settings.")
+    return render_profile(target, tier, **fields)
+
+
+def _launch(profile: Path) -> bool:
+    if sys.platform == "win32":
+        # Opened by its file association, so the path is never parsed by a shell, e.g. one with spaces or quotes
+        try:
+            os.startfile(profile)  # type: ignore
+        except OSError:
+            return False
+        return True
+    return subprocess.run(["open", str(profile)]).returncode == 0
+
+
 def rdp_connection(target: Instance, **kwargs):
     full_username = f"{target.domain}\\{target.username}" if target.domain else target.username
 
-    rdp_file = Path(SUMMONER_FOLDER, f"{target.name}.rdp")
-    if not rdp_file.exists():
-        shutil.copyfile(RDP_TEMPLATE.as_posix(), rdp_file.as_posix())
-
-    # Format RDP file for this run
-    with open(rdp_file, "r", encoding="utf-16") as f0:
-        with open("this.rdp", "w", encoding="utf-16") as f1:
-            f1.write(f0.read().format(full_username=full_username, local_port=target.local_port))
+    rdp_file = _tuned_profile(target, full_username=full_username, local_port=target.local_port)
 
     print(
         "Launching RDP client..."
         f"\nIf the client fails to start or you would like to use a different one, connect to localhost: {target.local_port} as {full_username}."
     )
 
-    launcher = "Start-Process" if sys.platform == "win32" else "open"
-    if subprocess.run([launcher, "this.rdp"]).returncode != 0:
+    if not _launch(rdp_file):
         LOGGER.error("No default app found for .rdp files. Please set one and try again.")
 
 
@@ -47,7 +58,7 @@ def ssh_connection(target: Instance, evocation: Evocation, **kwargs):
         "ssh",
         ssh_target,
         "-p",
-        target.local_port,
+        str(target.local_port),
         "-o",
         "StrictHostKeyChecking=no",
         "-o",
@@ -73,20 +84,12 @@ def ssh_connection(target: Instance, evocation: Evocation, **kwargs):
 
 
 def vnc_connection(target: Instance, **kwargs):
-    rdp_file = Path(SUMMONER_FOLDER, f"{target.name}.vnc")
-    if not rdp_file.exists():
-        shutil.copyfile(VNC_TEMPLATE.as_posix(), rdp_file.as_posix())
-
-    # Format RDP file for this run
-    with open(rdp_file, "r", encoding="utf-16") as f0:
-        with open("this.vnc", "w", encoding="utf-16") as f1:
-            f1.write(f0.read().format(local_port=target.local_port))
+    vnc_file = _tuned_profile(target, local_port=target.local_port)
 
     print(
         "Launching VNC client..."
         f"\nIf the client fails to start or you would like to use a different one, connect to localhost: {target.local_port}."
     )
 
-    launcher = "Start-Process" if sys.platform == "win32" else "open"
-    if subprocess.run([launcher, "this.vnc"]).returncode != 0:
+    if not _launch(vnc_file):
         LOGGER.error("No default app found for .vnc files. Please set one and try again.")
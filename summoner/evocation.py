@@ -1,9 +1,12 @@
 import logging
-from typing import Callable
+import time
+from typing import Callable, Literal
 
 from summoner.lib.boto import BotoEnhanced
 from summoner.lib.instance import Instance
-from summoner.lib.ssm import SSMPlugin
+from summoner.lib.ssm import READY_TIMEOUT, SSMPlugin
+from summoner.lib.supervisor import TunnelSupervisor
+from summoner.lib.tracing import current_trace, record, span
 
 LOGGER = logging.getLogger()
 
@@ -15,13 +18,45 @@ class Action:
 
 
 class Evocation(SSMPlugin):
-    def __init__(self, boto_session: BotoEnhanced, instance: Instance):
-        self.plugin = super().__init__(boto_session, instance)
+    def __init__(
+        self,
+        boto_session: BotoEnhanced,
+        instance: Instance,
+        engine: Literal["plugin", "native"] = "plugin",
+        supervisor: TunnelSupervisor | None = None,
+        ready_timeout: float = READY_TIMEOUT,
+    ):
+        super().__init__(boto_session, instance, engine, supervisor, ready_timeout)
+
+    async def __aenter__(self):
+        """Starts the tunnel on the running event loop. Await :meth:`ready_async` before connecting."""
+        await self.start_async()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.stop_async()
+
+    def open(self) -> bool:
+        """Starts the plugin and returns whether the tunnel is ready for connections."""
+        with span("open"):
+            self.start()
+            ready = self.is_ready()
+        if ready:
+            return True
+
+        if self.circuit_open.is_set():
+            LOGGER.error(f"SSM sessions to {self.target.name} keep failing. Please try again in a few minutes.")
+        return False
+
+    def attach(self, connect_func: Action):
+        """Runs :param:`connect_func` against an already open tunnel."""
+        if trace := current_trace():
+            record("time_to_connect", trace.started, time.time() - trace.started)
+        with span("client"):
+            connect_func.func(target=self.target, evocation=self, **connect_func.kwargs)
 
     def connect(self, connect_func: Action):
-        self.start()
-
-        if self.is_ready():
-            connect_func.func(evocation=self, **connect_func.kwargs)
+        if self.open():
+            self.attach(connect_func)
 
         self.stop()
@@ -1,23 +1,63 @@
 import logging
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from time import time
-from typing import List
+from functools import wraps
+from queue import Queue
+from threading import Lock, Thread, get_ident
+from time import sleep, time
+from typing import Dict, Iterator, List, Literal, Tuple
 
 import pytz
 from boto3 import Session
 from botocore import exceptions
+from botocore.config import Config
 from botocore.credentials import RefreshableCredentials
 from botocore.session import get_session
 
-from summoner.lib.decorators import method_decorator
+from summoner.lib.const import INSTANCE_STATES, SESSION_REASON, SSH_DOCUMENT, UNKNOWN_STATE
+from summoner.lib.credentials import load_credentials, remaining, save_credentials
+from summoner.lib.decorators import lazy_method_decorator
 from summoner.lib.instance import Instance
+from summoner.lib.resilience import TokenBucket
 
 LOGGER = logging.getLogger()
 
+# ClientError codes, matched on the part before any "." (e.g. InvalidInstanceID.NotFound)
 SSM_ERRORS = ["TargetNotConnected", "InternalServerError"]
-PERMISSION_ERRORS = ["AccessDenied", "UnauthorizedOperation", "403"]
-RESOURCE_ERRORS = ["ResourceNotFoundException", "InvalidInstanceID"]
+PERMISSION_ERRORS = ["AccessDenied", "AccessDeniedException", "UnauthorizedOperation"]
+# SSM spells it InvalidInstanceId, e.g. when SendCommand targets an Instance its agent doesn't manage
+RESOURCE_ERRORS = ["ResourceNotFoundException", "InvalidInstanceID", "InvalidInstanceId"]
 STATE_ERRORS = ["IncorrectInstanceState"]
+THROTTLE_ERRORS = [
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "EC2ThrottledException",
+]
+
+# botocore's adaptive retries back off and pace each client on throttling. Requests are also paced across every client
+# and thread by a token bucket per (service, region), allowing this many requests per second.
+API_CONFIG = Config(retries={"mode": "adaptive", "max_attempts": 10})
+API_RATES = {"ec2": 20, "ssm": 10}
+DEFAULT_API_RATE = 10
+
+# DescribeInstances accepts at most 200 values per filter, and SendCommand at most 50 Instance IDs
+FILTER_VALUES_LIMIT = 200
+SEND_COMMAND_TARGETS_LIMIT = 50
+INSTANCE_ACTION_LIMIT = 100
+
+INSTANCE_ACTIONS = {"start": "start_instances", "stop": "stop_instances", "reboot": "reboot_instances"}
+
+# botocore refreshes credentials, blocking the calling thread, once they have less than 15 minutes left. Renewing
+# them 5 minutes before that keeps refreshes off the hot path.
+CREDENTIALS_MIN_REMAINING = 15 * 60
+CREDENTIALS_PREFETCH = 20 * 60
+CREDENTIALS_MIN_RETRY = 60
 
 
 class BotoEnhancedException(Exception):
@@ -25,31 +65,83 @@ class BotoEnhancedException(Exception):
         super().__init__(message)
 
 
+def error_code(ex: exceptions.ClientError) -> str:
+    """Returns the code family of a ClientError, e.g. InvalidInstanceID for InvalidInstanceID.NotFound."""
+    return ex.response.get("Error", {}).get("Code", "").split(".")[0]
+
+
 def boto_wrapper(_):
     def outer(func):
+        @wraps(func)
         def inner(*args, **kwargs):
             try:
                 return func(*args, **kwargs)
-            except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
-                if any(error_string in str(ex) for error_string in RESOURCE_ERRORS):
+            except exceptions.ClientError as ex:
+                code = error_code(ex)
+                if code in RESOURCE_ERRORS:
                     LOGGER.exception("Instance could not be found.")
                     return
-                elif any(error_string in str(ex) for error_string in PERMISSION_ERRORS):
+                elif code in PERMISSION_ERRORS or ex.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 403:
                     LOGGER.exception(f"You do not have permission to interact with that Instance. Error: {ex}")
                     return
-                elif any(error_string in str(ex) for error_string in STATE_ERRORS):
+                elif code in STATE_ERRORS:
                     LOGGER.exception("Instane state could not be changed. Please try again in a few minutes.")
                     return
-                elif any(error_string in str(ex) for error_string in SSM_ERRORS):
+                elif code in THROTTLE_ERRORS:
+                    LOGGER.error(f"AWS is throttling requests. Please try again shortly. Error: {ex}")
+                    return
+                elif code in SSM_ERRORS:
                     LOGGER.exception(f"Could not start SSM session. Error: {ex}")
                     return
                 raise BotoEnhancedException(f"Unandled exception: {ex}")
+            except exceptions.BotoCoreError as ex:
+                raise BotoEnhancedException(f"Unandled exception: {ex}")
 
         return inner
 
     return outer
 
 
+_BUCKETS: Dict[Tuple[str, str], TokenBucket] = {}
+_BUCKETS_LOCK = Lock()
+
+# Throttled requests, including those which were retried successfully, per (service, region)
+THROTTLE_COUNTS = Counter()
+
+
+def get_bucket(service_name: str, region_name: str) -> TokenBucket:
+    """Returns the token bucket shared by every client of :param:`service_name` in :param:`region_name`."""
+    with _BUCKETS_LOCK:
+        if (service_name, region_name) not in _BUCKETS:
+            rate = API_RATES.get(service_name, DEFAULT_API_RATE)
+            _BUCKETS[(service_name, region_name)] = TokenBucket(rate)
+        return _BUCKETS[(service_name, region_name)]
+
+
+def rate_limit(client):
+    """Paces every request and retry made by :param:`client` through its shared token bucket, and counts throttling."""
+    service_name, region_name = client.meta.service_model.service_name, client.meta.region_name
+    bucket = get_bucket(service_name, region_name)
+
+    def before_send(**_):
+        bucket.acquire()
+
+    def after_call(parsed, **_):
+        if not parsed.get("Error"):
+            bucket.succeeded()
+
+    def needs_retry(response=None, **_):
+        if response and response[1].get("Error", {}).get("Code") in THROTTLE_ERRORS:
+            THROTTLE_COUNTS[(service_name, region_name)] += 1
+            LOGGER.debug(f"Throttled by {service_name} in {region_name}.")
+            bucket.throttled()
+
+    client.meta.events.register("before-send", before_send)
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("needs-retry", needs_retry)
+    return client
+
+
 class BotoEnhanced(Session):
     def __init__(
         self,
@@ -59,21 +151,35 @@ class BotoEnhanced(Session):
         session_name: str | None = None,
         session_ttl: int = 3600,
     ):
-        self.region_name = region_name  # type: ignore
-        self.profile_name = profile_name  # type: ignore
         self.sts_arn = sts_arn
         self.session_name = session_name or self.__class__.__name__
         self.session_ttl = session_ttl
 
+        # Clients and resources are reused per (service, region, credentials generation)
+        self._credentials_generation = 0
+        self._pool = {}
+        self._pool_lock = Lock()
+
+        # Credentials renewed ahead of expiry by the refresher thread, handed to botocore at its next refresh
+        self._prefetched = None
+        self._refresh_lock = Lock()
+
         try:
-            super().__init__(region_name=self.region_name, profile_name=self.profile_name)
+            super().__init__(region_name=region_name, profile_name=profile_name)
+            # The profile's own credentials, used to assume the role. This session's credentials are replaced by
+            # refreshable_session, so refreshing through it would refresh itself.
+            self._base_session = Session(region_name=region_name, profile_name=profile_name)
         except exceptions.ProfileNotFound:
             raise Exception(f"Could not find '{profile_name}' profile in AWS config.")
         self.refreshable_session()
 
-    def __get_session_credentials(self):
+    def __fetch_credentials(self, min_remaining: float) -> dict:
         if self.sts_arn:
-            sts_client = super().client("sts", region_name=self.region_name)
+            # Another Summoner may already have assumed the role
+            if credentials := load_credentials(self.profile_name, self.sts_arn, min_remaining):
+                return credentials
+
+            sts_client = self._base_session.client("sts", region_name=self.region_name)
             response = sts_client.assume_role(
                 RoleArn=self.sts_arn,
                 RoleSessionName=self.session_name,
@@ -86,8 +192,9 @@ class BotoEnhanced(Session):
                 "token": response.get("SessionToken"),
                 "expiry_time": response.get("Expiration").isoformat(),
             }
+            save_credentials(self.profile_name, self.sts_arn, credentials)
         else:
-            session_credentials = super().get_credentials().get_frozen_credentials()
+            session_credentials = self._base_session.get_credentials().get_frozen_credentials()
             credentials = {
                 "access_key": session_credentials.access_key,
                 "secret_key": session_credentials.secret_key,
@@ -97,6 +204,34 @@ class BotoEnhanced(Session):
 
         return credentials
 
+    def __get_session_credentials(self):
+        with self._refresh_lock:
+            credentials, self._prefetched = self._prefetched, None
+        if not credentials or remaining(credentials) < CREDENTIALS_MIN_REMAINING:
+            credentials = self.__fetch_credentials(CREDENTIALS_MIN_REMAINING)
+
+        self._credentials_generation += 1
+        return credentials
+
+    def __refresh_credentials(self, credentials: RefreshableCredentials):
+        """Renews credentials in the background, before botocore would block a call to refresh them itself."""
+        while True:
+            expiry_time = credentials._expiry_time
+            delay = (expiry_time - datetime.now(pytz.utc)).total_seconds() - CREDENTIALS_PREFETCH
+            sleep(max(delay, CREDENTIALS_MIN_RETRY))
+
+            # Skip if botocore refreshed in the meantime, or the last prefetch hasn't been used yet
+            if credentials._expiry_time != expiry_time or self._prefetched:
+                continue
+            try:
+                prefetched = self.__fetch_credentials(CREDENTIALS_PREFETCH)
+            except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+                LOGGER.warning(f"Could not renew AWS credentials. Retrying in {CREDENTIALS_MIN_RETRY}s. Error: {ex}")
+                continue
+            with self._refresh_lock:
+                self._prefetched = prefetched
+            LOGGER.debug(f"Renewed AWS credentials, valid until {prefetched['expiry_time']}.")
+
     def refreshable_session(self):
         session = get_session()
         session._credentials = RefreshableCredentials.create_from_metadata(
@@ -105,55 +240,263 @@ class BotoEnhanced(Session):
             method="sts-assume-role",
         )
         session.set_config_variable("region", self.region_name)
+        session.set_config_variable("profile", self.profile_name)
         super().__init__(botocore_session=session)
 
-    def client(self, *args, **kwargs):
-        client = super().client(*args, **kwargs)
-        return method_decorator(boto_wrapper)(client)
+        Thread(
+            name="credential_refresh_thread",
+            target=self.__refresh_credentials,
+            args=(session._credentials,),
+            daemon=True,
+        ).start()
+
+    def _pooled(self, factory, key, *args, **kwargs):
+        with self._pool_lock:
+            if key not in self._pool:
+                # Drop anything built with credentials which have since rotated
+                for stale_key in [k for k in self._pool if k[3] != self._credentials_generation]:
+                    del self._pool[stale_key]
+                self._pool[key] = factory(*args, **kwargs)
+            return self._pool[key]
+
+    def _client(self, service_name, region_name=None, **kwargs):
+        config = API_CONFIG.merge(kwargs.pop("config")) if kwargs.get("config") else API_CONFIG
+        return lazy_method_decorator(boto_wrapper)(
+            rate_limit(super().client(service_name, region_name=region_name, config=config, **kwargs))
+        )
 
-    def resource(self, *args, **kwargs):
-        resource = super().resource(*args, **kwargs)
-        return method_decorator(boto_wrapper)(resource)
+    def _resource(self, service_name, region_name=None, **kwargs):
+        config = API_CONFIG.merge(kwargs.pop("config")) if kwargs.get("config") else API_CONFIG
+        resource = super().resource(service_name, region_name=region_name, config=config, **kwargs)
+        rate_limit(resource.meta.client)
+        return lazy_method_decorator(boto_wrapper)(resource)
+
+    def client(self, service_name, region_name=None, **kwargs):
+        if kwargs:
+            return self._client(service_name, region_name, **kwargs)
+
+        key = ("client", service_name, region_name or self.region_name, self._credentials_generation)
+        return self._pooled(self._client, key, service_name, region_name)
+
+    def resource(self, service_name, region_name=None, **kwargs):
+        if kwargs:
+            return self._resource(service_name, region_name, **kwargs)
+
+        # Resources are not thread safe, so each thread gets its own
+        key = ("resource", service_name, region_name or self.region_name, self._credentials_generation, get_ident())
+        return self._pooled(self._resource, key, service_name, region_name)
+
+
+def get_fleet_status(boto_session: Session | BotoEnhanced, instances: List[Instance]) -> Dict[str, str | None]:
+    """Returns the state of each Instance keyed by Instance ID. Instances are grouped by region, so the number of API
+    calls scales with regions rather than Instances. Instances which could not be found are mapped to None, and those
+    in regions which could not be described are mapped to UNKNOWN_STATE."""
+    region_instance_ids = defaultdict(set)
+    for instance in instances:
+        region_instance_ids[instance.region].add(instance.instance_id)
+
+    statuses: Dict[str, str | None] = {instance.instance_id: None for instance in instances}
+    for region, instance_ids in region_instance_ids.items():
+        ec2_client = boto_session.client("ec2", region_name=region)
+        paginator = ec2_client.get_paginator("describe_instances")
+        instance_ids = sorted(instance_ids)
+        try:
+            for i in range(0, len(instance_ids), FILTER_VALUES_LIMIT):
+                # Filter rather than pass InstanceIds, so one unknown ID doesn't fail the whole batch
+                filters = [{"Name": "instance-id", "Values": instance_ids[i : i + FILTER_VALUES_LIMIT]}]
+                for page in paginator.paginate(Filters=filters):
+                    for reservation in page["Reservations"]:
+                        for ec2_instance in reservation["Instances"]:
+                            statuses[ec2_instance["InstanceId"]] = ec2_instance["State"]["Name"]
+        except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+            LOGGER.error(f"Could not get Instance statuses in {region}. Error: {ex}")
+            for instance_id in instance_ids:
+                if statuses[instance_id] is None:
+                    statuses[instance_id] = UNKNOWN_STATE
+    return statuses
+
+
+def instance_filters(
+    tags: List[str] | None = None,
+    states: List[str] | None = None,
+    platforms: List[str] | None = None,
+    vpc_ids: List[str] | None = None,
+) -> List[dict]:
+    """Builds DescribeInstances filters. Tags are given as Key=Value, or as Key to match any value. Values accept
+    DescribeInstances wildcards, e.g. Windows* for platforms."""
+    filters = [{"Name": "instance-state-name", "Values": states or INSTANCE_STATES}]
+    for tag in tags or []:
+        key, _, value = tag.partition("=")
+        filters.append({"Name": f"tag:{key}", "Values": [value]} if value else {"Name": "tag-key", "Values": [key]})
+    if platforms:
+        filters.append({"Name": "platform-details", "Values": platforms})
+    if vpc_ids:
+        filters.append({"Name": "vpc-id", "Values": vpc_ids})
+    return filters
+
+
+def _instance_pages(
+    boto_session: Session | BotoEnhanced, region: str, filters: List[dict], page_size: int = 100
+) -> Iterator[List[dict]]:
+    ec2_client = boto_session.client("ec2", region_name=region)
+    paginator = ec2_client.get_paginator("describe_instances")
+    for page in paginator.paginate(Filters=filters, PaginationConfig={"PageSize": page_size}):
+        instances = []
+        for reservation in page["Reservations"]:
+            for ec2_instance in reservation["Instances"]:
+                tags = {tag["Key"]: tag["Value"] for tag in ec2_instance.get("Tags", [])}
+                instances.append(
+                    {
+                        "instance_id": ec2_instance["InstanceId"],
+                        "region": region,
+                        "name": tags.get("Name", ec2_instance["InstanceId"]),
+                        "state": ec2_instance["State"]["Name"],
+                        "platform": ec2_instance.get("PlatformDetails", "unknown"),
+                        "vpc_id": ec2_instance.get("VpcId"),
+                        "tags": tags,
+                    }
+                )
+        yield instances
+
+
+def discover_instances(
+    boto_session: Session | BotoEnhanced, region: str, filters: List[dict], page_size: int = 100
+) -> Iterator[List[dict]]:
+    """Yields pages of Instances in :param:`region` matching :param:`filters` as they are fetched. Filtering is done
+    by DescribeInstances, so only matching Instances are transferred."""
+    try:
+        yield from _instance_pages(boto_session, region, filters, page_size)
+    except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+        LOGGER.error(f"Could not list Instances in {region}. Error: {ex}")
 
 
-def get_instance_status(boto_session: Session | BotoEnhanced, instance: Instance) -> None | str:
-    ec2_client = boto_session.client("ec2", region_name=instance.region)
-    response = ec2_client.describe_instance_status(InstanceIds=[instance.instance_id])
+def list_instances(boto_session: Session | BotoEnhanced, region: str, filters: List[dict]) -> List[dict] | None:
+    """Returns every Instance in :param:`region` matching :param:`filters`, or None if they could not all be listed."""
+    try:
+        return [instance for page in _instance_pages(boto_session, region, filters, 1000) for instance in page]
+    except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+        LOGGER.debug(f"Could not list Instances in {region}. Error: {ex}")
+
+
+def get_ping_statuses(boto_session: Session | BotoEnhanced, region: str) -> Dict[str, str] | None:
+    """Returns the SSM agent ping status of each managed Instance in :param:`region`, keyed by Instance ID, or None
+    if they could not be listed."""
+    ssm_client = boto_session.client("ssm", region_name=region)
+    paginator = ssm_client.get_paginator("describe_instance_information")
+    statuses = {}
     try:
-        return response["InstanceStatuses"][0]["InstanceState"]["Name"]
-    except IndexError:
-        return "stopped"
+        for page in paginator.paginate():
+            for information in page["InstanceInformationList"]:
+                statuses[information["InstanceId"]] = information["PingStatus"]
+    except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+        LOGGER.debug(f"Could not get SSM ping statuses in {region}. Error: {ex}")
+        return
+    return statuses
+
+
+def discover_fleet(
+    boto_session: Session | BotoEnhanced, regions: List[str], filters: List[dict], max_workers: int = 8
+) -> Iterator[List[dict]]:
+    """Yields pages of Instances from every region in :param:`regions` as they are fetched. Regions are listed in
+    parallel on up to :param:`max_workers` threads, so this takes about as long as the slowest region."""
+    pages = Queue()
+
+    def discover_region(region):
+        try:
+            for page in discover_instances(boto_session, region, filters):
+                pages.put(page)
+        finally:
+            pages.put(None)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(regions)) or 1) as executor:
+        for region in regions:
+            executor.submit(discover_region, region)
+
+        remaining_regions = len(regions)
+        while remaining_regions:
+            if (page := pages.get()) is None:
+                remaining_regions -= 1
+            elif page:
+                yield page
 
 
-def start_instance(boto_session: Session | BotoEnhanced, instance: Instance):
+def get_enabled_regions(boto_session: Session | BotoEnhanced) -> List[str]:
+    """Returns the regions enabled for the account."""
+    ec2_client = boto_session.client("ec2")
+    response = ec2_client.describe_regions()
+    return sorted(region["RegionName"] for region in response["Regions"]) if response else []
+
+
+def get_instance_status(boto_session: Session | BotoEnhanced, instance: Instance) -> None | str:
+    return get_fleet_status(boto_session, [instance])[instance.instance_id]
+
+
+def change_instance_states(
+    boto_session: Session | BotoEnhanced, instances: List[Instance], action: Literal["start", "stop", "reboot"]
+) -> List[Instance]:
+    """Starts, stops or reboots :param:`instances` with one call per region and batch of 100 Instances. Returns the
+    Instances the action was accepted for. If a batch is refused, e.g. because one Instance is in the wrong state, its
+    Instances are retried one at a time so the rest aren't held back."""
+    region_instances = defaultdict(list)
+    for instance in instances:
+        region_instances[instance.region].append(instance)
+
+    accepted = []
+    for region, group in region_instances.items():
+        ec2_client = boto_session.client("ec2", region_name=region)
+        change_states = getattr(ec2_client, INSTANCE_ACTIONS[action])
+        for i in range(0, len(group), INSTANCE_ACTION_LIMIT):
+            batch = group[i : i + INSTANCE_ACTION_LIMIT]
+            if change_states(InstanceIds=[instance.instance_id for instance in batch]) is not None:
+                accepted.extend(batch)
+            elif len(batch) > 1:
+                accepted.extend(
+                    instance for instance in batch if change_states(InstanceIds=[instance.instance_id]) is not None
+                )
+    return accepted
+
+
+def start_instance(boto_session: Session | BotoEnhanced, instance: Instance) -> bool:
     LOGGER.info(f"Starting Instance {instance.name}...")
-    ec2_client = boto_session.client("ec2", region_name=instance.region)
-    ec2_client.start_instances(InstanceIds=[instance])
+    return bool(change_instance_states(boto_session, [instance], "start"))
 
 
-def stop_instance(boto_session: Session | BotoEnhanced, instance: Instance):
+def stop_instance(boto_session: Session | BotoEnhanced, instance: Instance) -> bool:
     LOGGER.info(f"Stopping Instance {instance.name}..")
-    ec2_client = boto_session.client("ec2", region_name=instance.region)
-    ec2_client.stop_instances(InstanceIds=[instance])
+    return bool(change_instance_states(boto_session, [instance], "stop"))
 
 
-def get_sessions(boto_session: Session | BotoEnhanced, instance: Instance) -> List[str]:
+def get_sessions(boto_session: Session | BotoEnhanced, instance: Instance) -> List[dict]:
     ssm_client = boto_session.client("ssm", region_name=instance.region)
     response = ssm_client.describe_sessions(State="Active", Filters=[{"key": "Target", "value": instance.instance_id}])
+    return response.get("Sessions", []) if response else []
+
 
+def get_caller_arn(boto_session: Session | BotoEnhanced) -> str | None:
+    identity = boto_session.client("sts").get_caller_identity()
+    return identity["Arn"] if identity else None
+
+
+def get_user_sessions(boto_session: Session | BotoEnhanced, region: str, owner: str) -> List[dict] | None:
+    """Returns the active SSM sessions of :param:`owner` in :param:`region`, or None if they could not be listed."""
+    ssm_client = boto_session.client("ssm", region_name=region)
+    paginator = ssm_client.get_paginator("describe_sessions")
     ssm_sessions = []
-    if "Sessions" in response:
-        for session in response["Sessions"]:
-            ssm_sessions.append(session)
+    try:
+        for page in paginator.paginate(State="Active", Filters=[{"key": "Owner", "value": owner}]):
+            ssm_sessions.extend(page["Sessions"])
+    except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+        LOGGER.error(f"Could not list SSM sessions in {region}. Error: {ex}")
+        return
     return ssm_sessions
 
 
 def start_session(boto_session: Session | BotoEnhanced, instance: Instance) -> str | None:
     ssm_client = boto_session.client("ssm", region_name=instance.region)
     return ssm_client.start_session(
-        Target=instance,
+        Target=instance.instance_id,
         DocumentName="AWS-StartPortForwardingSession",
-        Reason="Summoner Session",
+        Reason=SESSION_REASON,
         Parameters={
             "portNumber": [str(instance.remote_port)],
             "localPortNumber": [str(instance.local_port)],
@@ -161,7 +504,66 @@ def start_session(boto_session: Session | BotoEnhanced, instance: Instance) -> s
     )
 
 
-def terminate_sessions(boto_session: Session | BotoEnhanced, instance: Instance, ssm_sessions: List[str]):
+def start_ssh_session(boto_session: Session | BotoEnhanced, instance: Instance, port: int = 22) -> dict | None:
+    """Starts a session relaying a stream, rather than a local port, to :param:`port` on :param:`instance`."""
     ssm_client = boto_session.client("ssm", region_name=instance.region)
-    for session in ssm_sessions:
-        ssm_client.terminate_session(SessionId=session["SessionId"])  # type: ignore
+    return ssm_client.start_session(
+        Target=instance.instance_id,
+        DocumentName=SSH_DOCUMENT,
+        Reason=SESSION_REASON,
+        Parameters={"portNumber": [str(port)]},
+    )
+
+
+def send_command(
+    boto_session: Session | BotoEnhanced,
+    region: str,
+    instance_ids: List[str],
+    document: str,
+    commands: List[str],
+    max_concurrency: str,
+    max_errors: str,
+    timeout: int,
+) -> str | None:
+    """Runs :param:`commands` on up to 50 Instances with an AWS-RunShellScript-like :param:`document`. Returns the
+    command ID."""
+    ssm_client = boto_session.client("ssm", region_name=region)
+    response = ssm_client.send_command(
+        InstanceIds=instance_ids,
+        DocumentName=document,
+        Comment=SESSION_REASON,
+        Parameters={"commands": commands, "executionTimeout": [str(timeout)]},
+        MaxConcurrency=max_concurrency,
+        MaxErrors=max_errors,
+    )
+    return response["Command"]["CommandId"] if response else None
+
+
+def cancel_command(boto_session: Session | BotoEnhanced, region: str, command_id: str) -> bool:
+    """Cancels :param:`command_id` on the Instances it has not yet run on. Returns whether it was cancelled."""
+    ssm_client = boto_session.client("ssm", region_name=region)
+    return bool(ssm_client.cancel_command(CommandId=command_id))
+
+
+def list_command_invocations(boto_session: Session | BotoEnhanced, region: str, command_id: str) -> List[dict]:
+    """Returns the invocation of :param:`command_id` on every Instance it targets, including output, in as few calls
+    as possible."""
+    ssm_client = boto_session.client("ssm", region_name=region)
+    paginator = ssm_client.get_paginator("list_command_invocations")
+    invocations = []
+    try:
+        for page in paginator.paginate(CommandId=command_id, Details=True):
+            invocations.extend(page["CommandInvocations"])
+    except (exceptions.ClientError, exceptions.BotoCoreError) as ex:
+        LOGGER.error(f"Could not get invocations of command {command_id}. Error: {ex}")
+    return invocations
+
+
+def terminate_sessions(boto_session: Session | BotoEnhanced, instance: Instance, ssm_sessions: List[dict]):
+    terminate_session_ids(boto_session, instance.region, [session["SessionId"] for session in ssm_sessions])
+
+
+def terminate_session_ids(boto_session: Session | BotoEnhanced, region: str, session_ids: List[str]):
+    ssm_client = boto_session.client("ssm", region_name=region)
+    for session_id in session_ids:
+        ssm_client.terminate_session(SessionId=session_id)
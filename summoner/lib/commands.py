@@ -0,0 +1,159 @@
+import logging
+import math
+import time
+from collections import defaultdict, deque
+from typing import Dict, Iterator, List, Tuple
+
+from boto3 import Session
+
+from summoner.lib.boto import (
+    SEND_COMMAND_TARGETS_LIMIT,
+    BotoEnhanced,
+    cancel_command,
+    get_ping_statuses,
+    list_command_invocations,
+    send_command,
+)
+from summoner.lib.instance import Instance
+
+LOGGER = logging.getLogger()
+
+# Refer to, https://docs.aws.amazon.com/systems-manager/latest/userguide/monitor-commands.html
+TERMINAL_STATUSES = {
+    "Success",
+    "Failed",
+    "TimedOut",
+    "Cancelled",
+    "Undeliverable",
+    "Terminated",
+    "DeliveryTimedOut",
+    "ExecutionTimedOut",
+    "InvalidPlatform",
+    "AccessDenied",
+}
+
+POLL_INTERVAL_MIN = 1
+POLL_INTERVAL_MAX = 10
+POLL_INTERVAL_BACKOFF = 1.5
+
+# Commands which haven't been delivered within this many seconds of their execution timeout are given up on
+DELIVERY_GRACE = 300
+
+
+def default_document(instance: Instance) -> str:
+    return "AWS-RunPowerShellScript" if instance.connection_type == "rdp" else "AWS-RunShellScript"
+
+
+def command_limit(value: str, total: int) -> int:
+    """Returns a MaxConcurrency or MaxErrors :param:`value`, as a count or a percentage of :param:`total` Instances,
+    as a count."""
+    if value.endswith("%"):
+        return math.ceil(float(value[:-1]) / 100 * total)
+    return int(value)
+
+
+def run_command(
+    boto_session: Session | BotoEnhanced,
+    instances: List[Instance],
+    commands: List[str],
+    document: str | None = None,
+    max_concurrency: str = "50",
+    max_errors: str = "10%",
+    timeout: int = 600,
+) -> Iterator[Tuple[Instance, dict]]:
+    """Runs :param:`commands` on every Instance with SendCommand, and yields each Instance with its invocation as it
+    completes. Instances are sent one command per region and document, in batches of up to 50, and each batch is
+    polled with a single ListCommandInvocations call. Windows (rdp) Instances run PowerShell unless :param:`document`
+    is given. Instances whose SSM agent is not online are yielded as Undeliverable without being sent the command, as
+    SendCommand rejects a whole batch for one of them.
+
+    :param:`max_concurrency` and :param:`max_errors` are counts or percentages of every Instance sent the command, and
+    apply across all batches. Batches are only sent while fewer than :param:`max_concurrency` Instances are running
+    the command, and once more than :param:`max_errors` have failed, running commands are cancelled and the remaining
+    Instances are yielded as Cancelled.
+    """
+    ping_statuses = {region: get_ping_statuses(boto_session, region) for region in {i.region for i in instances}}
+    groups = defaultdict(list)
+    for instance in instances:
+        # If the ping statuses could not be listed, the command is sent anyway
+        statuses = ping_statuses[instance.region]
+        if statuses is not None and (status := statuses.get(instance.instance_id)) != "Online":
+            yield instance, {"Status": "Undeliverable", "StatusDetails": f"SSM agent is {status or 'not registered'}."}
+            continue
+        groups[(instance.region, document or default_document(instance))].append(instance)
+
+    # Instances waiting to be sent, in order of region and document so batches are as full as possible
+    queue = deque((key, instance) for key, group in groups.items() for instance in group)
+    concurrency = max(1, command_limit(max_concurrency, len(queue)))
+    allowed_errors = command_limit(max_errors, len(queue))
+    running = errors = 0
+    cancelled = False
+
+    # Command ID => (region, pending Instances by Instance ID, deadline)
+    pending: Dict[str, Tuple[str, Dict[str, Instance], float]] = {}
+    delay = POLL_INTERVAL_MIN
+    while queue or pending:
+        while queue and running < concurrency:
+            (region, group_document), _ = queue[0]
+            batch = {}
+            size = min(SEND_COMMAND_TARGETS_LIMIT, concurrency - running)
+            while queue and queue[0][0] == (region, group_document) and len(batch) < size:
+                instance = queue.popleft()[1]
+                batch[instance.instance_id] = instance
+
+            # Every Instance in the batch fits within the concurrency limit, while SSM stops the batch itself once
+            # the errors left are used up
+            command_id = send_command(
+                boto_session,
+                region,
+                list(batch),
+                group_document,
+                commands,
+                str(len(batch)),
+                str(allowed_errors - errors),
+                timeout,
+            )
+            if command_id:
+                LOGGER.debug(f"Sent command {command_id} to {len(batch)} Instances in {region}.")
+                pending[command_id] = (region, batch, time.monotonic() + timeout + DELIVERY_GRACE)
+                running += len(batch)
+                delay = POLL_INTERVAL_MIN
+            else:
+                for instance in batch.values():
+                    yield instance, {"Status": "Undeliverable", "StatusDetails": "SendCommand failed."}
+        if not pending:
+            continue
+
+        time.sleep(delay)
+        delay = min(delay * POLL_INTERVAL_BACKOFF, POLL_INTERVAL_MAX)
+
+        for command_id, (region, batch, deadline) in list(pending.items()):
+            for invocation in list_command_invocations(boto_session, region, command_id):
+                if invocation["Status"] in TERMINAL_STATUSES and invocation["InstanceId"] in batch:
+                    running -= 1
+                    errors += invocation["Status"] not in ("Success", "Cancelled")
+                    yield batch.pop(invocation["InstanceId"]), invocation
+
+            if batch and time.monotonic() > deadline:
+                for instance in batch.values():
+                    yield instance, {"Status": "TimedOut", "StatusDetails": "No result before the deadline."}
+                running -= len(batch)
+                errors += len(batch)
+                batch.clear()
+            if not batch:
+                del pending[command_id]
+
+        if not cancelled and errors > allowed_errors and (queue or pending):
+            LOGGER.warning(f"{errors} Instances failed, more than the {allowed_errors} allowed. Cancelling the rest.")
+            for command_id, (region, _, _) in pending.items():
+                cancel_command(boto_session, region, command_id)
+            for _, instance in queue:
+                yield instance, {"Status": "Cancelled", "StatusDetails": "Too many Instances failed."}
+            queue.clear()
+            # Cancelled invocations are reported by the next polls
+            cancelled = True
+
+
+def invocation_output(invocation: dict) -> str:
+    """Returns the output of an invocation, which SSM truncates to 2500 characters."""
+    return "\n".join(plugin.get("Output", "") for plugin in invocation.get("CommandPlugins", [])).rstrip()
@@ -1,14 +1,24 @@
-import os
+import getpass
 from pathlib import Path
 
 BASE_PATH = Path(__file__).parent.absolute()
-RDP_TEMPLATE = Path(BASE_PATH, "defaults", "Default.rdp")
+RDP_TEMPLATE = Path(BASE_PATH.parent, "conf", "Default.rdp")
 SUMMONER_FOLDER = Path(Path.home(), ".summoner")
-VNC_TEMPLATE = Path(BASE_PATH, "defaults", "Default.rdp")
+VNC_TEMPLATE = Path(BASE_PATH.parent, "conf", "Default.vnc")
+
+LOCAL_PORT_RANGE = range(50000, 60000)
+SSM_ENGINES = ["plugin", "native"]
+SESSION_REASON = "Summoner Session"
+SSH_DOCUMENT = "AWS-StartSSHSession"
+
+# Instance states which can be connected to, or started and then connected to
+INSTANCE_STATES = ["pending", "running", "stopping", "stopped"]
+# Reported in place of a state when it could not be described, e.g. the API call was throttled
+UNKNOWN_STATE = "unknown"
 
 DEFAULT_INSTANCE = {
     "name": "default",
-    "username": os.getlogin(),
+    "username": getpass.getuser(),
     "domain": "create.alt.delete",
     "region": "us-west-1",
     "instance_id": "i-01234567890abcdef",
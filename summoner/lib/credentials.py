@@ -0,0 +1,47 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from summoner.lib.const import SUMMONER_FOLDER
+
+LOGGER = logging.getLogger()
+
+CREDENTIALS_FOLDER = Path(SUMMONER_FOLDER, "credentials")
+
+
+def _cache_path(profile_name: str | None, role_arn: str) -> Path:
+    key = hashlib.sha256(f"{profile_name}|{role_arn}".encode()).hexdigest()[:32]
+    return Path(CREDENTIALS_FOLDER, f"{key}.json")
+
+
+def remaining(credentials: dict) -> float:
+    """Returns how many seconds :param:`credentials` remain valid for."""
+    return (datetime.fromisoformat(credentials["expiry_time"]) - datetime.now(timezone.utc)).total_seconds()
+
+
+def load_credentials(profile_name: str | None, role_arn: str, min_remaining: float) -> dict | None:
+    """Returns cached credentials for the role, if they remain valid for at least :param:`min_remaining` seconds."""
+    path = _cache_path(profile_name, role_arn)
+    try:
+        credentials = json.loads(path.read_text())
+        if remaining(credentials) >= min_remaining:
+            return credentials
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as ex:
+        LOGGER.debug(f"Ignoring unreadable credential cache {path}. Error: {ex}")
+
+
+def save_credentials(profile_name: str | None, role_arn: str, credentials: dict):
+    """Caches credentials in a file only readable by the current user."""
+    CREDENTIALS_FOLDER.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path = _cache_path(profile_name, role_arn)
+    temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+
+    # Created with restricted permissions, rather than restricted after writing, so the file is never readable by others
+    with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f0:
+        json.dump(credentials, f0)
+    os.replace(temp_path, path)
@@ -0,0 +1,392 @@
+import asyncio
+import hashlib
+import json
+import logging
+import struct
+import time
+import uuid
+from threading import Lock, Thread
+from typing import Callable, Dict
+
+from summoner.lib.websocket import WebSocket, WebSocketClosed
+
+LOGGER = logging.getLogger()
+
+# Refer to, https://github.com/aws/session-manager-plugin/blob/mainline/src/message/clientmessage.go
+INPUT_STREAM_MESSAGE = "input_stream_data"
+OUTPUT_STREAM_MESSAGE = "output_stream_data"
+ACKNOWLEDGE_MESSAGE = "acknowledge"
+CHANNEL_CLOSED_MESSAGE = "channel_closed"
+START_PUBLICATION_MESSAGE = "start_publication"
+PAUSE_PUBLICATION_MESSAGE = "pause_publication"
+
+PAYLOAD_OUTPUT = 1
+PAYLOAD_HANDSHAKE_REQUEST = 5
+PAYLOAD_HANDSHAKE_RESPONSE = 6
+PAYLOAD_HANDSHAKE_COMPLETE = 7
+PAYLOAD_FLAG = 10
+
+FLAG_DISCONNECT_TO_PORT = 1
+FLAG_CONNECT_TO_PORT_ERROR = 3
+
+ACTION_SUCCESS = 1
+ACTION_UNSUPPORTED = 3
+
+# Agents multiplex connections for clients from 1.1.70 onwards, which this client does not implement. Reporting an
+# older version keeps the agent on basic port forwarding: one connection at a time per tunnel.
+CLIENT_VERSION = "1.1.61.0"
+
+# Same chunk size as the session-manager-plugin
+STREAM_DATA_PAYLOAD_SIZE = 1024
+KEEPALIVE_INTERVAL = 60
+
+# Retransmission follows the session-manager-plugin: messages are resent until the agent acknowledges them, after a
+# timeout derived from the measured round trip time. Times are in seconds.
+DEFAULT_ROUND_TRIP_TIME = 0.1
+DEFAULT_TRANSMISSION_TIMEOUT = 0.2
+MAX_TRANSMISSION_TIMEOUT = 1
+CLOCK_GRANULARITY = 0.01
+RTT_GAIN = 0.125
+RTT_VARIATION_GAIN = 0.25
+RESEND_INTERVAL = 0.1
+RESEND_MAX_ATTEMPTS = 3000
+OUTGOING_BUFFER_CAPACITY = 10000
+
+HEADER_LENGTH = 116
+HEADER_FORMAT = ">I32sIQqQ16s32sI"
+
+
+class DataChannelError(Exception):
+    pass
+
+
+class ClientMessage:
+    """A data channel message, serialized the same way as the session-manager-plugin's ClientMessage."""
+
+    def __init__(
+        self,
+        message_type: str,
+        payload: bytes = b"",
+        payload_type: int = 0,
+        sequence_number: int = 0,
+        flags: int = 0,
+        message_id: uuid.UUID | None = None,
+        created_date: int | None = None,
+        schema_version: int = 1,
+    ):
+        self.message_type = message_type
+        self.payload = payload
+        self.payload_type = payload_type
+        self.sequence_number = sequence_number
+        self.flags = flags
+        self.message_id = message_id or uuid.uuid4()
+        self.created_date = created_date or int(time.time() * 1000)
+        self.schema_version = schema_version
+
+    def serialize(self) -> bytes:
+        # UUIDs are written least significant half first
+        message_id = self.message_id.bytes[8:] + self.message_id.bytes[:8]
+        header = struct.pack(
+            HEADER_FORMAT,
+            HEADER_LENGTH,
+            self.message_type.ljust(32).encode(),
+            self.schema_version,
+            self.created_date,
+            self.sequence_number,
+            self.flags,
+            message_id,
+            hashlib.sha256(self.payload).digest(),
+            self.payload_type,
+        )
+        return header + struct.pack(">I", len(self.payload)) + self.payload
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "ClientMessage":
+        (
+            header_length,
+            message_type,
+            schema_version,
+            created_date,
+            sequence_number,
+            flags,
+            message_id,
+            digest,
+            payload_type,
+        ) = struct.unpack_from(HEADER_FORMAT, data)
+        (payload_length,) = struct.unpack_from(">I", data, header_length)
+        payload = data[header_length + 4 : header_length + 4 + payload_length]
+
+        message = cls(
+            message_type.decode().strip(" \x00"),
+            payload,
+            payload_type,
+            sequence_number,
+            flags,
+            uuid.UUID(bytes=message_id[8:] + message_id[:8]),
+            created_date,
+            schema_version,
+        )
+        if message.message_type in (INPUT_STREAM_MESSAGE, OUTPUT_STREAM_MESSAGE):
+            if hashlib.sha256(payload).digest() != digest:
+                raise DataChannelError(f"Payload digest mismatch on message {message.message_id}.")
+        return message
+
+
+class _Outgoing:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.sent_at = time.monotonic()
+        self.attempts = 1
+
+
+class DataChannel:
+    """The WebSocket data channel of one SSM session. Incoming stream messages are acknowledged and put back in
+    sequence order before being passed to :param:`on_message`. Outgoing stream messages are kept until the agent
+    acknowledges them, and resent if it doesn't."""
+
+    def __init__(self, stream_url: str, token_value: str):
+        self.stream_url = stream_url
+        self.token_value = token_value
+
+        self.websocket: WebSocket | None = None
+        self.publication_allowed = asyncio.Event()
+        self.publication_allowed.set()
+
+        self.round_trip_time = DEFAULT_ROUND_TRIP_TIME
+        self.round_trip_time_variation = 0.0
+        self.transmission_timeout = DEFAULT_TRANSMISSION_TIMEOUT
+
+        self._expected_sequence_number = 0
+        self._out_of_order = {}
+        self._sequence_number = 0
+        self._unacknowledged: Dict[int, _Outgoing] = {}
+        self._buffer_space = asyncio.Event()
+        self._buffer_space.set()
+        self._error: DataChannelError | None = None
+
+    async def open(self):
+        self.websocket = await WebSocket.connect(self.stream_url)
+        await self.websocket.send(
+            json.dumps(
+                {
+                    "MessageSchemaVersion": "1.0",
+                    "RequestId": str(uuid.uuid4()),
+                    "TokenValue": self.token_value,
+                    "ClientId": str(uuid.uuid4()),
+                    "ClientVersion": CLIENT_VERSION,
+                }
+            )
+        )
+
+    async def close(self):
+        if self.websocket:
+            await self.websocket.close()
+
+    async def send(self, payload: bytes, payload_type: int = PAYLOAD_OUTPUT):
+        await self.publication_allowed.wait()
+        while len(self._unacknowledged) >= OUTGOING_BUFFER_CAPACITY:
+            self._buffer_space.clear()
+            await self._buffer_space.wait()
+
+        message = ClientMessage(
+            INPUT_STREAM_MESSAGE,
+            payload,
+            payload_type,
+            self._sequence_number,
+            flags=1 if self._sequence_number == 0 else 0,
+        )
+        self._sequence_number += 1
+        data = message.serialize()
+        self._unacknowledged[message.sequence_number] = _Outgoing(data)
+        await self.websocket.send(data)  # type: ignore
+
+    @property
+    def unacknowledged(self) -> int:
+        """The number of sent messages the agent has not acknowledged yet."""
+        return len(self._unacknowledged)
+
+    def _on_acknowledge(self, content: dict):
+        if not (outgoing := self._unacknowledged.pop(content["AcknowledgedMessageSequenceNumber"], None)):
+            return  # Already acknowledged
+        self._buffer_space.set()
+
+        # Resent messages are left out, as it is unknown which attempt was acknowledged
+        if outgoing.attempts == 1:
+            rtt = time.monotonic() - outgoing.sent_at
+            self.round_trip_time_variation = (1 - RTT_VARIATION_GAIN) * self.round_trip_time_variation + (
+                RTT_VARIATION_GAIN * abs(self.round_trip_time - rtt)
+            )
+            self.round_trip_time = (1 - RTT_GAIN) * self.round_trip_time + RTT_GAIN * rtt
+            self.transmission_timeout = min(
+                self.round_trip_time + max(CLOCK_GRANULARITY, 4 * self.round_trip_time_variation),
+                MAX_TRANSMISSION_TIMEOUT,
+            )
+
+    async def _resend(self):
+        while True:
+            await asyncio.sleep(RESEND_INTERVAL)
+            for sequence_number in sorted(self._unacknowledged):
+                if not (outgoing := self._unacknowledged.get(sequence_number)):
+                    continue
+                if time.monotonic() - outgoing.sent_at < self.transmission_timeout:
+                    continue
+                if outgoing.attempts >= RESEND_MAX_ATTEMPTS:
+                    self._error = DataChannelError(
+                        f"Message {sequence_number} was not acknowledged after {RESEND_MAX_ATTEMPTS} attempts."
+                    )
+                    await self.websocket.close()  # type: ignore
+                    return
+
+                LOGGER.debug(f"Data channel: resending message {sequence_number}.")
+                outgoing.attempts += 1
+                outgoing.sent_at = time.monotonic()
+                try:
+                    await self.websocket.send(outgoing.data)  # type: ignore
+                except (WebSocketClosed, ConnectionError):
+                    return
+
+    async def _acknowledge(self, message: ClientMessage):
+        content = {
+            "AcknowledgedMessageType": message.message_type,
+            "AcknowledgedMessageId": str(message.message_id),
+            "AcknowledgedMessageSequenceNumber": message.sequence_number,
+            "IsSequentialMessage": True,
+        }
+        ack = ClientMessage(ACKNOWLEDGE_MESSAGE, json.dumps(content).encode(), flags=3)
+        await self.websocket.send(ack.serialize())  # type: ignore
+
+    async def listen(self, on_message: Callable):
+        """Passes each incoming stream message to the :param:`on_message` coroutine until the channel is closed.
+        Raises DataChannelError if the agent stopped acknowledging messages."""
+        keepalive = asyncio.create_task(self._keepalive())
+        resend = asyncio.create_task(self._resend())
+        try:
+            while True:
+                data = await self.websocket.recv()  # type: ignore
+                if isinstance(data, str):
+                    LOGGER.debug(f"Data channel: {data}")
+                    continue
+
+                message = ClientMessage.deserialize(data)
+                if message.message_type == CHANNEL_CLOSED_MESSAGE:
+                    LOGGER.debug(f"Data channel closed: {message.payload.decode(errors='replace')}")
+                    return
+                elif message.message_type == PAUSE_PUBLICATION_MESSAGE:
+                    self.publication_allowed.clear()
+                elif message.message_type == START_PUBLICATION_MESSAGE:
+                    self.publication_allowed.set()
+                elif message.message_type == ACKNOWLEDGE_MESSAGE:
+                    self._on_acknowledge(json.loads(message.payload))
+                elif message.message_type == OUTPUT_STREAM_MESSAGE:
+                    await self._acknowledge(message)
+                    if message.sequence_number < self._expected_sequence_number:
+                        continue  # Redelivery of a message which has already been handled
+                    self._out_of_order[message.sequence_number] = message
+                    while next_message := self._out_of_order.pop(self._expected_sequence_number, None):
+                        self._expected_sequence_number += 1
+                        await on_message(next_message)
+        except WebSocketClosed as ex:
+            LOGGER.debug(f"Data channel: {ex}")
+            if self._error:
+                raise self._error
+        finally:
+            keepalive.cancel()
+            resend.cancel()
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            await self.websocket.ping()  # type: ignore
+
+
+class PortForwardingSession:
+    """Forwards connections to a local port over the data channel of an AWS-StartPortForwardingSession session,
+    in place of the session-manager-plugin. :param:`on_ready` is called once the local port accepts connections."""
+
+    def __init__(self, stream_url: str, token_value: str, local_port: int, on_ready: Callable | None = None):
+        self.channel = DataChannel(stream_url, token_value)
+        self.local_port = local_port
+        self.on_ready = on_ready
+
+        self._connection: asyncio.StreamWriter | None = None
+        self._server: asyncio.Server | None = None
+
+    async def run(self):
+        """Runs the session until the data channel closes."""
+        await self.channel.open()
+        try:
+            await self.channel.listen(self._on_message)
+        finally:
+            if self._server:
+                self._server.close()
+            if self._connection:
+                self._connection.close()
+            await self.channel.close()
+
+    async def _on_message(self, message: ClientMessage):
+        if message.payload_type == PAYLOAD_OUTPUT:
+            if self._connection:
+                self._connection.write(message.payload)
+                await self._connection.drain()
+        elif message.payload_type == PAYLOAD_HANDSHAKE_REQUEST:
+            await self._handshake(json.loads(message.payload))
+        elif message.payload_type == PAYLOAD_HANDSHAKE_COMPLETE:
+            self._server = await asyncio.start_server(self._on_connection, "127.0.0.1", self.local_port)
+            LOGGER.debug(f"Native SSM session waiting for connections on port {self.local_port}.")
+            if self.on_ready:
+                self.on_ready()
+        elif message.payload_type == PAYLOAD_FLAG:
+            if struct.unpack(">I", message.payload[:4])[0] == FLAG_CONNECT_TO_PORT_ERROR:
+                LOGGER.error("The SSM agent could not connect to the remote port.")
+
+    async def _handshake(self, request: dict):
+        processed_actions = []
+        for action in request.get("RequestedClientActions", []):
+            if action["ActionType"] == "SessionType":
+                processed_actions.append({"ActionType": "SessionType", "ActionStatus": ACTION_SUCCESS})
+            else:
+                LOGGER.error(f"Native SSM sessions do not support {action['ActionType']}.")
+                processed_actions.append(
+                    {
+                        "ActionType": action["ActionType"],
+                        "ActionStatus": ACTION_UNSUPPORTED,
+                        "Error": f"{action['ActionType']} is not supported by this client.",
+                    }
+                )
+
+        response = {"ClientVersion": CLIENT_VERSION, "ProcessedClientActions": processed_actions, "Errors": []}
+        await self.channel.send(json.dumps(response).encode(), PAYLOAD_HANDSHAKE_RESPONSE)
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Basic port forwarding only carries one connection at a time
+        if self._connection:
+            writer.close()
+            return
+
+        self._connection = writer
+        try:
+            while data := await reader.read(STREAM_DATA_PAYLOAD_SIZE):
+                await self.channel.send(data)
+        except ConnectionError:
+            pass
+        finally:
+            self._connection = None
+            writer.close()
+            try:
+                await self.channel.send(struct.pack(">I", FLAG_DISCONNECT_TO_PORT), PAYLOAD_FLAG)
+            except WebSocketClosed:
+                pass
+
+
+_LOOP = None
+_LOOP_LOCK = Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Returns the event loop shared by every native SSM session in this process, starting it if needed."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if not _LOOP:
+            _LOOP = asyncio.new_event_loop()
+            Thread(name="datachannel_loop_thread", target=_LOOP.run_forever, daemon=True).start()
+    return _LOOP
@@ -9,3 +9,38 @@ def method_decorator(decorator):
         return cls
 
     return wrapper
+
+
+class MethodProxy:
+    """Proxies :param:`obj`, wrapping its public methods with :param:`decorator` on first access. Wrappers are cached,
+    so each method is only wrapped once and methods which are never called are never wrapped."""
+
+    def __init__(self, obj, decorator):
+        self.__dict__["_obj"] = obj
+        self.__dict__["_decorator"] = decorator
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if name.startswith("_") or not isroutine(attr):
+            return attr
+
+        wrapped = self._decorator(self._obj)(attr)
+        self.__dict__[name] = wrapped
+        return wrapped
+
+    def __setattr__(self, name, value):
+        self.__dict__.pop(name, None)
+        setattr(self._obj, name, value)
+
+    def __dir__(self):
+        return dir(self._obj)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._obj!r})"
+
+
+def lazy_method_decorator(decorator):
+    def wrapper(obj):
+        return MethodProxy(obj, decorator)
+
+    return wrapper
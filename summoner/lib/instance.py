@@ -1,6 +1,5 @@
-from random import randint
-
 from summoner.conf.connection_types import CONNECTION_TYPES
+from summoner.lib.ports import allocate_port, release_port
 
 
 class Instance:
@@ -22,10 +21,30 @@ class Instance:
         self.connection_type = connection_type
         self.domain = domain
         self.username = username
-        self.local_port = local_port or randint(50000, 60000)
+        self._local_port = int(local_port) if local_port else None
+        self._port_allocated = False
 
         self.remote_port = self.connection_types[connection_type]  # type: ignore
 
+    @property
+    def local_port(self) -> int:
+        """The local port to forward. If none was given, one is allocated on first use."""
+        if self._local_port is None:
+            self._local_port = allocate_port(f"{self.region}/{self.instance_id}")
+            self._port_allocated = True
+        return self._local_port
+
+    def release_port(self):
+        """Releases an allocated local port, so it can be allocated again the next time it is needed."""
+        if self._port_allocated:
+            release_port(f"{self.region}/{self.instance_id}", self._local_port)  # type: ignore
+            self._local_port = None
+            self._port_allocated = False
+
+    def copy(self) -> "Instance":
+        """Returns a copy of this Instance without its local port, so a second tunnel to it gets a port of its own."""
+        return Instance(self.name, self.region, self.instance_id, self.connection_type, self.domain, self.username)
+
     @classmethod
     def add_connection_type(cls, name: str, port: int):
         cls.connection_types.update({name: port})
@@ -0,0 +1,177 @@
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, List
+
+from boto3 import Session
+
+from summoner.lib.boto import BotoEnhanced, get_ping_statuses, instance_filters, list_instances
+from summoner.lib.const import INSTANCE_STATES, SUMMONER_FOLDER
+
+LOGGER = logging.getLogger()
+
+INVENTORY_FILE = Path(SUMMONER_FOLDER, "inventory.db")
+
+# Every refresh lists the region again, which is one DescribeInstances call per 1000 Instances, so states are never
+# stale. SSM ping statuses cost a call of their own, so they are only fetched once this many seconds old.
+INVENTORY_TTL = 900
+
+COLUMNS = ["instance_id", "region", "name", "state", "platform", "vpc_id", "tags", "ping_status"]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    region TEXT NOT NULL,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    platform TEXT,
+    vpc_id TEXT,
+    tags TEXT,
+    ping_status TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS instances_region ON instances (region);
+CREATE TABLE IF NOT EXISTS regions (
+    region TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pinged_regions (
+    region TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+
+def matches(instance: dict, filters: List[dict]) -> bool:
+    """Returns whether :param:`instance` matches DescribeInstances :param:`filters`, as built by instance_filters."""
+    for instance_filter in filters:
+        name, values = instance_filter["Name"], instance_filter["Values"]
+        if name == "instance-state-name":
+            value = instance["state"]
+        elif name == "platform-details":
+            value = instance["platform"]
+        elif name == "vpc-id":
+            value = instance["vpc_id"]
+        elif name == "tag-key":
+            if not any(fnmatchcase(key, pattern) for key in instance["tags"] for pattern in values):
+                return False
+            continue
+        elif name.startswith("tag:"):
+            value = instance["tags"].get(name[4:])
+        else:
+            continue
+
+        if value is None or not any(fnmatchcase(value, pattern) for pattern in values):
+            return False
+    return True
+
+
+class Inventory:
+    """A local index of the fleet, so Instances can be listed without waiting on DescribeInstances. Each region is
+    refreshed in the background, and only rows which changed are written."""
+
+    def __init__(self, path: Path = INVENTORY_FILE, ttl: int = INVENTORY_TTL):
+        self.path = path
+        self.ttl = ttl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def refreshed_regions(self) -> Dict[str, float]:
+        """Returns when each indexed region was last fully listed."""
+        with closing(self._connect()) as db:
+            return {row["region"]: row["refreshed_at"] for row in db.execute("SELECT * FROM regions")}
+
+    def pinged_regions(self) -> Dict[str, float]:
+        """Returns when the SSM ping statuses of each indexed region were last fetched."""
+        with closing(self._connect()) as db:
+            return {row["region"]: row["refreshed_at"] for row in db.execute("SELECT * FROM pinged_regions")}
+
+    def instances(self, regions: List[str], filters: List[dict] | None = None) -> List[dict]:
+        """Returns the indexed Instances in :param:`regions` which match :param:`filters`, ordered by name."""
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM instances WHERE region IN ({', '.join('?' * len(regions))}) "
+                "ORDER BY name",
+                regions,
+            ).fetchall()
+
+        instances = [dict(row, tags=json.loads(row["tags"] or "{}")) for row in rows]
+        return [instance for instance in instances if matches(instance, filters or [])]
+
+    def update(self, instances: List[dict], region: str | None = None, complete: bool = False) -> int:
+        """Writes the Instances which differ from their indexed rows. Set :param:`complete` when :param:`instances`
+        is every Instance in :param:`region`, so that indexed Instances missing from it are removed. Returns the
+        number of rows changed."""
+        regions = {instance["region"] for instance in instances} | ({region} if region else set())
+        with closing(self._connect()) as db, db:
+            existing = {
+                row["instance_id"]: row
+                for row in db.execute(
+                    f"SELECT * FROM instances WHERE region IN ({', '.join('?' * len(regions))})", list(regions)
+                )
+            }
+
+            changed = []
+            for instance in instances:
+                old = existing.get(instance["instance_id"])
+                row = [instance.get(column) for column in COLUMNS]
+                row[COLUMNS.index("tags")] = json.dumps(instance.get("tags", {}), sort_keys=True)
+                if "ping_status" not in instance and old:
+                    # Ping statuses are only fetched by full refreshes
+                    row[COLUMNS.index("ping_status")] = old["ping_status"]
+                if not old or [old[column] for column in COLUMNS] != row:
+                    changed.append(row + [time.time()])
+
+            db.executemany(
+                f"INSERT OR REPLACE INTO instances ({', '.join(COLUMNS)}, updated_at) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                changed,
+            )
+
+            removed = []
+            if complete:
+                listed = {instance["instance_id"] for instance in instances}
+                removed = [(i,) for i, row in existing.items() if row["region"] == region and i not in listed]
+                db.executemany("DELETE FROM instances WHERE instance_id = ?", removed)
+                db.execute("INSERT OR REPLACE INTO regions VALUES (?, ?)", (region, time.time()))
+
+        return len(changed) + len(removed)
+
+    def remove(self, instance_ids: List[str]):
+        with closing(self._connect()) as db, db:
+            db.executemany("DELETE FROM instances WHERE instance_id = ?", [(i,) for i in instance_ids])
+
+    def refresh_region(self, boto_session: Session | BotoEnhanced, region: str, force: bool = False):
+        """Lists every Instance in :param:`region` again. SSM ping statuses are fetched too once they have expired, or
+        if :param:`force` is set, and are otherwise kept from the last time."""
+        # Terminated Instances are left out, as they can't be connected to
+        instances = list_instances(boto_session, region, instance_filters(states=INSTANCE_STATES + ["shutting-down"]))
+        if instances is None:
+            return
+
+        expired = force or time.time() - self.pinged_regions().get(region, 0) > self.ttl
+        if expired and (ping_statuses := get_ping_statuses(boto_session, region)) is not None:
+            for instance in instances:
+                instance["ping_status"] = ping_statuses.get(instance["instance_id"])
+            with closing(self._connect()) as db, db:
+                db.execute("INSERT OR REPLACE INTO pinged_regions VALUES (?, ?)", (region, time.time()))
+
+        changed = self.update(instances, region, complete=True)
+        LOGGER.debug(f"Refreshed the inventory of {region}: {changed} Instances changed.")
+
+    def refresh(self, boto_session: Session | BotoEnhanced, regions: List[str], force: bool = False):
+        """Refreshes :param:`regions` in parallel."""
+        with ThreadPoolExecutor(max_workers=min(len(regions), 8) or 1) as executor:
+            list(executor.map(lambda region: self.refresh_region(boto_session, region, force), regions))
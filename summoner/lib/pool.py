@@ -0,0 +1,156 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List
+
+from boto3 import Session
+
+from summoner.lib.boto import BotoEnhanced, get_fleet_status
+from summoner.lib.instance import Instance
+from summoner.lib.ssm import SSMPlugin
+
+LOGGER = logging.getLogger()
+
+
+class TunnelPool:
+    """Keeps ready tunnels to a set of favourite Instances, so connecting to them skips the status check and session
+    setup. Tunnels are built by :param:`factory`, and closed once they have been idle for :param:`ttl` seconds."""
+
+    def __init__(
+        self,
+        boto_session: Session | BotoEnhanced,
+        instances: List[Instance],
+        factory: Callable[[Instance], SSMPlugin],
+        ttl: int = 1800,
+    ):
+        self.boto_session = boto_session
+        self.instances = {instance.name: instance for instance in instances}
+        self.factory = factory
+        self.ttl = ttl
+
+        self.tunnels: Dict[str, SSMPlugin] = {}
+        self.last_used: Dict[str, float] = {}
+        self.checked_out = set()
+
+        self._lock = Lock()
+        self._open_locks = {name: Lock() for name in self.instances}
+        self._closed = Event()
+        Thread(name="tunnel_pool_reaper_thread", target=self._reap, daemon=True).start()
+
+    def manages(self, instance: Instance) -> bool:
+        return instance.name in self.instances
+
+    def warm(self):
+        """Opens tunnels in the background to every pooled Instance which is already running."""
+
+        def warm_all():
+            statuses = get_fleet_status(self.boto_session, list(self.instances.values()))
+            targets = [instance for instance in self.instances.values() if statuses[instance.instance_id] == "running"]
+            if not targets:
+                return
+
+            with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+                for target in targets:
+                    executor.submit(self._open, target, False)
+
+        Thread(name="tunnel_pool_warm_thread", target=warm_all, daemon=True).start()
+
+    def _open(self, instance: Instance, checkout: bool) -> SSMPlugin | None:
+        # One open at a time per Instance, so connecting during warm-up waits for the warm tunnel instead of racing it
+        with self._open_locks[instance.name]:
+            if instance.name in self.tunnels:
+                if not checkout:
+                    return
+                if tunnel := self.checkout(instance):
+                    return tunnel
+                with self._lock:
+                    in_use = instance.name in self.checked_out
+                if in_use:
+                    # Replacing a tunnel in use would orphan it, so this connection gets one of its own instead
+                    return self._open_unpooled(instance)
+
+            tunnel = self.factory(instance)
+            tunnel.start()
+            if not tunnel.is_ready():
+                LOGGER.debug(f"Could not open a pooled tunnel to {instance.name}.")
+                tunnel.stop()
+                return
+
+            with self._lock:
+                if self._closed.is_set():
+                    tunnel.stop()
+                    return
+
+                self.tunnels[instance.name] = tunnel
+                self.last_used[instance.name] = time.monotonic()
+                if checkout:
+                    self.checked_out.add(instance.name)
+
+        LOGGER.debug(f"Pooled tunnel to {instance.name} is ready on port {instance.local_port}.")
+        return tunnel
+
+    def _open_unpooled(self, instance: Instance) -> SSMPlugin | None:
+        target = instance.copy()
+        tunnel = self.factory(target)
+        tunnel.start()
+        if tunnel.is_ready():
+            LOGGER.debug(f"Pooled tunnel to {instance.name} is in use. Opened another on port {target.local_port}.")
+            return tunnel
+        tunnel.stop()
+
+    def open(self, instance: Instance) -> SSMPlugin | None:
+        """Opens a pooled tunnel to :param:`instance` and checks it out. If the pooled tunnel is already checked out,
+        a tunnel outside the pool is returned instead, which :meth:`checkin` stops."""
+        return self._open(instance, True)
+
+    def checkout(self, instance: Instance) -> SSMPlugin | None:
+        """Returns a ready tunnel to :param:`instance`, if there is one. Check it back in once the connection ends."""
+        with self._lock:
+            tunnel = self.tunnels.get(instance.name)
+            if not tunnel or instance.name in self.checked_out:
+                return
+
+            if tunnel.is_running() and tunnel.ready_for_connection.is_set():
+                self.checked_out.add(instance.name)
+                return tunnel
+
+        # The tunnel has died or is restarting, so drop it rather than make the user wait on it
+        self._remove(instance.name)
+
+    def checkin(self, instance: Instance, tunnel: SSMPlugin | None = None):
+        """Checks the pooled tunnel to :param:`instance` back in. If :param:`tunnel` is given and isn't the pooled one,
+        it is stopped instead."""
+        if tunnel and self.tunnels.get(instance.name) is not tunnel:
+            tunnel.stop()
+            return
+
+        with self._lock:
+            self.checked_out.discard(instance.name)
+            self.last_used[instance.name] = time.monotonic()
+
+    def _remove(self, name: str):
+        with self._lock:
+            tunnel = self.tunnels.pop(name, None)
+            self.last_used.pop(name, None)
+            self.checked_out.discard(name)
+        if tunnel:
+            tunnel.stop()
+
+    def _reap(self):
+        while not self._closed.wait(min(self.ttl / 4, 30)):
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    name
+                    for name, last_used in self.last_used.items()
+                    if name not in self.checked_out and now - last_used > self.ttl
+                ]
+            for name in idle:
+                LOGGER.debug(f"Closing pooled tunnel to {name} after {self.ttl}s idle.")
+                self._remove(name)
+
+    def close(self):
+        self._closed.set()
+        for name in list(self.tunnels):
+            self._remove(name)
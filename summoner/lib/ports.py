@@ -0,0 +1,72 @@
+import logging
+import os
+import socket
+import zlib
+from pathlib import Path
+from threading import Lock
+
+from summoner.lib.const import LOCAL_PORT_RANGE, SUMMONER_FOLDER
+from summoner.lib.store import locked_json, pid_alive
+
+LOGGER = logging.getLogger()
+
+LEASES_FILE = Path(SUMMONER_FOLDER, "ports.json")
+
+# Ports handed out by this process which the plugin may not have bound yet
+_CLAIMED = set()
+_CLAIMED_LOCK = Lock()
+
+
+def is_port_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+def _probe(start: int, skip: set) -> int:
+    """Returns the first free port at or after :param:`start`, wrapping around the local port range."""
+    for offset in range(len(LOCAL_PORT_RANGE)):
+        port = LOCAL_PORT_RANGE.start + (start - LOCAL_PORT_RANGE.start + offset) % len(LOCAL_PORT_RANGE)
+        if port not in skip and is_port_free(port):
+            return port
+    raise Exception(f"No free local ports between {LOCAL_PORT_RANGE.start} and {LOCAL_PORT_RANGE.stop}.")
+
+
+def allocate_port(key: str) -> int:
+    """Returns a free local port for :param:`key`, e.g. an Instance ID. Each key keeps a persistent lease, so it is
+    given the same port every time it is free. Otherwise, ports are probed in order from a position derived from the
+    key, skipping ports leased to other keys, so allocation is deterministic and safe across threads and processes."""
+    with locked_json(LEASES_FILE) as leases, _CLAIMED_LOCK:
+        # Ports borrowed by processes which have since exited are free again
+        for stale_key in [k for k, lease in leases.items() if lease.get("borrowed") and not pid_alive(lease["pid"])]:
+            del leases[stale_key]
+
+        leased = {lease["port"] for lease_key, lease in leases.items() if lease_key != key}
+        lease = leases.get(key)
+
+        if lease and (lease["port"] in _CLAIMED or (lease["pid"] != os.getpid() and pid_alive(lease["pid"]))):
+            # The lease is in use by another tunnel, so borrow a port without taking the lease over
+            port = _probe(lease["port"] + 1, leased | _CLAIMED | {lease["port"]})
+            leases[f"{key}@{os.getpid()}:{port}"] = {"port": port, "pid": os.getpid(), "borrowed": True}
+            LOGGER.debug(f"Port {lease['port']} is in use by process {lease['pid']}. Using {port} for {key}.")
+        else:
+            start = (
+                lease["port"] if lease else LOCAL_PORT_RANGE.start + zlib.crc32(key.encode()) % len(LOCAL_PORT_RANGE)
+            )
+            port = _probe(start, leased | _CLAIMED)
+            leases[key] = {"port": port, "pid": os.getpid()}
+
+        _CLAIMED.add(port)
+    return port
+
+
+def release_port(key: str, port: int):
+    """Releases :param:`port` once the tunnel using it is closed. The key's lease itself is kept for next time."""
+    with locked_json(LEASES_FILE) as leases, _CLAIMED_LOCK:
+        _CLAIMED.discard(port)
+        leases.pop(f"{key}@{os.getpid()}:{port}", None)
+        if (lease := leases.get(key)) and lease["port"] == port and lease["pid"] == os.getpid():
+            lease["pid"] = None
@@ -0,0 +1,176 @@
+import logging
+import shutil
+import socket
+import time
+from configparser import ConfigParser
+from io import StringIO
+from pathlib import Path
+from typing import Dict
+
+from summoner.lib.const import RDP_TEMPLATE, SUMMONER_FOLDER, VNC_TEMPLATE
+from summoner.lib.instance import Instance
+from summoner.lib.tracing import record
+
+LOGGER = logging.getLogger()
+
+PROFILES_FOLDER = Path(SUMMONER_FOLDER, "profiles")
+TEMPLATES = {"rdp": RDP_TEMPLATE, "vnc": VNC_TEMPLATE}
+
+RTT_SAMPLES = 3
+PROBE_TIMEOUT = 3
+
+# Handshake times are through the tunnel, so each includes the SSM data channel opening a stream as well as the round
+# trip itself. Anything slower than the last threshold is "slow", and a tunnel that could not be measured is "medium".
+RTT_TIERS = [(60, "fast"), (200, "medium")]
+DEFAULT_TIER = "medium"
+
+# X.224 Connection Request with an RDP Negotiation Request for TLS or CredSSP. The server answers with a Connection
+# Confirm before any credentials are exchanged.
+RDP_CONNECTION_REQUEST = bytes.fromhex("030000130ee000000000000100080003000000")
+
+# RDP file settings are name:type:value. connection type is 6 for LAN, 4 for high speed and 2 for low speed broadband.
+RDP_TIERS: Dict[str, Dict[str, str]] = {
+    "fast": {
+        "connection type:i": "6",
+        "session bpp:i": "32",
+        "compression:i": "1",
+        "bitmapcachepersistenable:i": "1",
+        "allow desktop composition:i": "1",
+        "allow font smoothing:i": "1",
+        "disable wallpaper:i": "0",
+        "disable full window drag:i": "0",
+        "disable menu anims:i": "0",
+        "disable themes:i": "0",
+    },
+    "medium": {
+        "connection type:i": "4",
+        "session bpp:i": "24",
+        "compression:i": "1",
+        "bitmapcachepersistenable:i": "1",
+        "allow desktop composition:i": "0",
+        "allow font smoothing:i": "1",
+        "disable wallpaper:i": "1",
+        "disable full window drag:i": "1",
+        "disable menu anims:i": "1",
+        "disable themes:i": "0",
+    },
+    "slow": {
+        "connection type:i": "2",
+        "session bpp:i": "16",
+        "compression:i": "1",
+        "bitmapcachepersistenable:i": "1",
+        "allow desktop composition:i": "0",
+        "allow font smoothing:i": "0",
+        "disable wallpaper:i": "1",
+        "disable full window drag:i": "1",
+        "disable menu anims:i": "1",
+        "disable themes:i": "1",
+    },
+}
+for _settings in RDP_TIERS.values():
+    # The tier is chosen here, so the client shouldn't renegotiate it
+    _settings.update({"networkautodetect:i": "0", "bandwidthautodetect:i": "0"})
+
+# TightVNC and UltraVNC viewer options. Encoding 7 is Tight, which compresses best.
+VNC_TIERS: Dict[str, Dict[str, str]] = {
+    "fast": {"preferred_encoding": "7", "compresslevel": "1", "quality": "8", "8bit": "0"},
+    "medium": {"preferred_encoding": "7", "compresslevel": "6", "quality": "6", "8bit": "0"},
+    "slow": {"preferred_encoding": "7", "compresslevel": "9", "quality": "3", "8bit": "1"},
+}
+
+
+def _rdp_handshake(sock: socket.socket):
+    sock.sendall(RDP_CONNECTION_REQUEST)
+    if not sock.recv(4):
+        raise ConnectionError("Connection closed before the Connection Confirm.")
+
+
+def _vnc_handshake(sock: socket.socket):
+    # VNC servers send their protocol version as soon as a client connects
+    if not sock.recv(12):
+        raise ConnectionError("Connection closed before the protocol version.")
+
+
+HANDSHAKES = {"rdp": _rdp_handshake, "vnc": _vnc_handshake}
+
+
+def measure_rtt(target: Instance, samples: int = RTT_SAMPLES) -> float | None:
+    """Times :param:`samples` pre-authentication handshakes with the RDP or VNC server through the open tunnel to
+    :param:`target`, each on a new connection, and returns the fastest in milliseconds. Returns None if none
+    completed."""
+    handshake = HANDSHAKES[target.connection_type]
+    start = time.time()
+    times = []
+    for _ in range(samples):
+        try:
+            with socket.create_connection(("localhost", target.local_port), timeout=PROBE_TIMEOUT) as sock:
+                started = time.perf_counter()
+                handshake(sock)
+                times.append((time.perf_counter() - started) * 1000)
+        except OSError as ex:
+            LOGGER.debug(f"RTT probe to {target.name} failed. Error: {ex}")
+
+    rtt = round(min(times), 1) if times else None
+    record("rtt_probe", start, time.time() - start, rtt_ms=rtt, samples=len(times))
+    return rtt
+
+
+def rtt_tier(rtt: float | None) -> str:
+    if rtt is None:
+        return DEFAULT_TIER
+    for threshold, tier in RTT_TIERS:
+        if rtt < threshold:
+            return tier
+    return "slow"
+
+
+def _read_template(path: Path) -> str:
+    # Templates copied by older versions, or saved by mstsc, are UTF-16
+    data = path.read_bytes()
+    return data.decode("utf-16") if data.startswith((b"\xff\xfe", b"\xfe\xff")) else data.decode("utf-8")
+
+
+def _apply_rdp(content: str, settings: Dict[str, str]) -> str:
+    lines = content.splitlines()
+    present = {line.rsplit(":", 1)[0].strip().lower() for line in lines if line.count(":") >= 2}
+    lines += [f"{key}:{value}" for key, value in settings.items() if key not in present]
+    # mstsc writes CRLF line endings
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _apply_vnc(content: str, settings: Dict[str, str]) -> str:
+    config = ConfigParser(interpolation=None)
+    config.optionxform = str  # type: ignore
+    config.read_string(content)
+    if not config.has_section("options"):
+        config.add_section("options")
+    for key, value in settings.items():
+        if not config.has_option("options", key):
+            config.set("options", key, value)
+
+    output = StringIO()
+    config.write(output, space_around_delimiters=False)
+    return output.getvalue()
+
+
+def render_profile(target: Instance, tier: str, **fields) -> Path:
+    """Renders the connection file for :param:`target` with the settings of :param:`tier` and :param:`fields` filled
+    in, e.g. the local port. The Instance's template in the Summoner folder is copied from the default on first use
+    and can be edited, and settings it already has take precedence over the tier's. The rendered file is only
+    rewritten when its content changes."""
+    kind = target.connection_type
+    PROFILES_FOLDER.mkdir(parents=True, exist_ok=True)
+    template = Path(SUMMONER_FOLDER, f"{target.name}.{kind}")
+    if not template.exists():
+        shutil.copyfile(TEMPLATES[kind], template)
+
+    content = _read_template(template).format(**fields)
+    if kind == "rdp":
+        content, encoding = _apply_rdp(content, RDP_TIERS[tier]), "utf-16"
+    else:
+        content, encoding = _apply_vnc(content, VNC_TIERS[tier]), "utf-8"
+
+    profile = Path(PROFILES_FOLDER, f"{target.name}.{kind}")
+    if not profile.exists() or _read_template(profile) != content:
+        profile.write_text(content, encoding=encoding, newline="")
+    return profile
@@ -0,0 +1,18 @@
+from importlib import import_module
+from typing import Callable
+
+
+class LazyRegistry(dict):
+    """A dict of callables which may also be given as dotted import paths, e.g. "summoner.connectors.ssh_connection".
+    Paths are imported on first lookup, so building the registry doesn't import what it refers to."""
+
+    def __getitem__(self, key) -> Callable:
+        value = super().__getitem__(key)
+        if isinstance(value, str):
+            module, _, name = value.rpartition(".")
+            value = getattr(import_module(module), name)
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
@@ -0,0 +1,79 @@
+import random
+import time
+from collections import deque
+from threading import Lock
+
+
+class Backoff:
+    """Exponential backoff with equal jitter: each delay is between half and all of the exponential step, so
+    restarting clients spread out without ever retrying immediately."""
+
+    def __init__(self, base: float = 1, cap: float = 60, multiplier: float = 2):
+        self.base = base
+        self.cap = cap
+        self.multiplier = multiplier
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        step = min(self.cap, self.base * self.multiplier**self.attempt)
+        self.attempt += 1
+        return step / 2 + random.uniform(0, step / 2)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class CircuitBreaker:
+    """Opens once :param:`max_failures` failures are recorded within :param:`window` seconds."""
+
+    def __init__(self, max_failures: int = 5, window: float = 300):
+        self.max_failures = max_failures
+        self.window = window
+        self.failures = deque()
+
+    @property
+    def is_open(self) -> bool:
+        now = time.monotonic()
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        return len(self.failures) >= self.max_failures
+
+    def record_failure(self) -> bool:
+        """Records a failure and returns whether the breaker is now open."""
+        self.failures.append(time.monotonic())
+        return self.is_open
+
+
+class TokenBucket:
+    """Allows :param:`rate` requests per second on average, in bursts of up to :param:`capacity`. Callers past the
+    limit are queued in order rather than refused. The rate halves each time requests are throttled, and recovers
+    gradually as they succeed."""
+
+    def __init__(self, rate: float, capacity: float | None = None, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity or rate * 2
+        self.tokens = self.capacity
+
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
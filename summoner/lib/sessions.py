@@ -0,0 +1,79 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from boto3 import Session
+
+from summoner.lib.boto import BotoEnhanced, get_caller_arn, get_user_sessions, terminate_session_ids
+from summoner.lib.const import SUMMONER_FOLDER
+from summoner.lib.instance import Instance
+from summoner.lib.store import locked_json, pid_alive
+
+LOGGER = logging.getLogger()
+
+SESSIONS_FILE = Path(SUMMONER_FOLDER, "sessions.json")
+# SSM sessions last at most this long, in seconds
+SESSION_MAX_AGE = 24 * 60 * 60
+
+
+def register_session(instance: Instance, session_id: str):
+    """Records that this process owns SSM session :param:`session_id`, so it is not swept while the process runs."""
+    with locked_json(SESSIONS_FILE) as sessions:
+        sessions[session_id] = {
+            "region": instance.region,
+            "instance_id": instance.instance_id,
+            "pid": os.getpid(),
+            "started": time.time(),
+        }
+
+
+def unregister_sessions(session_ids: Iterable[str]):
+    with locked_json(SESSIONS_FILE) as sessions:
+        for session_id in session_ids:
+            sessions.pop(session_id, None)
+
+
+def _dead_sessions(registry: dict) -> Dict[str, dict]:
+    return {session_id: entry for session_id, entry in registry.items() if not pid_alive(entry.get("pid"))}
+
+
+def sweep_stale_sessions(boto_session: Session | BotoEnhanced) -> List[str]:
+    """Terminates SSM sessions which this machine's registry records for Summoner processes that are no longer
+    running, e.g. after a crash. Sessions the registry doesn't record are never touched, as they may belong to the same
+    user, or role, on another machine. Each region with such sessions costs one filtered describe_sessions call.
+    Returns the IDs of the terminated sessions."""
+    with locked_json(SESSIONS_FILE) as registry:
+        if not (regions := {entry["region"] for entry in _dead_sessions(registry).values()}):
+            return []
+    if not (owner := get_caller_arn(boto_session)):
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(len(regions), 8)) as executor:
+        region_sessions = dict(zip(regions, executor.map(lambda r: get_user_sessions(boto_session, r, owner), regions)))
+
+        # Read again, as sessions registered while describing belong to running processes
+        with locked_json(SESSIONS_FILE) as registry:
+            dead = _dead_sessions(registry)
+        stale = {
+            region: [session["SessionId"] for session in sessions if session["SessionId"] in dead]
+            for region, sessions in region_sessions.items()
+            if sessions is not None
+        }
+        for region, session_ids in stale.items():
+            if session_ids:
+                LOGGER.info(f"Terminating {len(session_ids)} stale SSM sessions in {region}...")
+        stale_sessions = [(region, session_id) for region, session_ids in stale.items() for session_id in session_ids]
+        list(executor.map(lambda s: terminate_session_ids(boto_session, s[0], [s[1]]), stale_sessions))
+
+    terminated = {session_id for session_ids in stale.values() for session_id in session_ids}
+    with locked_json(SESSIONS_FILE) as registry:
+        # Dead entries which weren't active may be another account's, so they are only dropped once they are too old
+        # to be active at all
+        for session_id, entry in _dead_sessions(registry).items():
+            if session_id in terminated or time.time() - entry.get("started", 0) > SESSION_MAX_AGE:
+                del registry[session_id]
+
+    return sorted(terminated)
@@ -1,14 +1,79 @@
+import asyncio
 import json
 import logging
 import shutil
+import socket
 import subprocess
-from threading import Event, Thread
+import time
+from concurrent.futures import Future
+from threading import Event, Lock, Thread
+from typing import Literal
 
-from summoner.lib.boto import BotoEnhanced, get_sessions, start_session, terminate_sessions
+from summoner.lib.boto import (
+    BotoEnhanced,
+    BotoEnhancedException,
+    start_session,
+    start_ssh_session,
+    terminate_session_ids,
+    terminate_sessions,
+)
+from summoner.lib.const import SSH_DOCUMENT
+from summoner.lib.datachannel import DataChannelError, PortForwardingSession, get_event_loop
 from summoner.lib.instance import Instance
+from summoner.lib.resilience import Backoff, CircuitBreaker
+from summoner.lib.sessions import register_session, unregister_sessions
+from summoner.lib.supervisor import TunnelSupervisor, get_supervisor
+from summoner.lib.tracing import Trace, current_trace, record, span
+from summoner.lib.websocket import WebSocketClosed
 
 LOGGER = logging.getLogger()
 
+# Seconds to wait for a tunnel to be ready for connections, unless configured otherwise
+READY_TIMEOUT = 30
+# Seconds between connection attempts to the local port while waiting for the plugin to listen
+PROBE_INTERVAL = 0.1
+
+
+def plugin_command(
+    boto_session: BotoEnhanced, target: Instance, ssm_session: dict, parameters: dict | None = None
+) -> list:
+    # Build cmd to run session-manager-plugin in subprocess.
+    # Refer to, https://github.com/aws/session-manager-plugin/blob/mainline/src/sessionmanagerplugin/session/session.go
+    cmd = [
+        shutil.which("session-manager-plugin"),
+        json.dumps(ssm_session),
+        target.region,
+        "StartSession",
+        boto_session.profile_name,
+        json.dumps({"Target": target.instance_id, **(parameters or {})}),
+        f"https://ssm.{target.region}.amazonaws.com",
+    ]
+    LOGGER.debug(f"SSM plugin command set to:\n{cmd}")
+    return cmd
+
+
+def relay_stdio(boto_session: BotoEnhanced, target: Instance, port: int = 22) -> int:
+    """Relays stdin and stdout to :param:`port` on :param:`target`, with no local listener, e.g. as an OpenSSH
+    ProxyCommand. Returns the plugin's exit code."""
+    try:
+        if not (ssm_session := start_ssh_session(boto_session, target, port)):
+            return 1
+    except BotoEnhancedException as ex:
+        LOGGER.error(f"Could not start SSM session. Error: {ex}")
+        return 1
+    register_session(target, ssm_session["SessionId"])
+
+    try:
+        # Without a local port number, the plugin forwards its own stdin and stdout, which it inherits from this process
+        parameters = {"DocumentName": SSH_DOCUMENT, "Parameters": {"portNumber": [str(port)]}}
+        return subprocess.run(plugin_command(boto_session, target, ssm_session, parameters)).returncode
+    finally:
+        try:
+            terminate_session_ids(boto_session, target.region, [ssm_session["SessionId"]])
+        except BotoEnhancedException as ex:
+            LOGGER.debug(f"Could not terminate SSM session to {target.name}. Error: {ex}")
+        unregister_sessions([ssm_session["SessionId"]])
+
 
 class DummySubprocess:
     def poll(self):
@@ -18,18 +83,67 @@ class DummySubprocess:
         return
 
 
+class FutureProcess:
+    """Presents sessions running as a future or task on an event loop like a plugin subprocess."""
+
+    def __init__(self, future: Future | asyncio.Future):
+        self.future = future
+
+    def poll(self):
+        return 0 if self.future.done() else None
+
+    def kill(self):
+        self.future.cancel()
+
+
 class SSMPlugin:
-    def __init__(self, boto_session: BotoEnhanced, target: Instance) -> None:
+    def __init__(
+        self,
+        boto_session: BotoEnhanced,
+        target: Instance,
+        engine: Literal["plugin", "native"] = "plugin",
+        supervisor: TunnelSupervisor | None = None,
+        ready_timeout: float = READY_TIMEOUT,
+    ) -> None:
         self.boto_session = boto_session
         self.target = target
+        self.engine = engine
+        self.ready_timeout = ready_timeout
 
         self.ssm_plugin_process = DummySubprocess()
         self.ready_for_connection = Event()
         self.stopped_by_user = Event()
+        # Set once sessions are no longer being started or restarted
+        self.finished = Event()
+        self._ready_lock = Lock()
         self.ssm_sessions = []
 
-    def is_ready(self):
-        return self.ready_for_connection.wait(15)
+        # Restarts back off with jitter, and give up once sessions fail too often
+        self.backoff = Backoff()
+        self.circuit_breaker = CircuitBreaker()
+        self.circuit_open = Event()
+        self.restarts = 0
+        self.recovery_times = []
+        self._failed_at = None
+
+        # Connection phases are traced against the trace active when started, since sessions run on other threads
+        self.trace: Trace | None = None
+        self._session_started_at = None
+        self._spawned_at = None
+
+        # Only set when started with start_async
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ready_async: asyncio.Event | None = None
+        self._supervisor = supervisor
+
+    def is_ready(self, timeout: float | None = None) -> bool:
+        """Waits up to :param:`timeout` seconds, or the ready timeout, for the tunnel to be ready for connections.
+        Returns early if sessions stop being started, e.g. because the first could not be."""
+        deadline = time.monotonic() + (self.ready_timeout if timeout is None else timeout)
+        while not self.ready_for_connection.wait(min(PROBE_INTERVAL, max(0, deadline - time.monotonic()))):
+            if self.finished.is_set() or self.circuit_open.is_set() or time.monotonic() >= deadline:
+                return self.ready_for_connection.is_set()
+        return True
 
     def is_running(self):
         return self.ssm_plugin_process.poll() is None
@@ -37,50 +151,254 @@ class SSMPlugin:
     def stop(self):
         self.stopped_by_user.set()
         self.ssm_plugin_process.kill()
-        terminate_sessions(self.boto_session, self.target, self.ssm_sessions)
+        self._terminate(self.ssm_sessions)
+        self.ssm_sessions = []
+        self.target.release_port()
 
-    def start(self):
+        if self.restarts:
+            LOGGER.debug(
+                f"SSM session to {self.target.name} restarted {self.restarts} times. "
+                f"Recovery times: {', '.join(f'{t:.1f}s' for t in self.recovery_times) or 'none'}."
+            )
 
-        def ssm_plugin_thread():
-            while True:
-                # Clean up any existing SSM sessions to same instance existing sessions
-                existing_sessions = get_sessions(self.boto_session, self.target)
-                if existing_sessions:
-                    self.ssm_sessions.append(existing_sessions)
-                    terminate_sessions(self.boto_session, self.target, self.ssm_sessions)
+    def _set_ready(self, ready: bool = True):
+        with self._ready_lock:
+            if ready:
+                # Both the plugin output and the port probe report readiness, so only the first is acted on
+                if self.ready_for_connection.is_set():
+                    return
+                self.ready_for_connection.set()
+                if self._session_started_at:
+                    record("tunnel_ready", self._session_started_at, time.time() - self._session_started_at, self.trace)
+                    self._session_started_at = None
+                if self._failed_at:
+                    self.recovery_times.append(time.monotonic() - self._failed_at)
+                    LOGGER.info(f"SSM session to {self.target.name} recovered in {self.recovery_times[-1]:.1f}s.")
+                    self._failed_at = None
+                    self.backoff.reset()
+            else:
+                self.ready_for_connection.clear()
+
+            if self._loop and self._ready_async:
+                self._loop.call_soon_threadsafe(self._ready_async.set if ready else self._ready_async.clear)
+
+    def _on_plugin_output(self, line: str):
+        LOGGER.debug(f"session-manager-plugin: {line.rstrip()}")
+        if self._spawned_at:
+            record("plugin_spawn", self._spawned_at, time.time() - self._spawned_at, self.trace)
+            self._spawned_at = None
+        if "Cannot perform start session" in line:
+            LOGGER.error("Could not start SSM plugin.")
+        elif "Waiting for connections" in line:
+            self._set_ready()
+
+    def _probe_port(self, process: subprocess.Popen):
+        """Marks the tunnel ready as soon as the plugin accepts connections on the local port, in case its output
+        doesn't say so, or says so late. Gives up once the tunnel is ready, the plugin exits or the timeout passes."""
+        deadline = time.monotonic() + self.ready_timeout
+        while not self.ready_for_connection.is_set() and process.poll() is None and time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.target.local_port), timeout=1):
+                    pass
+            except OSError:
+                if self.stopped_by_user.wait(PROBE_INTERVAL):
+                    return
+                continue
+            LOGGER.debug(f"Tunnel to {self.target.name} accepted a connection on port {self.target.local_port}.")
+            self._set_ready()
+
+    async def _probe_port_async(self, process: asyncio.subprocess.Process):
+        deadline = time.monotonic() + self.ready_timeout
+        while not self.ready_for_connection.is_set() and process.returncode is None and time.monotonic() < deadline:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", self.target.local_port), 1)
+            except (OSError, TimeoutError):
+                await asyncio.sleep(PROBE_INTERVAL)
+                continue
+            writer.close()
+            LOGGER.debug(f"Tunnel to {self.target.name} accepted a connection on port {self.target.local_port}.")
+            self._set_ready()
 
+    def _plugin_command(self, ssm_session: dict):
+        return plugin_command(self.boto_session, self.target, ssm_session)
+
+    def _terminate(self, ssm_sessions: list):
+        try:
+            terminate_sessions(self.boto_session, self.target, ssm_sessions)
+        except BotoEnhancedException as ex:
+            LOGGER.debug(f"Could not terminate SSM sessions to {self.target.name}. Error: {ex}")
+        unregister_sessions(session["SessionId"] for session in ssm_sessions)
+
+    def _new_session(self):
+        # Sessions left by a previous run are swept at startup, and this plugin's own sessions from before a restart
+        # are terminated in the background, so neither delays the new session
+        if self.ssm_sessions:
+            previous_sessions, self.ssm_sessions = self.ssm_sessions, []
+            Thread(name="ssm_cleanup_thread", target=self._terminate, args=(previous_sessions,), daemon=True).start()
+
+        try:
+            with span("start_session", self.trace, restart=bool(self._failed_at)):
                 if not (ssm_session := start_session(self.boto_session, self.target)):
                     return
-                self.ssm_sessions.append(ssm_session)
-
-                # Build cmd to run session-manager-plugin in subprocess.
-                # Refer to, https://github.com/aws/session-manager-plugin/blob/mainline/src/sessionmanagerplugin/session/session.go
-                cmd = [
-                    shutil.which("session-manager-plugin"),
-                    json.dumps(self.ssm_sessions[-1]),
-                    self.target.region,
-                    "StartSession",
-                    self.boto_session.profile_name,
-                    json.dumps({"Target": self.target.instance_id}),
-                    f"https://ssm.{self.target.region}.amazonaws.com",
-                ]
-                LOGGER.debug(f"SSM plugin command set to:\n{cmd}")
-
-                with subprocess.Popen(
-                    cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
-                ) as self.ssm_plugin_process:
-                    for line in self.ssm_plugin_process.stdout:  # type: ignore
-                        LOGGER.debug(f"session-manager-plugin: {line.rstrip()}")
-                        if "Cannot perform start session" in line:
-                            LOGGER.error("Could not start SSM plugin.")
-                        elif "Waiting for connections" in line:
-                            self.ready_for_connection.set()
-
-                if self.stopped_by_user.is_set():
+        except BotoEnhancedException as ex:
+            LOGGER.error(f"Could not start SSM session. Error: {ex}")
+            return
+        self._session_started_at = time.time()
+        register_session(self.target, ssm_session["SessionId"])
+        self.ssm_sessions.append(ssm_session)
+        return ssm_session
+
+    def _restart_delay(self) -> float | None:
+        """Records an unexpected session end. Returns how long to wait before restarting, or None once the circuit
+        breaker has opened."""
+        self._set_ready(False)
+        self.restarts += 1
+        self._failed_at = self._failed_at or time.monotonic()
+
+        if self.circuit_breaker.record_failure():
+            LOGGER.error(
+                f"SSM session to {self.target.name} failed {self.circuit_breaker.max_failures} times within "
+                f"{self.circuit_breaker.window}s. Giving up."
+            )
+            self.circuit_open.set()
+            return
+
+        delay = self.backoff.next_delay()
+        LOGGER.warning(f"SSM session to {self.target.name} stopped unexpectedly. Restarting in {delay:.1f}s...")
+        return delay
+
+    async def _run_plugin(self, ssm_session: dict):
+        self._spawned_at = time.time()
+        process = await asyncio.create_subprocess_exec(
+            *self._plugin_command(ssm_session), stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        probe = asyncio.create_task(self._probe_port_async(process))
+        try:
+            async for line in process.stdout:  # type: ignore
+                self._on_plugin_output(line.decode(errors="replace"))
+            await process.wait()
+        finally:
+            probe.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def _run_native(self, ssm_session: dict):
+        native_session = PortForwardingSession(
+            ssm_session["StreamUrl"], ssm_session["TokenValue"], self.target.local_port, on_ready=self._set_ready
+        )
+        try:
+            await native_session.run()
+        except (DataChannelError, OSError, WebSocketClosed) as ex:
+            LOGGER.error(f"Native SSM session failed. Error: {ex}")
+        except Exception as ex:
+            # Anything else is a bug, but must not end the session loop without a trace
+            LOGGER.exception(f"Native SSM session failed unexpectedly. Error: {ex}")
+
+    async def _session_loop(self, supervisor: TunnelSupervisor | None = None):
+        """Runs sessions on the running event loop, restarting them until stopped by the user."""
+        try:
+            while True:
+                if supervisor:
+                    ssm_session = await supervisor.run_in_executor(self._new_session)
+                else:
+                    ssm_session = await asyncio.get_running_loop().run_in_executor(None, self._new_session)
+
+                if ssm_session:
+                    if self.engine == "native":
+                        await self._run_native(ssm_session)
+                    else:
+                        await self._run_plugin(ssm_session)
+                elif not self._failed_at:
+                    return  # The first session could not be started, which retrying won't fix
+
+                if self.stopped_by_user.is_set() or (delay := self._restart_delay()) is None:
                     break
-                LOGGER.warning("SSM Plugin stopped unexpectedly. Restarting...")
-                self.ready_for_connection.clear()
+                await asyncio.sleep(delay)
+        finally:
+            self.finished.set()
+
+    def start(self):
+        self.trace = current_trace()
+        self.finished.clear()
+        if self.engine == "native":
+            # Native sessions run on one event loop shared by every tunnel, rather than a thread and process each
+            self.ssm_plugin_process = FutureProcess(
+                asyncio.run_coroutine_threadsafe(self._session_loop(), get_event_loop())
+            )
+            return
+
+        def ssm_plugin_thread():
+            try:
+                while True:
+                    if ssm_session := self._new_session():
+                        self._spawned_at = time.time()
+                        with subprocess.Popen(
+                            self._plugin_command(ssm_session),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT,
+                            text=True,
+                        ) as self.ssm_plugin_process:
+                            Thread(
+                                name="ssm_probe_thread",
+                                target=self._probe_port,
+                                args=(self.ssm_plugin_process,),
+                                daemon=True,
+                            ).start()
+                            for line in self.ssm_plugin_process.stdout:  # type: ignore
+                                self._on_plugin_output(line)
+                    elif not self._failed_at:
+                        return  # The first session could not be started, which retrying won't fix
+
+                    if self.stopped_by_user.is_set() or (delay := self._restart_delay()) is None:
+                        break
+                    if self.stopped_by_user.wait(delay):
+                        break
+            finally:
+                self.finished.set()
 
         ssm_plugin = Thread(name="ssm_plugin_thread", target=ssm_plugin_thread)
         ssm_plugin.daemon = True
         ssm_plugin.start()
+
+    async def start_async(self, supervisor: TunnelSupervisor | None = None):
+        """Starts the plugin as a task on the running event loop, managed by :param:`supervisor`."""
+        self.trace = current_trace()
+        self._loop = asyncio.get_running_loop()
+        self._ready_async = asyncio.Event()
+        self._supervisor = supervisor or self._supervisor or get_supervisor()
+        self.stopped_by_user.clear()
+        self.circuit_open.clear()
+        self.finished.clear()
+        self.ssm_plugin_process = FutureProcess(self._supervisor.supervise(self))
+
+    async def ready_async(self, timeout: float | None = None) -> bool:
+        """Waits up to :param:`timeout` seconds, or the ready timeout, for the tunnel to be ready for connections."""
+        try:
+            await asyncio.wait_for(
+                self._ready_async.wait(), self.ready_timeout if timeout is None else timeout  # type: ignore
+            )
+        except TimeoutError:
+            return False
+        return True
+
+    async def stop_async(self):
+        self.stopped_by_user.set()
+        # Plugins which were never started have no task to cancel
+        self.ssm_plugin_process.kill()
+        if isinstance(task := getattr(self.ssm_plugin_process, "future", None), asyncio.Future):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._set_ready(False)
+
+        if self.ssm_sessions:
+            supervisor = self._supervisor or get_supervisor()
+            await supervisor.run_in_executor(self._terminate, self.ssm_sessions)
+        self.ssm_sessions = []
+        self.target.release_port()
+
+    async def restart_async(self):
+        await self.stop_async()
+        await self.start_async()
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock(f0):
+        f0.seek(0)
+        msvcrt.locking(f0.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(f0):
+        f0.seek(0)
+        msvcrt.locking(f0.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(f0):
+        fcntl.flock(f0, fcntl.LOCK_EX)
+
+    def _unlock(f0):
+        fcntl.flock(f0, fcntl.LOCK_UN)
+
+
+_THREAD_LOCKS = {}
+_THREAD_LOCKS_LOCK = Lock()
+
+
+@contextmanager
+def locked_json(path: Path):
+    """Yields the contents of a JSON object file with exclusive access across threads and processes. Changes made to
+    the yielded dict are written back atomically on exit."""
+    with _THREAD_LOCKS_LOCK:
+        thread_lock = _THREAD_LOCKS.setdefault(path, Lock())
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with thread_lock, open(path.with_suffix(".lock"), "a+") as lock_file:
+        _lock(lock_file)
+        try:
+            data = json.loads(path.read_text()) if path.exists() else {}
+            yield data
+
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_text(json.dumps(data, indent=2))
+            os.replace(temp_path, path)
+        finally:
+            _unlock(lock_file)
+
+
+def pid_alive(pid: int | None) -> bool:
+    """Returns whether a process with :param:`pid` is running."""
+    if not pid:
+        return False
+
+    if sys.platform == "win32":
+        import ctypes
+
+        # PROCESS_QUERY_LIMITED_INFORMATION. os.kill would terminate the process on Windows.
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if handle:
+            ctypes.windll.kernel32.CloseHandle(handle)
+        return bool(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+LOGGER = logging.getLogger()
+
+
+class TunnelSupervisor:
+    """Runs any number of tunnels as tasks on the running event loop. Blocking boto calls go to one bounded executor,
+    so thread count stays flat however many tunnels are open."""
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.tunnels = set()
+
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """The executor for blocking calls. It is created on first use, and again after a shutdown, so the shared
+        supervisor keeps working for tunnels opened later."""
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tunnel_supervisor")
+        return self._executor
+
+    async def run_in_executor(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def supervise(self, plugin) -> asyncio.Task:
+        """Starts the session loop of an SSMPlugin as a task."""
+        task = asyncio.create_task(plugin._session_loop(self), name=f"tunnel_{plugin.target.name}")
+        self.tunnels.add(plugin)
+        task.add_done_callback(lambda _: self.tunnels.discard(plugin))
+        return task
+
+    async def shutdown(self):
+        """Stops every supervised tunnel."""
+        await asyncio.gather(*(plugin.stop_async() for plugin in list(self.tunnels)), return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_SUPERVISOR = None
+
+
+def get_supervisor() -> TunnelSupervisor:
+    """Returns the supervisor shared by every async tunnel which wasn't given one."""
+    global _SUPERVISOR
+    if not _SUPERVISOR:
+        _SUPERVISOR = TunnelSupervisor()
+    return _SUPERVISOR
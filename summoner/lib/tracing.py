@@ -0,0 +1,128 @@
+import json
+import logging
+import math
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List
+
+from summoner.lib.const import SUMMONER_FOLDER
+
+LOGGER = logging.getLogger()
+
+TRACES_FILE = Path(SUMMONER_FOLDER, "traces.jsonl")
+# Once the file reaches this size, it replaces the previous one at traces.jsonl.1
+TRACES_MAX_BYTES = 5 * 1024 * 1024
+
+_CURRENT_TRACE: ContextVar["Trace | None"] = ContextVar("summoner_trace", default=None)
+_WRITE_LOCK = Lock()
+
+
+class Trace:
+    """Groups the spans of one connection. :param:`attributes`, e.g. the Instance and region, are added to each."""
+
+    def __init__(self, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started = time.time()
+        self.attributes = attributes
+
+
+def start_trace(**attributes) -> Trace:
+    """Starts a trace, which spans in this context are recorded against."""
+    trace = Trace(**attributes)
+    _CURRENT_TRACE.set(trace)
+    return trace
+
+
+def current_trace() -> Trace | None:
+    return _CURRENT_TRACE.get()
+
+
+def end_trace():
+    _CURRENT_TRACE.set(None)
+
+
+def record(name: str, start: float, duration: float, trace: Trace | None = None, **attributes):
+    """Appends a span to the traces file. Spans outside of a trace are not recorded."""
+    if not (trace := trace or _CURRENT_TRACE.get()):
+        return
+
+    line = {
+        "trace": trace.trace_id,
+        "span": name,
+        "start": round(start, 3),
+        "duration_ms": round(duration * 1000, 1),
+        **trace.attributes,
+        **attributes,
+    }
+    # Tracing must never get in the way of connecting
+    try:
+        with _WRITE_LOCK:
+            TRACES_FILE.parent.mkdir(exist_ok=True)
+            if TRACES_FILE.exists() and TRACES_FILE.stat().st_size > TRACES_MAX_BYTES:
+                TRACES_FILE.replace(TRACES_FILE.with_suffix(".jsonl.1"))
+            with open(TRACES_FILE, "a") as f0:
+                f0.write(json.dumps(line) + "\n")
+    except OSError as ex:
+        LOGGER.debug(f"Could not record span {name}. Error: {ex}")
+
+
+@contextmanager
+def span(name: str, trace: Trace | None = None, **attributes):
+    """Records how long the block takes as span :param:`name`, noting the type of any exception raised."""
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as ex:
+        attributes["error"] = type(ex).__name__
+        raise
+    finally:
+        record(name, start, time.perf_counter() - started, trace, **attributes)
+
+
+def load_spans(since: float | None = None) -> List[dict]:
+    spans = []
+    for path in (TRACES_FILE.with_suffix(".jsonl.1"), TRACES_FILE):
+        if not path.exists():
+            continue
+        for line in path.read_text().splitlines():
+            try:
+                recorded = json.loads(line)
+            except ValueError:
+                continue
+            if not since or recorded.get("start", 0) >= since:
+                spans.append(recorded)
+    return spans
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Returns the nearest-rank :param:`p` percentile of sorted :param:`values`."""
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def print_stats(days: float | None = None, by: str | None = None):
+    """Prints the count, p50, p95 and max duration of each span, optionally broken down by an attribute such as
+    region."""
+    spans = load_spans(time.time() - days * 86400 if days else None)
+    if not spans:
+        print(f"No traces recorded in {TRACES_FILE}.")
+        return
+
+    durations: Dict[tuple, List[float]] = defaultdict(list)
+    for recorded in spans:
+        durations[(recorded["span"], str(recorded.get(by, "-")) if by else "")].append(recorded["duration_ms"])
+
+    name_width = max(len(name) for name, _ in durations) + 2
+    group_width = max([len(by or "")] + [len(group) for _, group in durations]) + 2
+    print(f"{'span':<{name_width}}{by or '':<{group_width}}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}")
+    for (name, group), values in sorted(durations.items()):
+        values.sort()
+        print(
+            f"{name:<{name_width}}{group:<{group_width}}{len(values):>7}"
+            f"{percentile(values, 50):>11.1f}{percentile(values, 95):>11.1f}{values[-1]:>11.1f}"
+        )
@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import math
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Empty, Queue
+from threading import Lock
+from typing import List, Literal, Tuple
+
+from boto3 import Session
+
+from summoner.lib.boto import BotoEnhanced
+from summoner.lib.const import SUMMONER_FOLDER
+from summoner.lib.instance import Instance
+from summoner.lib.ssm import READY_TIMEOUT, SSMPlugin
+from summoner.lib.store import locked_json
+
+LOGGER = logging.getLogger()
+
+TRANSFERS_FOLDER = Path(SUMMONER_FOLDER, "transfers")
+
+# Each chunk is one SSH command over one tunnel. Larger chunks spend less time on SSH handshakes, but more is redone
+# when one is interrupted. Chunks must be a whole number of blocks.
+CHUNK_SIZE = 64 * 1024 * 1024
+BLOCK_SIZE = 1024 * 1024
+CHUNK_ATTEMPTS = 3
+DEFAULT_STREAMS = 4
+# How often a stream with nothing to copy checks for chunks requeued by a stream whose tunnel died
+STREAM_POLL_INTERVAL = 0.5
+
+
+class TransferError(Exception):
+    pass
+
+
+def split_remote(spec: str) -> Tuple[str | None, str]:
+    """Splits an scp-style NAME:PATH into the Instance name and path. Returns no name for local paths, including
+    Windows paths with a drive letter."""
+    name, sep, path = spec.partition(":")
+    if not sep or len(name) < 2 or "/" in name or "\\" in name:
+        return None, spec
+    return name, path
+
+
+class Transfer:
+    """Copies a file to or from :param:`instance` over :param:`streams` SSM tunnels at once. The file is split into
+    chunks which each stream sends with SSH and dd, so throughput isn't capped by a single SSM data channel. Completed
+    chunks are recorded, so an interrupted copy resumes where it stopped, and the whole file is checked with sha256
+    once copied."""
+
+    def __init__(
+        self,
+        boto_session: Session | BotoEnhanced,
+        instance: Instance,
+        local_path: Path,
+        remote_path: str,
+        direction: Literal["upload", "download"],
+        streams: int = DEFAULT_STREAMS,
+        chunk_size: int = CHUNK_SIZE,
+        engine: Literal["plugin", "native"] = "plugin",
+        ready_timeout: float = READY_TIMEOUT,
+    ):
+        if chunk_size % BLOCK_SIZE:
+            raise ValueError(f"Chunk size must be a multiple of {BLOCK_SIZE} bytes.")
+
+        self.boto_session = boto_session
+        self.instance = instance
+        self.local_path = local_path
+        # Remote commands run in the home folder, so paths relative to it need no expanding
+        self.remote_path = remote_path.removeprefix("~/")
+        self.direction = direction
+        self.streams = streams
+        self.chunk_size = chunk_size
+        self.engine = engine
+        self.ready_timeout = ready_timeout
+
+        self.tunnels: List[SSMPlugin] = []
+        self.bytes_copied = 0
+        self._lock = Lock()
+
+    def _ssh(self, tunnel: SSMPlugin, command: str, data: bytes | None = None) -> bytes:
+        ssh_target = f"{self.instance.username}@localhost" if self.instance.username else "localhost"
+        cmd = [
+            "ssh",
+            ssh_target,
+            "-p",
+            str(tunnel.target.local_port),
+            "-o",
+            "StrictHostKeyChecking=no",
+            "-o",
+            "UserKnownHostsFile=/dev/null",
+            # Streams run unattended, so prompting for a password would hang them
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            "LogLevel=ERROR",
+            command,
+        ]
+        result = subprocess.run(cmd, input=data, capture_output=True)
+        if result.returncode != 0:
+            raise TransferError(result.stderr.decode(errors="replace").strip() or f"ssh exited {result.returncode}")
+        return result.stdout
+
+    def _open_tunnel(self, _) -> SSMPlugin | None:
+        # Each tunnel needs its own local port, so each gets its own copy of the Instance
+        target = Instance(
+            self.instance.name, self.instance.region, self.instance.instance_id, "ssh", username=self.instance.username
+        )
+        tunnel = SSMPlugin(self.boto_session, target, self.engine, ready_timeout=self.ready_timeout)  # type: ignore
+        tunnel.start()
+        if tunnel.is_ready():
+            return tunnel
+        tunnel.stop()
+
+    def _state_path(self, size: int, mtime: float) -> Path:
+        key = "|".join(
+            [
+                self.instance.instance_id,
+                self.direction,
+                str(self.local_path.resolve()),
+                self.remote_path,
+                f"{size}|{mtime}",
+            ]
+        )
+        return Path(TRANSFERS_FOLDER, f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json")
+
+    def _copy_chunk(self, tunnel: SSMPlugin, index: int, size: int):
+        offset = index * self.chunk_size
+        length = min(self.chunk_size, size - offset)
+        remote = shlex.quote(self.remote_path)
+        blocks = f"bs={BLOCK_SIZE} count={math.ceil(length / BLOCK_SIZE)} iflag=fullblock status=none"
+        skip = offset // BLOCK_SIZE
+
+        if self.direction == "upload":
+            with open(self.local_path, "rb") as f0:
+                f0.seek(offset)
+                data = f0.read(length)
+            # Read the chunk back once written, so its checksum is of what landed on disk
+            output = self._ssh(
+                tunnel,
+                f"dd of={remote} bs={BLOCK_SIZE} seek={skip} conv=notrunc iflag=fullblock status=none && "
+                f"dd if={remote} skip={skip} {blocks} | sha256sum",
+                data,
+            )
+            if output.split()[0].decode() != hashlib.sha256(data).hexdigest():
+                raise TransferError(f"Chunk {index} did not match once written.")
+        else:
+            data = self._ssh(tunnel, f"dd if={remote} skip={skip} {blocks}")
+            if len(data) != length:
+                raise TransferError(f"Chunk {index} was {len(data)} bytes rather than {length}.")
+            with open(self.local_path, "r+b") as f0:
+                f0.seek(offset)
+                f0.write(data)
+
+        with self._lock:
+            self.bytes_copied += length
+
+    def _stream(self, tunnel: SSMPlugin, chunks: Queue, size: int, state_path: Path, total: int):
+        # Chunks are marked done only once copied or given up on, and requeued before that, so while any are
+        # unfinished a stream keeps waiting, in case a chunk is requeued by a stream whose tunnel died
+        while True:
+            try:
+                index, attempt = chunks.get(timeout=STREAM_POLL_INTERVAL)
+            except Empty:
+                if not chunks.unfinished_tasks:
+                    return
+                continue
+
+            try:
+                if not self._take_chunk(tunnel, chunks, index, attempt, size, state_path, total):
+                    return
+            finally:
+                chunks.task_done()
+
+    def _take_chunk(
+        self, tunnel: SSMPlugin, chunks: Queue, index: int, attempt: int, size: int, state_path: Path, total: int
+    ) -> bool:
+        """Copies chunk :param:`index`, requeueing it if it fails. Returns False if :param:`tunnel` died, so the stream
+        should stop."""
+        try:
+            if not tunnel.is_ready():
+                raise TransferError(f"Tunnel on port {tunnel.target.local_port} is not ready.")
+            self._copy_chunk(tunnel, index, size)
+        except (TransferError, OSError) as ex:
+            if not tunnel.is_ready():
+                # The chunk isn't at fault, so it is left for the other streams without counting an attempt
+                LOGGER.warning(f"Tunnel on port {tunnel.target.local_port} died. Error: {ex}")
+                chunks.put((index, attempt))
+                return False
+            if attempt + 1 >= CHUNK_ATTEMPTS:
+                LOGGER.error(f"Chunk {index} failed {CHUNK_ATTEMPTS} times. Error: {ex}")
+            else:
+                LOGGER.warning(f"Chunk {index} failed, retrying. Error: {ex}")
+                chunks.put((index, attempt + 1))
+            return True
+
+        with locked_json(state_path) as state:
+            state.setdefault("chunks", []).append(index)
+            done = len(state["chunks"])
+        LOGGER.info(f"{done}/{total} chunks copied.")
+        return True
+
+    def _remote_sha256(self, tunnel: SSMPlugin) -> str:
+        return self._ssh(tunnel, f"sha256sum {shlex.quote(self.remote_path)}").split()[0].decode()
+
+    def run(self) -> bool:
+        """Copies the file, resuming an earlier attempt if there was one. Returns whether the copy completed and its
+        checksums matched."""
+        with ThreadPoolExecutor(max_workers=self.streams) as executor:
+            self.tunnels = [tunnel for tunnel in executor.map(self._open_tunnel, range(self.streams)) if tunnel]
+        if not self.tunnels:
+            LOGGER.error(f"Could not open any tunnels to {self.instance.name}.")
+            return False
+        elif len(self.tunnels) < self.streams:
+            LOGGER.warning(f"Only {len(self.tunnels)} of {self.streams} tunnels opened. Continuing with those.")
+
+        try:
+            return self._run()
+        except TransferError as ex:
+            LOGGER.error(f"Could not copy {self.local_path}. Error: {ex}")
+            return False
+        finally:
+            for tunnel in self.tunnels:
+                tunnel.stop()
+
+    def _run(self) -> bool:
+        remote = shlex.quote(self.remote_path)
+        if self.direction == "upload":
+            stat = self.local_path.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+            # Sized up front, so chunks can be written in any order
+            self._ssh(self.tunnels[0], f"truncate -s {size} {remote}")
+        else:
+            size, mtime = (int(value) for value in self._ssh(self.tunnels[0], f"stat -c '%s %Y' {remote}").split())
+            with open(self.local_path, "ab") as f0:
+                f0.truncate(size)
+
+        state_path = self._state_path(size, mtime)
+        with locked_json(state_path) as state:
+            done = set(state.get("chunks", []))
+
+        total = math.ceil(size / self.chunk_size)
+        chunks = Queue()
+        for index in range(total):
+            if index not in done:
+                chunks.put((index, 0))
+        if done:
+            LOGGER.info(f"Resuming: {len(done)}/{total} chunks were already copied.")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.tunnels)) as executor:
+            for tunnel in self.tunnels:
+                executor.submit(self._stream, tunnel, chunks, size, state_path, total)
+        elapsed = time.perf_counter() - start
+
+        with locked_json(state_path) as state:
+            if missing := total - len(set(state.get("chunks", []))):
+                LOGGER.error(f"{missing} chunks could not be copied. Run the copy again to resume.")
+                return False
+
+        mib = self.bytes_copied / 1024 / 1024
+        LOGGER.info(
+            f"Copied {mib:.1f} MiB in {elapsed:.1f}s: {mib / max(elapsed, 0.001):.1f} MiB/s over "
+            f"{len(self.tunnels)} streams."
+        )
+
+        LOGGER.info("Verifying checksums...")
+        local_hash = hashlib.sha256()
+        with open(self.local_path, "rb") as f0:
+            while block := f0.read(BLOCK_SIZE):
+                local_hash.update(block)
+        state_path.unlink()
+        state_path.with_suffix(".lock").unlink(missing_ok=True)
+        if local_hash.hexdigest() != self._remote_sha256(self.tunnels[0]):
+            LOGGER.error("The copy's sha256 does not match the original. Run the copy again to start over.")
+            return False
+        return True
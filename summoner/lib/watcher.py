@@ -0,0 +1,111 @@
+import logging
+from concurrent.futures import Future, InvalidStateError
+from threading import Condition, Lock, Thread
+from typing import Dict, FrozenSet, List, Tuple
+
+from boto3 import Session
+
+from summoner.lib.boto import BotoEnhanced, get_fleet_status
+from summoner.lib.const import UNKNOWN_STATE
+from summoner.lib.instance import Instance
+
+LOGGER = logging.getLogger()
+
+# Poll quickly right after a state change is requested, then back off while nothing changes
+MIN_POLL_INTERVAL = 2
+MAX_POLL_INTERVAL = 15
+POLL_BACKOFF = 1.5
+
+# States an Instance never leaves, so waiting on them any longer is pointless. None means the Instance is gone.
+TERMINAL_STATES = {None, "terminated"}
+# Failed polls are retried, but a wait resolves to UNKNOWN_STATE once this many in a row have failed
+UNKNOWN_POLL_LIMIT = 20
+
+
+class StateWatcher:
+    """Waits on EC2 state changes with a single background thread. Every Instance being waited on is resolved by one
+    batched poll per interval."""
+
+    def __init__(self, boto_session: Session | BotoEnhanced):
+        self.boto_session = boto_session
+
+        self._condition = Condition()
+        self._interval = MIN_POLL_INTERVAL
+        self._thread = None
+        self._waiters: List[Tuple[Instance, FrozenSet[str], Future]] = []
+        self._unknown_polls: Dict[Future, int] = {}
+
+    def watch(self, instance: Instance, *states: str) -> Future:
+        """Returns a Future which resolves to the Instance state once it reaches one of :param:`states`, or a terminal
+        state. States which could not be described are polled again, up to UNKNOWN_POLL_LIMIT times in a row."""
+        future = Future()
+        with self._condition:
+            self._waiters.append((instance, frozenset(states), future))
+            self._interval = MIN_POLL_INTERVAL
+            self._condition.notify()
+
+            if not self._thread:
+                self._thread = Thread(name="state_watcher_thread", target=self._poll, daemon=True)
+                self._thread.start()
+        return future
+
+    def _poll(self):
+        while True:
+            with self._condition:
+                self._waiters = [waiter for waiter in self._waiters if not waiter[2].done()]
+                self._unknown_polls = {future: n for future, n in self._unknown_polls.items() if not future.done()}
+                if not self._waiters:
+                    self._thread = None
+                    return
+                waiters = list(self._waiters)
+
+            try:
+                self._resolve(waiters)
+            except Exception as ex:
+                # Fail the waits rather than leave them blocked forever. The next loop then drops them, and stops the
+                # thread unless there are new waits, so the next watch starts another.
+                LOGGER.error(f"Could not poll Instance states. Error: {ex}")
+                for _, _, future in waiters:
+                    try:
+                        future.set_exception(ex)
+                    except InvalidStateError:
+                        pass  # Resolved or cancelled already
+                continue
+
+            with self._condition:
+                if any(not future.done() for _, _, future in self._waiters):
+                    self._condition.wait(self._interval)
+                    self._interval = min(self._interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+
+    def _resolve(self, waiters: List[Tuple[Instance, FrozenSet[str], Future]]):
+        statuses = get_fleet_status(self.boto_session, [instance for instance, _, _ in waiters])
+        for instance, states, future in waiters:
+            status = statuses[instance.instance_id]
+            if status == UNKNOWN_STATE:
+                self._unknown_polls[future] = self._unknown_polls.get(future, 0) + 1
+                if self._unknown_polls[future] < UNKNOWN_POLL_LIMIT:
+                    continue
+                LOGGER.warning(f"Could not get the state of Instance {instance.name}. Giving up waiting on it.")
+            else:
+                self._unknown_polls.pop(future, None)
+
+            if status in states or status in TERMINAL_STATES or status == UNKNOWN_STATE:
+                LOGGER.debug(f"Instance {instance.name} reached state {status}.")
+                try:
+                    future.set_result(status)
+                except InvalidStateError:
+                    pass  # Cancelled by the caller
+
+
+_WATCHERS: Dict[Session | BotoEnhanced, StateWatcher] = {}
+_WATCHERS_LOCK = Lock()
+
+
+def wait_for_state(boto_session: Session | BotoEnhanced, instance: Instance, *states: str) -> Future:
+    """Returns a Future which resolves once the Instance reaches one of :param:`states`. Waits are shared with every
+    other Instance being waited on using the same session."""
+    with _WATCHERS_LOCK:
+        if boto_session not in _WATCHERS:
+            _WATCHERS[boto_session] = StateWatcher(boto_session)
+        watcher = _WATCHERS[boto_session]
+    return watcher.watch(instance, *states)
@@ -0,0 +1,163 @@
+import asyncio
+import base64
+import hashlib
+import os
+import ssl
+import struct
+from typing import Tuple
+from urllib.parse import urlsplit
+
+# https://datatracker.ietf.org/doc/html/rfc6455
+ACCEPT_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    def __init__(self, code: int | None = None, reason: str = ""):
+        super().__init__(f"WebSocket closed with code {code}. {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    if not payload:
+        return payload
+    repeated_key = (key * (len(payload) // 4 + 1))[: len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated_key, "big")).to_bytes(len(payload), "big")
+
+
+class WebSocket:
+    """A minimal asyncio WebSocket client. Only what the SSM data channel needs is supported: no extensions or
+    subprotocols."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+        self._write_lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, url: str, ssl_context: ssl.SSLContext | None = None) -> "WebSocket":
+        parts = urlsplit(url)
+        secure = parts.scheme == "wss"
+        reader, writer = await asyncio.open_connection(
+            parts.hostname,
+            parts.port or (443 if secure else 80),
+            ssl=(ssl_context or ssl.create_default_context()) if secure else None,
+        )
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        writer.write(
+            (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {parts.netloc}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        await writer.drain()
+
+        status = (await reader.readline()).decode(errors="replace").strip()
+        headers = {}
+        while (line := (await reader.readline()).decode(errors="replace").strip()) != "":
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if status.split(" ")[1:2] != ["101"]:
+            writer.close()
+            raise WebSocketClosed(reason=f"Upgrade failed: {status}")
+
+        accept = base64.b64encode(hashlib.sha1((key + ACCEPT_GUID).encode()).digest()).decode()
+        if headers.get("sec-websocket-accept") != accept:
+            writer.close()
+            raise WebSocketClosed(reason="Upgrade failed: invalid Sec-WebSocket-Accept.")
+
+        return cls(reader, writer)
+
+    async def _write_frame(self, opcode: int, payload: bytes):
+        if self.closed and opcode != OP_CLOSE:
+            raise WebSocketClosed(reason="Cannot write to a closed WebSocket.")
+
+        # Client frames are always masked
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([0x80 | len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack(">H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack(">Q", len(payload))
+
+        key = os.urandom(4)
+        async with self._write_lock:
+            self.writer.write(header + key + _mask(payload, key))
+            await self.writer.drain()
+
+    async def _read_frame(self) -> Tuple[bool, int, bytes]:
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack(">H", await self.reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack(">Q", await self.reader.readexactly(8))
+
+        key = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        return bool(first & 0x80), first & 0x0F, _mask(payload, key) if key else payload
+
+    async def send(self, data: bytes | str):
+        if isinstance(data, str):
+            await self._write_frame(OP_TEXT, data.encode())
+        else:
+            await self._write_frame(OP_BINARY, data)
+
+    async def ping(self, data: bytes = b""):
+        await self._write_frame(OP_PING, data)
+
+    async def recv(self) -> bytes | str:
+        """Returns the next message. Control frames are handled transparently."""
+        message_opcode, fragments = None, []
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError) as ex:
+                self.closed = True
+                raise WebSocketClosed(reason=str(ex))
+
+            if opcode == OP_PING:
+                await self._write_frame(OP_PONG, payload)
+                continue
+            elif opcode == OP_PONG:
+                continue
+            elif opcode == OP_CLOSE:
+                code = struct.unpack(">H", payload[:2])[0] if len(payload) >= 2 else None
+                if not self.closed:
+                    self.closed = True
+                    await self._write_frame(OP_CLOSE, payload[:2])
+                self.writer.close()
+                raise WebSocketClosed(code, payload[2:].decode(errors="replace"))
+
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                message = b"".join(fragments)
+                return message.decode() if message_opcode == OP_TEXT else message
+
+    async def close(self, code: int = 1000):
+        if not self.closed:
+            self.closed = True
+            try:
+                await self._write_frame(OP_CLOSE, struct.pack(">H", code))
+            except ConnectionError:
+                pass
+        self.writer.close()
@@ -1,26 +1,48 @@
 import logging
 import re
 import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser, NoOptionError, NoSectionError
 from pathlib import Path
-from typing import Literal
+from threading import Thread
+from typing import List, Literal
 
+from boto3 import Session
 from pick import pick
 
 from summoner.conf.connection_funcs import CONNECTION_FUNCS
 from summoner.evocation import Action, Evocation
-from summoner.lib.boto import BotoEnhanced, get_instance_status
-from summoner.lib.const import DEFAULT_INSTANCE, SUMMONER_FOLDER
+from summoner.lib.boto import (
+    FILTER_VALUES_LIMIT,
+    THROTTLE_COUNTS,
+    BotoEnhanced,
+    discover_fleet,
+    get_enabled_regions,
+    get_instance_status,
+    instance_filters,
+)
+from summoner.lib.commands import invocation_output, run_command
+from summoner.lib.const import DEFAULT_INSTANCE, LOCAL_PORT_RANGE, SSM_ENGINES, SUMMONER_FOLDER
 from summoner.lib.instance import Instance
-from summoner.util import get_instance, status_manager
+from summoner.lib.inventory import Inventory
+from summoner.lib.pool import TunnelPool
+from summoner.lib.sessions import sweep_stale_sessions
+from summoner.lib.ssm import READY_TIMEOUT, relay_stdio
+from summoner.lib.tracing import end_trace, span, start_trace
+from summoner.lib.transfer import CHUNK_SIZE, DEFAULT_STREAMS, Transfer, split_remote
+from summoner.util import bulk_manager, discover_instance, get_instance, get_instances, status_manager
 
 LOGGER = logging.getLogger()
 
+# Most Instance names listed when asking to confirm a fleet-wide action
+CONFIRM_LIST_LIMIT = 10
+
 
 class Summoner:
     def __init__(
         self,
-        mode: Literal["instance", "config", "select"],
+        mode: Literal["instance", "config", "select", "exec", "manage", "proxy", "cp"],
         config_file: Path | None = None,
         aws_profile: str | None = None,
         sts_arn: str | None = None,
@@ -30,6 +52,25 @@ class Summoner:
         domain: str | None = None,
         username: str | None = None,
         local_port: str | None = None,
+        tags: List[str] | None = None,
+        states: List[str] | None = None,
+        platforms: List[str] | None = None,
+        vpc_ids: List[str] | None = None,
+        names: List[str] | None = None,
+        command: str | None = None,
+        document: str | None = None,
+        max_concurrency: str = "50",
+        max_errors: str = "10%",
+        timeout: int = 600,
+        action: Literal["start", "stop", "reboot", "restart"] | None = None,
+        target: str | None = None,
+        port: int = 22,
+        source: str | None = None,
+        destination: str | None = None,
+        streams: int = DEFAULT_STREAMS,
+        chunk_size: int = CHUNK_SIZE,
+        yes: bool = False,
+        dry_run: bool = False,
     ):
         self.mode = mode
         if config_file:
@@ -38,56 +79,177 @@ class Summoner:
         self.base_instance = Instance
         self.boto_session = None
         self.connect_funcs = CONNECTION_FUNCS
+        self.engine = "plugin"
+        self.ready_timeout = READY_TIMEOUT
+        self.evocations = {}
         self.instances = []
+        self.pool = None
+        self.exit_code = 0
+
+        if self.mode in ("exec", "manage"):
+            if aws_profile:
+                # Target every matching Instance, rather than those in a config file. Without a filter that would be
+                # the whole account, so that has to be asked for with an explicit region.
+                if not region:
+                    if not (tags or states or platforms or vpc_ids or names):
+                        LOGGER.error("Give a filter, a name or a region to target. Use --region all for every region.")
+                        self.exit_code = 1
+                        return
+                    region = "all"
+                states = states or (["running"] if self.mode == "exec" else None)
+                filters = instance_filters(tags, states, platforms, vpc_ids)
+                if names and len(names) <= FILTER_VALUES_LIMIT and not any(n.startswith(("i-", "mi-")) for n in names):
+                    # Named Instances are looked up by Name tag, rather than listing every Instance to find them. An
+                    # Instance without a Name tag goes by its ID, so IDs still need every Instance listed.
+                    filters.append({"Name": "tag:Name", "Values": names})
+                self._load_fleet(aws_profile, sts_arn, region, filters)
+                names = names or [instance.name for instance in self.instances]
+            else:
+                self._load_config(warm=False)
+
+            if not (targets := self._targets(names)) or not self._confirm(targets, yes, dry_run):
+                return
+            names = [target.name for target in targets]
+            if self.mode == "exec":
+                failures = self.exec_command(
+                    command, names, document, max_concurrency, max_errors, timeout  # type: ignore
+                )
+            else:
+                failures = self.manage_instances(action, names)  # type: ignore
+            self.exit_code = 1 if failures else 0
+            return
+
+        if self.mode in ("proxy", "cp"):
+            if self.mode == "cp":
+                # Exactly one of the source and destination is on an Instance
+                target = split_remote(source)[0] or split_remote(destination)[0]  # type: ignore
+            if not target:
+                LOGGER.error("No Instance given. Give the remote path as NAME:PATH.")
+                self.exit_code = 1
+                return
+
+            if aws_profile:
+                # Look the target up by ID, or else by Name tag, in the profile's region unless one is given
+                is_id = target.startswith(("i-", "mi-"))
+                filters = instance_filters(None if is_id else [f"Name={target}"])
+                if is_id:
+                    filters.append({"Name": "instance-id", "Values": [target]})
+                region = region or Session(profile_name=aws_profile).region_name or "all"
+                self._load_fleet(aws_profile, sts_arn, region, filters)
+            elif self.config_file.exists():
+                self._load_config(warm=False)
+
+            if self.mode == "proxy":
+                self.exit_code = self.proxy(target, port)
+            else:
+                self.exit_code = self.copy(source, destination, username, streams, chunk_size)  # type: ignore
+            return
 
         if self.mode == "instance":
             self._load_instance(
                 aws_profile, sts_arn, region, instance_id, connection_type, domain, username, local_port
             )
         elif self.mode == "select":
-            self._load_selection(aws_profile, sts_arn, region)
+            self._load_selection(aws_profile, sts_arn, region, instance_filters(tags, states, platforms, vpc_ids))
+            if not self.instances:
+                # Nothing matched, or the user went back, so there is nothing for the menus to act on
+                return
         elif self.mode == "config":
             if self.config_file.exists():
                 self._load_config()
             else:
                 self.config_menu()
 
+        self._sweep_sessions()
         self.main_menu()
 
     def add_connection_type(self, name, func, port):
         self.base_instance.add_connection_type(name, port)
-        self.connect_funcs.update({name, func})
+        self.connect_funcs.update({name: func})
 
     def main_menu(self):
-        opt = ["Connect", "Manage", "Config", "Quit"]
+        opt = ["Connect", "Sessions", "Manage", "Config", "Quit"]
         while True:
             cat, _ = pick(opt, "What would you like to do?")
             if cat == "Connect":
                 self.connect_menu()
+            elif cat == "Sessions":
+                self.sessions_menu()
             elif cat == "Manage":
                 self.manage_menu()
             elif cat == "Config":
                 self.config_menu()
             elif cat == "Quit":
+                self.close_sessions(list(self.evocations))
+                if self.pool:
+                    self.pool.close()
+                if THROTTLE_COUNTS:
+                    LOGGER.debug(f"Requests throttled by AWS: {dict(THROTTLE_COUNTS)}")
                 break
 
-    def _load_selection(self, aws_profile, sts_arn, region):
-        self.boto_session = BotoEnhanced(region, aws_profile, sts_arn)
+    def _sweep_sessions(self):
+        """Terminates SSM sessions left behind by earlier runs, in the background so startup isn't delayed."""
+        if not self.boto_session:
+            return
+
+        Thread(
+            name="session_sweep_thread",
+            target=sweep_stale_sessions,
+            args=(self.boto_session,),
+            daemon=True,
+        ).start()
+
+    def _load_regions(self, aws_profile, sts_arn, region) -> List[str]:
+        """Starts the AWS session, and returns the regions to search. Several may be given, comma-separated, or "all"
+        for every enabled region."""
+        regions = [r.strip() for r in region.split(",") if r.strip()]
+        if regions == ["all"]:
+            self.boto_session = BotoEnhanced(
+                Session(profile_name=aws_profile).region_name or "us-east-1", aws_profile, sts_arn
+            )
+            return get_enabled_regions(self.boto_session)
+
+        self.boto_session = BotoEnhanced(regions[0], aws_profile, sts_arn)
+        return regions
+
+    def _load_fleet(self, aws_profile, sts_arn, region, filters):
+        regions = self._load_regions(aws_profile, sts_arn, region)
+
+        for page in discover_fleet(self.boto_session, regions, filters):  # type: ignore
+            for found in page:
+                connection_type = "rdp" if found["platform"].startswith("Windows") else "ssh"
+                self.instances.append(
+                    self.base_instance(found["name"], found["region"], found["instance_id"], connection_type)
+                )
+
+    def _load_selection(self, aws_profile, sts_arn, region, filters):
+        regions = self._load_regions(aws_profile, sts_arn, region)
 
-        ec2_client = self.boto_session.resource("ec2")
-        instance_ids = [instance.id for instance in ec2_client.instances.all()]  # type: ignore
-        instance_id, _ = pick(instance_ids + ["Quit"])
-        if instance_id == "Quit":
+        if not (selected := discover_instance(self.boto_session, regions, filters, Inventory())):
             return
 
-        connection_type, _ = pick(["rdp", "ssh", "vnc"])
+        # Offer the connection type most likely to suit the platform first
+        connection_types = list(self.base_instance.connection_types)
+        preferred = "rdp" if selected["platform"].startswith("Windows") else "ssh"
+        connection_types.sort(key=lambda connection_type: connection_type != preferred)
+        connection_type, _ = pick(connection_types)
         username = input("Enter username: ")
         domain = input("Enter domain: ")
         if local_port := input("Local port: "):
             local_port = int(local_port)
 
         try:
-            self.instances.append(self.base_instance("selected", region, instance_id, connection_type, domain, username, local_port))  # type: ignore
+            self.instances.append(
+                self.base_instance(
+                    selected["name"],
+                    selected["region"],
+                    selected["instance_id"],
+                    connection_type,  # type: ignore
+                    domain,
+                    username,
+                    local_port,  # type: ignore
+                )
+            )
         except AttributeError as ex:
             raise Exception(f"Could not parameterize Instance using provided args. Error {ex}")
 
@@ -101,15 +263,16 @@ class Summoner:
         except AttributeError as ex:
             raise Exception(f"Could not parameterize Instance using provided args. Error {ex}")
 
-    def _load_config(self):
-
+    def _load_config(self, warm: bool = True):
 
         config = ConfigParser()
         config.read(self.config_file)
 
         try:
             aws_profile = config.get("config-settings", "aws_profile")
-            sts_arn = config.get("config-settings", "sts_arn")
+            sts_arn = config.get("config-settings", "sts_arn", fallback=None)
+            self.engine = config.get("config-settings", "engine", fallback="plugin")
+            self.ready_timeout = config.getfloat("config-settings", "ready_timeout", fallback=READY_TIMEOUT)
             region = config.get(config.sections()[-1], "region")
         except (NoSectionError, NoOptionError):
             self.config_menu()
@@ -120,13 +283,33 @@ class Summoner:
         except KeyError as ex:
             raise Exception(f"No aws_profile setting in config! {ex}")
 
-        instances = []
+        self.instances = []
         for i in [i for i in config.sections() if i != "config-settings"]:
             try:
-                instances[i] = self.base_instance(**dict(config[i].items()))  # type: ignore
+                self.instances.append(self.base_instance(**dict(config[i].items())))  # type: ignore
             except AttributeError as ex:
                 LOGGER.exception(f"Invalid Instance, {i}. Error: {ex}")
 
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+
+        if not warm:
+            return
+
+        warm_pool = [name.strip() for name in config.get("config-settings", "warm_pool", fallback="").split(",")]
+        if pooled_instances := [instance for instance in self.instances if instance.name in warm_pool]:
+            self.pool = TunnelPool(
+                self.boto_session,  # type: ignore
+                pooled_instances,
+                self._evocation,
+                config.getint("config-settings", "warm_pool_ttl", fallback=1800),
+            )
+            self.pool.warm()
+
+    def _evocation(self, target: Instance) -> Evocation:
+        return Evocation(self.boto_session, target, self.engine, ready_timeout=self.ready_timeout)  # type: ignore
+
     def config_menu(self):
 
         def delete_instance(instance):
@@ -158,10 +341,13 @@ class Summoner:
             while True:
                 update = input(f" - Local Port (enter 'None' to unset) [{instance.get('local_port')}]: ")
                 if update and update != "None":
-                    if int(update) in range(50000, 60000):
+                    if int(update) in LOCAL_PORT_RANGE:
                         config.set(instance["name"], "local_port", update)
                         break
-                    print("Invalid port. Should be None or a number between 50000 and 60000.")
+                    print(
+                        f"Invalid port. Should be None or a number between {LOCAL_PORT_RANGE.start} and "
+                        f"{LOCAL_PORT_RANGE.stop}."
+                    )
                 elif update == "None":
                     config.remove_option(instance["name"], "local_port")
                     break
@@ -214,8 +400,50 @@ class Summoner:
                         break
                     print("Invalid STS ARN.")
                 elif update == "None":
-                    config.remove_option(instance["name"], "local_port")
+                    config.remove_option("config-settings", "sts_arn")
+                    break
+                else:
                     break
+
+            update = input(
+                " - Warm pool Instance names, comma separated (enter 'None' to unset) "
+                f"[{config['config-settings'].get('warm_pool')}]: "
+            )
+            if update and update != "None":
+                config.set("config-settings", "warm_pool", update)
+            elif update == "None":
+                config.remove_option("config-settings", "warm_pool")
+
+            while True:
+                ttl = config["config-settings"].get("warm_pool_ttl", 1800)
+                update = input(f" - Warm pool idle TTL seconds [{ttl}]: ")
+                if update:
+                    if update.isdigit():
+                        config.set("config-settings", "warm_pool_ttl", update)
+                        break
+                    print("Invalid TTL. Should be a number of seconds.")
+                else:
+                    break
+
+            while True:
+                engine = config["config-settings"].get("engine", "plugin")
+                update = input(f" - SSM engine (plugin or native) [{engine}]: ")
+                if update:
+                    if update.lower() in SSM_ENGINES:
+                        config.set("config-settings", "engine", update.lower())
+                        break
+                    print(f"Invalid SSM engine. Should be one of: {SSM_ENGINES}")
+                else:
+                    break
+
+            while True:
+                ready_timeout = config["config-settings"].get("ready_timeout", READY_TIMEOUT)
+                update = input(f" - Seconds to wait for tunnels to be ready [{ready_timeout}]: ")
+                if update:
+                    if update.replace(".", "", 1).isdigit():
+                        config.set("config-settings", "ready_timeout", update)
+                        break
+                    print("Invalid timeout. Should be a number of seconds.")
                 else:
                     break
 
@@ -256,28 +484,263 @@ class Summoner:
 
     def connect_menu(self):
         while True:
-            if not (target := get_instance(self.instances)):
+            if not (target := get_instance(self.instances, self.boto_session)):
                 break
 
+            connect_func = Action(self.connect_funcs[target.connection_type])  # type: ignore
+            trace = start_trace(instance=target.name, region=target.region, engine=self.engine)
+
+            # Warm tunnels skip the status check and session setup entirely
+            if self.pool and (evocation := self.pool.checkout(target)):
+                trace.attributes["warm"] = True
+                evocation.attach(connect_func)  # type: ignore
+                end_trace()
+                self.pool.checkin(target, evocation)
+                status_manager(self.boto_session, target)  # type: ignore
+                continue
+
             if self.mode == "instance":
                 stop_on_connection_end = get_instance_status(self.boto_session, target) == "stopped"  # type: ignore
             else:
                 stop_on_connection_end = False
 
-            if not status_manager(self.boto_session, target, connecting=True):  # type: ignore
+            with span("status_check"):
+                ready = status_manager(self.boto_session, target, connecting=True)  # type: ignore
+            if not ready:
+                end_trace()
                 break
 
-            connect_func = Action(self.connect_funcs[target.connection_type])  # type: ignore
-            Evocation(self.boto_session, target).connect(connect_func)  # type: ignore
+            if self.pool and self.pool.manages(target):
+                # Keep the tunnel open in the pool for next time
+                if evocation := self.pool.open(target):
+                    evocation.attach(connect_func)  # type: ignore
+                    self.pool.checkin(target, evocation)
+            else:
+                self._evocation(target).connect(connect_func)
+            end_trace()
 
             if stop_on_connection_end:
                 status_manager(self.boto_session, target, stopping=True)  # type: ignore
             else:
                 status_manager(self.boto_session, target)  # type: ignore
 
+    def _targets(self, names: List[str] | None = None) -> List[Instance]:
+        """Returns the Instances in :param:`names`, or those the user selects."""
+        if names:
+            targets = [instance for instance in self.instances if instance.name in names]
+            if missing := set(names) - {target.name for target in targets}:
+                LOGGER.warning(f"Unknown Instances: {', '.join(sorted(missing))}.")
+        else:
+            targets = get_instances(self.instances, self.boto_session)
+        if not targets:
+            LOGGER.error("No Instances selected.")
+        return targets
+
+    def _confirm(self, targets: List[Instance], yes: bool = False, dry_run: bool = False) -> bool:
+        """Lists :param:`targets` and asks the user whether to act on them, unless :param:`yes` is set. Returns False
+        for a :param:`dry_run`, or when there is no terminal to ask on."""
+        shown = ", ".join(target.name for target in targets[:CONFIRM_LIST_LIMIT])
+        more = f" and {len(targets) - CONFIRM_LIST_LIMIT} more" if len(targets) > CONFIRM_LIST_LIMIT else ""
+        print(f"{len(targets)} Instances targeted: {shown}{more}.")
+        if dry_run:
+            return False
+        if yes:
+            return True
+        if not sys.stdin.isatty():
+            LOGGER.error("Not running in a terminal to confirm on. Pass --yes to proceed.")
+            self.exit_code = 1
+            return False
+        return input("Proceed? [y/N] ").strip().lower() in ("y", "yes")
+
+    def exec_command(
+        self,
+        command: str,
+        names: List[str] | None = None,
+        document: str | None = None,
+        max_concurrency: str = "50",
+        max_errors: str = "10%",
+        timeout: int = 600,
+    ) -> int:
+        """Runs :param:`command` on the Instances in :param:`names`, or on those the user selects, and prints the output
+        of each as it completes. Returns the number of Instances it did not succeed on."""
+        if not (targets := self._targets(names)):
+            return 0
+
+        LOGGER.info(f"Running command on {len(targets)} Instances...")
+        results = Counter()
+        for target, invocation in run_command(
+            self.boto_session, targets, [command], document, max_concurrency, max_errors, timeout  # type: ignore
+        ):
+            results[invocation["Status"]] += 1
+            print(f"\n==> {target.name} ({target.instance_id}) [{invocation['Status']}] <==")
+            if output := invocation_output(invocation) or invocation.get("StatusDetails"):
+                print(output)
+
+        print(f"\n{results['Success']}/{len(targets)} succeeded. " + ", ".join(f"{k}: {v}" for k, v in results.items()))
+        return len(targets) - results["Success"]
+
+    def manage_instances(self, action: Literal["start", "stop", "reboot", "restart"], names: List[str] | None = None):
+        """Takes :param:`action` on the Instances in :param:`names`, or on those the user selects, all at once. Returns
+        the number of Instances it did not succeed on."""
+        if not (targets := self._targets(names)):
+            return 0
+
+        done = bulk_manager(self.boto_session, targets, action)  # type: ignore
+        if failed := [target.name for target in targets if target not in done]:
+            LOGGER.warning(f"Could not {action} {', '.join(failed)}.")
+        LOGGER.info(f"{len(done)}/{len(targets)} Instances done.")
+        return len(failed)
+
+    def _prepare_target(self, target: str) -> Instance | None:
+        """Returns the Instance named :param:`target`, or with that ID, once it is running."""
+        if not (matches := [i for i in self.instances if target in (i.name, i.instance_id)]):
+            LOGGER.error(f"Unknown Instance: {target}.")
+            return
+        elif len(matches) > 1:
+            LOGGER.error(f"Several Instances match {target}: {', '.join(i.instance_id for i in matches)}.")
+            return
+
+        if status_manager(self.boto_session, matches[0], connecting=True):  # type: ignore
+            return matches[0]
+
+    def proxy(self, target: str, port: int = 22) -> int:
+        """Starts the Instance named :param:`target`, or with that ID, if needed, and relays stdin and stdout to
+        :param:`port` on it. Returns the exit code."""
+        if not (instance := self._prepare_target(target)):
+            return 1
+        return relay_stdio(self.boto_session, instance, port)  # type: ignore
+
+    def copy(
+        self,
+        source: str,
+        destination: str,
+        username: str | None = None,
+        streams: int = DEFAULT_STREAMS,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> int:
+        """Copies a file between here and an Instance, where the remote one of :param:`source` and
+        :param:`destination` is given as NAME:PATH. Returns the exit code."""
+        source_name, source_path = split_remote(source)
+        destination_name, destination_path = split_remote(destination)
+        if bool(source_name) == bool(destination_name):
+            LOGGER.error("Exactly one of the source and destination should be NAME:PATH on an Instance.")
+            return 1
+
+        if source_name:
+            direction, name, remote_path = "download", source_name, source_path
+            local_path = Path(destination_path)
+            if local_path.is_dir():
+                local_path = Path(local_path, Path(remote_path).name)
+        else:
+            direction, name, local_path = "upload", destination_name, Path(source_path)
+            remote_path = destination_path
+            if not local_path.is_file():
+                LOGGER.error(f"{local_path} is not a file.")
+                return 1
+            if not remote_path or remote_path.endswith("/"):
+                remote_path += local_path.name
+
+        if not (instance := self._prepare_target(name)):  # type: ignore
+            return 1
+        if username:
+            instance.username = username
+
+        transfer = Transfer(
+            self.boto_session,  # type: ignore
+            instance,
+            local_path,
+            remote_path,
+            direction,  # type: ignore
+            streams,
+            chunk_size,
+            self.engine,  # type: ignore
+            self.ready_timeout,
+        )
+        return 0 if transfer.run() else 1
+
     def manage_menu(self):
         while True:
-            if not (target := get_instance(self.instances)):
+            if not (targets := get_instances(self.instances, self.boto_session)):
                 break
 
-            status_manager(self.boto_session, target)  # type: ignore
+            if len(targets) == 1:
+                status_manager(self.boto_session, targets[0])  # type: ignore
+                continue
+
+            action, _ = pick(
+                ["Start", "Stop", "Reboot", "Restart", "<= Back"],
+                f"What would you like to do with {len(targets)} Instances?",
+            )
+            if action != "<= Back":
+                self.manage_instances(action.lower(), [target.name for target in targets])  # type: ignore
+
+    def open_sessions(self, targets):
+        """Opens tunnels to :param:`targets` concurrently and adds them to the session table."""
+
+        def open_session(target):
+            if not status_manager(self.boto_session, target, connecting=True):  # type: ignore
+                return target, None
+
+            # A copy of the Instance, so connecting to it from the Connect menu or the pool doesn't take over the
+            # session's local port
+            evocation = self._evocation(target.copy())
+            if not evocation.open():
+                LOGGER.error(f"Could not open a session to {target.name}.")
+                evocation.stop()
+                return target, None
+            return target, evocation
+
+        targets = [target for target in targets if target.name not in self.evocations]
+        if not targets:
+            return
+
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            for target, evocation in executor.map(open_session, targets):
+                if evocation:
+                    self.evocations[target.name] = evocation
+
+    def close_sessions(self, names):
+        """Tears down the tunnels for :param:`names` and removes them from the session table."""
+        evocations = [self.evocations.pop(name) for name in names]
+        if not evocations:
+            return
+
+        with ThreadPoolExecutor(max_workers=len(evocations)) as executor:
+            for evocation in evocations:
+                executor.submit(evocation.stop)
+
+    @staticmethod
+    def _session_state(evocation):
+        if evocation.ready_for_connection.is_set():
+            return "ready"
+        elif evocation.circuit_open.is_set():
+            return "failed"
+        return f"restarting ({evocation.restarts})" if evocation.restarts else "waiting"
+
+    def sessions_menu(self):
+        while True:
+            width = max([len(name) for name in self.evocations] + [0])
+            rows = [
+                f"{name:<{width}}  {evocation.target.connection_type:<4} localhost:{evocation.target.local_port}  "
+                f"[{self._session_state(evocation)}]"
+                for name, evocation in self.evocations.items()
+            ]
+            opt, index = pick(["Open sessions"] + rows + ["Close all", "<= Back"], "Sessions:")
+
+            if opt == "<= Back":
+                break
+            elif opt == "Open sessions":
+                self.open_sessions(get_instances(self.instances, self.boto_session))
+            elif opt == "Close all":
+                self.close_sessions(list(self.evocations))
+            else:
+                name = list(self.evocations)[index - 1]  # type: ignore
+                opt, _ = pick(["Attach", "Close", "<= Back"], f"What do you want to do with {name}?")
+                if opt == "Attach":
+                    evocation = self.evocations[name]
+                    if evocation.is_ready():
+                        evocation.attach(Action(self.connect_funcs[evocation.target.connection_type]))
+                    else:
+                        LOGGER.error(f"The session to {name} is not ready for connections.")
+                elif opt == "Close":
+                    self.close_sessions([name])
@@ -1,46 +1,153 @@
 import logging
 import time
-from typing import List
+from threading import Condition, Thread
+from typing import List, Literal
 
 from boto3 import Session
 from pick import pick
 
-from summoner.lib.boto import BotoEnhanced, get_instance_status, start_instance, stop_instance
+from summoner.lib.boto import (
+    BotoEnhanced,
+    change_instance_states,
+    discover_fleet,
+    get_fleet_status,
+    get_instance_status,
+    start_instance,
+    stop_instance,
+)
+from summoner.lib.const import UNKNOWN_STATE
 from summoner.lib.instance import Instance
+from summoner.lib.inventory import Inventory
+from summoner.lib.tracing import span
+from summoner.lib.watcher import wait_for_state
 
 LOGGER = logging.getLogger()
 
+# Seconds to wait after an Instance starts before connecting, so its SSM agent can come online
+BOOT_GRACE = 60
 
-def get_instance(instances: List[Instance]) -> Instance | None:
-    """Returns a user-selected Instance from a list of Instances."""
+
+def _instance_options(instances: List[Instance], boto_session: Session | BotoEnhanced | None = None) -> List[str]:
+    options = [instance.name for instance in instances]
+    if boto_session:
+        statuses = get_fleet_status(boto_session, instances)
+        width = max((len(option) for option in options), default=0)
+        options = [
+            f"{option:<{width}}  [{statuses[instance.instance_id] or 'unknown'}]"
+            for option, instance in zip(options, instances)
+        ]
+    return options
+
+
+def get_instance(instances: List[Instance], boto_session: Session | BotoEnhanced | None = None) -> Instance | None:
+    """Returns a user-selected Instance from a list of Instances. Provide :param:`boto_session` to show a status
+    column."""
     if len(instances) == 1:
         return instances[0]
 
-    target, _ = pick(([instance.name for instance in instances] + ["<= Back"]), "Select an Instance:")
+    target, index = pick((_instance_options(instances, boto_session) + ["<= Back"]), "Select an Instance:")
     if target == "<= Back":
         return
-    return instances[target]  # type: ignore
+    return instances[index]  # type: ignore
+
+
+def get_instances(instances: List[Instance], boto_session: Session | BotoEnhanced | None = None) -> List[Instance]:
+    """Returns any number of user-selected Instances from a list of Instances. Selecting none goes back."""
+    if not instances:
+        # The picker can't be shown without options
+        return []
+
+    selected = pick(
+        _instance_options(instances, boto_session),
+        "Select Instances (SPACE to mark, ENTER to confirm):",
+        multiselect=True,
+        min_selection_count=0,
+    )
+    return [instances[index] for _, index in selected]  # type: ignore
+
+
+def discover_instance(
+    boto_session: Session | BotoEnhanced,
+    regions: List[str],
+    filters: List[dict],
+    inventory: Inventory | None = None,
+) -> dict | None:
+    """Returns a user-selected Instance from those found in :param:`regions`. If every region is in
+    :param:`inventory`, Instances are listed from it straight away and the inventory is refreshed in the background.
+    Otherwise, they are found by discover_fleet: the picker opens as soon as the first Instances arrive, while later
+    pages load in the background. Select "More..." to show them."""
+    found = []
+    loading = Condition()
+    done = False
+
+    def load():
+        nonlocal done
+        for page in discover_fleet(boto_session, regions, filters):
+            if inventory:
+                inventory.update(page)
+            with loading:
+                found.extend(page)
+                loading.notify_all()
+        with loading:
+            done = True
+            loading.notify_all()
+
+    if inventory and set(regions) <= set(inventory.refreshed_regions()):
+        found, done = inventory.instances(regions, filters), True
+    else:
+        Thread(name="instance_discovery_thread", target=load, daemon=True).start()
+    if inventory:
+        Thread(
+            name="inventory_refresh_thread", target=inventory.refresh, args=(boto_session, regions), daemon=True
+        ).start()
+
+    shown = 0
+    while True:
+        with loading:
+            loading.wait_for(lambda: len(found) > shown or done)
+            instances, more = list(found), not done
+        if not instances:
+            LOGGER.error(f"No Instances in {', '.join(regions)} matched the filters.")
+            return
+
+        width = max(len(instance["name"]) for instance in instances)
+        options = [
+            f"{instance['name']:<{width}}  {instance['instance_id']}  "
+            f"[{', '.join(filter(None, [instance['state'], instance.get('ping_status')]))}]  {instance['platform']}"
+            + (f"  {instance['region']}" if len(regions) > 1 else "")
+            for instance in instances
+        ]
+        if more:
+            options.append(f"More... ({len(instances)} loaded)")
+
+        target, index = pick(options + ["<= Back"], "Select an Instance:")
+        if target == "<= Back":
+            return
+        elif index == len(instances):
+            shown = len(instances)
+            continue
+        return instances[index]  # type: ignore
 
 
 def status_manager(
     boto_session: Session | BotoEnhanced, instance: Instance, connecting: bool = False, stopping: bool = False
 ) -> None | bool:
     """Manage Instance state. Set :param:`connecting` to True to automatically prepare the Instance for connection."""
-    status = get_instance_status(boto_session, instance)
+    with span("instance_status"):
+        status = get_instance_status(boto_session, instance)
 
     # If stopping, wait for it to be stopped
     if status == "stopping":
         LOGGER.info("Waiting for the Instance to stop...")
-        while status != "stopped":
-            time.sleep(15)
-            status = get_instance_status(boto_session, instance)
-        time.sleep(15)
+        with span("wait_for_stopped"):
+            status = wait_for_state(boto_session, instance, "stopped").result()
 
     # If stopped, ask user if they want to start
     if status == "stopped":
         if connecting:
-            if not start_instance(boto_session, instance):
-                return False
+            with span("start_instance"):
+                if not start_instance(boto_session, instance):
+                    return False
         elif stopping:
             return True
         else:
@@ -54,11 +161,11 @@ def status_manager(
     # If pending, wait for it to be running
     if status == "pending":
         LOGGER.info("Waiting for the Instance to start...")
-        while status != "running":
-            time.sleep(15)
-            status = get_instance_status(boto_session, instance)
+        with span("wait_for_running"):
+            status = wait_for_state(boto_session, instance, "running").result()
         if connecting:
-            time.sleep(60)
+            with span("boot_grace"):
+                time.sleep(BOOT_GRACE)
 
     # If running, allow user to stop or restart
     if status == "running":
@@ -67,16 +174,62 @@ def status_manager(
         elif stopping:
             return stop_instance(boto_session, instance)
 
-        opt, _ = pick(["Stop", "Restart", "<= Back"], "The Instance is running. What would you like to do?")
+        opt, _ = pick(["Stop", "Reboot", "Restart", "<= Back"], "The Instance is running. What would you like to do?")
         if opt == "<= Back":
             return
         elif opt == "Stop":
             return stop_instance(boto_session, instance)
+        elif opt == "Reboot":
+            LOGGER.info(f"Rebooting Instance {instance.name}...")
+            return bool(change_instance_states(boto_session, [instance], "reboot"))
         elif opt == "Restart":
-            stop_instance(boto_session, instance)
+            if not stop_instance(boto_session, instance):
+                return False
             # Wait for it to be stopped before starting again
-            while status != "stopped":
-                time.sleep(15)
-                status = get_instance_status(boto_session, instance)
-            time.sleep(15)
+            if wait_for_state(boto_session, instance, "stopped").result() != "stopped":
+                return False
             return start_instance(boto_session, instance)
+
+
+def wait_for_all(boto_session: Session | BotoEnhanced, instances: List[Instance], *states: str) -> List[Instance]:
+    """Waits on every Instance together, and returns those which reached one of :param:`states`."""
+    futures = [wait_for_state(boto_session, instance, *states) for instance in instances]
+    return [instance for instance, future in zip(instances, futures) if future.result() in states]
+
+
+def bulk_manager(
+    boto_session: Session | BotoEnhanced,
+    instances: List[Instance],
+    action: Literal["start", "stop", "reboot", "restart"],
+) -> List[Instance]:
+    """Starts, stops, reboots or restarts (stops, then starts) every Instance in :param:`instances` at once, and waits
+    for them all together. Instances which are already changing state are waited on first. Returns the Instances which
+    ended up in the requested state."""
+    statuses = get_fleet_status(boto_session, instances)
+    unmanageable = (None, UNKNOWN_STATE, "shutting-down", "terminated")
+    if skipped := [i.name for i in instances if statuses[i.instance_id] in unmanageable]:
+        LOGGER.warning(f"Skipping Instances which can't be managed: {', '.join(skipped)}.")
+
+    def in_state(*states):
+        return [instance for instance in instances if statuses[instance.instance_id] in states]
+
+    if action == "start":
+        stopped = in_state("stopped") + wait_for_all(boto_session, in_state("stopping"), "stopped")
+        LOGGER.info(f"Starting {len(stopped)} Instances...")
+        starting = change_instance_states(boto_session, stopped, "start") + in_state("pending")
+        return in_state("running") + wait_for_all(boto_session, starting, "running")
+
+    running = in_state("running") + wait_for_all(boto_session, in_state("pending"), "running")
+    if action == "reboot":
+        # Rebooting keeps the Instance on its host and skips the stop and start
+        LOGGER.info(f"Rebooting {len(running)} Instances...")
+        return change_instance_states(boto_session, running, "reboot")
+
+    LOGGER.info(f"Stopping {len(running)} Instances...")
+    stopping = change_instance_states(boto_session, running, "stop")
+    if action == "stop":
+        return in_state("stopped") + wait_for_all(boto_session, stopping + in_state("stopping"), "stopped")
+
+    stopped = wait_for_all(boto_session, stopping, "stopped")
+    LOGGER.info(f"Starting {len(stopped)} Instances...")
+    return wait_for_all(boto_session, change_instance_states(boto_session, stopped, "start"), "running")
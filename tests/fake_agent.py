@@ -0,0 +1,168 @@
+"""A local stand-in for the SSM agent's end of a port forwarding data channel. It serves the WebSocket upgrade, runs
+the session handshake, and echoes stream data back, like an agent forwarding to an echo server. Knobs make it drop
+acknowledgements or reorder its output, so the client's recovery can be tested without AWS."""
+
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+from typing import Dict, List, Set
+
+from summoner.lib.datachannel import (
+    ACKNOWLEDGE_MESSAGE,
+    CHANNEL_CLOSED_MESSAGE,
+    INPUT_STREAM_MESSAGE,
+    OUTPUT_STREAM_MESSAGE,
+    PAYLOAD_FLAG,
+    PAYLOAD_HANDSHAKE_COMPLETE,
+    PAYLOAD_HANDSHAKE_REQUEST,
+    PAYLOAD_HANDSHAKE_RESPONSE,
+    PAYLOAD_OUTPUT,
+    ClientMessage,
+)
+from summoner.lib.websocket import ACCEPT_GUID, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG, OP_TEXT
+
+
+class FakeAgent:
+    """Accepts one data channel at a time on a local port. Set :param:`drop_acks` to sequence numbers whose first
+    delivery is not acknowledged, and :param:`reorder` to send each pair of echoed messages in reverse order."""
+
+    def __init__(self, drop_acks: Set[int] | None = None, reorder: bool = False):
+        self.drop_acks = set(drop_acks or [])
+        self.reorder = reorder
+
+        self.open_request: dict | None = None
+        self.handshake_response: dict | None = None
+        self.received: List[ClientMessage] = []
+        self.acks: List[int] = []
+        self.deliveries: Dict[int, int] = {}
+        self.flags: List[int] = []
+
+        self._writer: asyncio.StreamWriter | None = None
+        self._sequence_number = 0
+        self._held: ClientMessage | None = None
+        self._handled: Set[int] = set()
+        self._server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        port = self._server.sockets[0].getsockname()[1]  # type: ignore
+        return f"ws://127.0.0.1:{port}/v1/data-channel/test-session"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+
+    async def stop(self):
+        if self._writer:
+            self._writer.close()
+        self._server.close()  # type: ignore
+        await self._server.wait_closed()  # type: ignore
+
+    async def _write_frame(self, opcode: int, payload: bytes):
+        # Server frames are never masked
+        if len(payload) < 126:
+            header = bytes([0x80 | opcode, len(payload)])
+        elif len(payload) < 1 << 16:
+            header = bytes([0x80 | opcode, 126]) + struct.pack(">H", len(payload))
+        else:
+            header = bytes([0x80 | opcode, 127]) + struct.pack(">Q", len(payload))
+        self._writer.write(header + payload)  # type: ignore
+        await self._writer.drain()  # type: ignore
+
+    async def _read_frame(self, reader: asyncio.StreamReader):
+        first, second = await reader.readexactly(2)
+        assert second & 0x80, "Client frames must be masked."
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack(">H", await reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack(">Q", await reader.readexactly(8))
+        key = await reader.readexactly(4)
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+        return first & 0x0F, payload
+
+    async def send_message(self, message: ClientMessage):
+        await self._write_frame(OP_BINARY, message.serialize())
+
+    async def send_output(self, payload: bytes, payload_type: int = PAYLOAD_OUTPUT):
+        message = ClientMessage(OUTPUT_STREAM_MESSAGE, payload, payload_type, self._sequence_number)
+        self._sequence_number += 1
+        if self.reorder and payload_type == PAYLOAD_OUTPUT:
+            if not self._held:
+                self._held = message
+                return
+            held, self._held = self._held, None
+            await self.send_message(message)
+            message = held
+        await self.send_message(message)
+
+    async def close_channel(self):
+        await self.send_message(ClientMessage(CHANNEL_CLOSED_MESSAGE, b'{"Output": "closed by test"}'))
+
+    async def close_websocket(self, code: int = 1000):
+        await self._write_frame(OP_CLOSE, struct.pack(">H", code))
+
+    async def _acknowledge(self, message: ClientMessage):
+        content = {
+            "AcknowledgedMessageType": message.message_type,
+            "AcknowledgedMessageId": str(message.message_id),
+            "AcknowledgedMessageSequenceNumber": message.sequence_number,
+            "IsSequentialMessage": True,
+        }
+        await self.send_message(ClientMessage(ACKNOWLEDGE_MESSAGE, json.dumps(content).encode()))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writer = writer
+        headers = {}
+        await reader.readline()
+        while (line := (await reader.readline()).decode().strip()) != "":
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + ACCEPT_GUID).encode()).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        await writer.drain()
+
+        try:
+            while True:
+                opcode, payload = await self._read_frame(reader)
+                if opcode == OP_TEXT:
+                    self.open_request = json.loads(payload)
+                    request = {"RequestedClientActions": [{"ActionType": "SessionType", "ActionParameters": {}}]}
+                    await self.send_output(json.dumps(request).encode(), PAYLOAD_HANDSHAKE_REQUEST)
+                elif opcode == OP_BINARY:
+                    await self._on_message(ClientMessage.deserialize(payload))
+                elif opcode == OP_PING:
+                    await self._write_frame(OP_PONG, payload)
+                elif opcode == OP_CLOSE:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    async def _on_message(self, message: ClientMessage):
+        if message.message_type == ACKNOWLEDGE_MESSAGE:
+            self.acks.append(json.loads(message.payload)["AcknowledgedMessageSequenceNumber"])
+            return
+        assert message.message_type == INPUT_STREAM_MESSAGE
+
+        deliveries = self.deliveries[message.sequence_number] = self.deliveries.get(message.sequence_number, 0) + 1
+        if message.sequence_number in self.drop_acks and deliveries == 1:
+            return
+        await self._acknowledge(message)
+        if message.sequence_number in self._handled:
+            return  # A resend of a message which was already handled
+        self._handled.add(message.sequence_number)
+        self.received.append(message)
+
+        if message.payload_type == PAYLOAD_HANDSHAKE_RESPONSE:
+            self.handshake_response = json.loads(message.payload)
+            await self.send_output(b'{"ClientVersion": "test"}', PAYLOAD_HANDSHAKE_COMPLETE)
+        elif message.payload_type == PAYLOAD_OUTPUT:
+            await self.send_output(message.payload)
+        elif message.payload_type == PAYLOAD_FLAG:
+            self.flags.append(struct.unpack(">I", message.payload[:4])[0])
@@ -0,0 +1,44 @@
+import unittest
+
+from boto3 import Session
+
+from benchmarks.fake_aws import FakeCloud
+from summoner.lib.boto import instance_filters, list_instances
+
+REGION = "us-east-1"
+
+
+class TestInstanceFilters(unittest.TestCase):
+    def setUp(self):
+        self.cloud = FakeCloud(latency=0)
+        self.boto_session = Session(aws_access_key_id="test", aws_secret_access_key="test", region_name=REGION)
+        self.cloud.attach(self.boto_session)
+
+        self.cloud.add_instance("web", tags={"env": "prod", "team": "web"})
+        self.cloud.add_instance("db", state="stopped", tags={"env": "prod"}, vpc_id="vpc-data")
+        self.cloud.add_instance("rdp", platform="Windows BYOL", tags={"env": "dev"})
+
+    def names(self, **filters) -> set:
+        instances = list_instances(self.boto_session, REGION, instance_filters(**filters))
+        return {instance["name"] for instance in instances}  # type: ignore
+
+    def test_tags(self):
+        self.assertEqual(self.names(tags=["env=prod"]), {"web", "db"})
+        self.assertEqual(self.names(tags=["team"]), {"web"})
+        self.assertEqual(self.names(tags=["env=prod", "team"]), {"web"})
+        self.assertEqual(self.names(tags=["env=d*"]), {"rdp"})
+
+    def test_states(self):
+        self.assertEqual(self.names(states=["stopped"]), {"db"})
+        self.assertEqual(self.names(), {"web", "db", "rdp"})
+
+    def test_platforms(self):
+        self.assertEqual(self.names(platforms=["Windows*"]), {"rdp"})
+        self.assertEqual(self.names(platforms=["Linux/UNIX"]), {"web", "db"})
+
+    def test_vpcs(self):
+        self.assertEqual(self.names(vpc_ids=["vpc-data"]), {"db"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+from summoner.lib import commands
+from summoner.lib.instance import Instance
+
+
+def instance(name: str, instance_id: str, region: str = "us-east-1") -> Instance:
+    return Instance(name, region, instance_id, "ssh", local_port=50000)
+
+
+class TestRunCommand(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.limits = []
+        self.failing = set()
+        self.cancelled = []
+        patches = {
+            "get_ping_statuses": mock.Mock(return_value={"i-online": "Online", "i-lost": "ConnectionLost"}),
+            "send_command": mock.Mock(side_effect=self.send_command),
+            "list_command_invocations": mock.Mock(side_effect=self.list_command_invocations),
+            "cancel_command": mock.Mock(side_effect=lambda _, region, command_id: self.cancelled.append(command_id)),
+            "POLL_INTERVAL_MIN": 0,
+        }
+        for name, value in patches.items():
+            patcher = mock.patch.object(commands, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send_command(self, _, region, ids, document, commands, max_concurrency, max_errors, timeout):
+        self.sent.append(ids)
+        self.limits.append((max_concurrency, max_errors))
+        return f"cmd-{len(self.sent) - 1}"
+
+    def list_command_invocations(self, _, region, command_id):
+        return [
+            {"InstanceId": instance_id, "Status": "Failed" if instance_id in self.failing else "Success"}
+            for instance_id in self.sent[int(command_id.split("-")[1])]
+        ]
+
+    def fleet(self, count: int) -> list:
+        ids = [f"i-{i}" for i in range(count)]
+        commands.get_ping_statuses.return_value = {instance_id: "Online" for instance_id in ids}  # type: ignore
+        return [instance(instance_id, instance_id) for instance_id in ids]
+
+    def test_unmanaged_instances_are_not_sent(self):
+        targets = [instance("web", "i-online"), instance("old", "i-lost"), instance("new", "i-unmanaged")]
+        invocations = commands.run_command(None, targets, ["uptime"])  # type: ignore
+        results = {target.name: invocation["Status"] for target, invocation in invocations}
+
+        self.assertEqual(results, {"web": "Success", "old": "Undeliverable", "new": "Undeliverable"})
+        self.assertEqual(self.sent, [["i-online"]])
+
+    def test_sent_anyway_when_ping_statuses_are_unavailable(self):
+        commands.get_ping_statuses.return_value = None  # type: ignore
+        results = list(commands.run_command(None, [instance("web", "i-unknown")], ["uptime"]))  # type: ignore
+        self.assertEqual(self.sent, [["i-unknown"]])
+        self.assertEqual(results[0][1]["Status"], "Success")
+
+    def test_concurrency_applies_across_batches(self):
+        results = list(commands.run_command(None, self.fleet(120), ["uptime"], max_concurrency="1"))  # type: ignore
+        self.assertEqual(len(results), 120)
+        self.assertEqual(len(self.sent), 120)
+        self.assertEqual({limit for limit, _ in self.limits}, {"1"})
+
+    def test_batches_fill_up_to_the_concurrency(self):
+        list(commands.run_command(None, self.fleet(120), ["uptime"], max_concurrency="100%"))  # type: ignore
+        self.assertEqual([len(ids) for ids in self.sent], [50, 50, 20])
+
+    def test_errors_apply_across_batches(self):
+        self.failing = {"i-0", "i-1"}
+        targets = self.fleet(4)
+        invocations = commands.run_command(
+            None, targets, ["uptime"], max_concurrency="1", max_errors="1"  # type: ignore
+        )
+        results = {target.name: invocation["Status"] for target, invocation in invocations}
+
+        self.assertEqual(results, {"i-0": "Failed", "i-1": "Failed", "i-2": "Cancelled", "i-3": "Cancelled"})
+        self.assertEqual([max_errors for _, max_errors in self.limits], ["1", "0"])
+
+    def test_limits_as_percentages(self):
+        self.assertEqual(commands.command_limit("10%", 200), 20)
+        self.assertEqual(commands.command_limit("10%", 5), 1)
+        self.assertEqual(commands.command_limit("3", 200), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import asyncio
+import unittest
+
+from summoner.lib import datachannel
+from summoner.lib.datachannel import (
+    ACTION_SUCCESS,
+    CLIENT_VERSION,
+    FLAG_DISCONNECT_TO_PORT,
+    INPUT_STREAM_MESSAGE,
+    OUTPUT_STREAM_MESSAGE,
+    PAYLOAD_OUTPUT,
+    ClientMessage,
+    DataChannel,
+    DataChannelError,
+    PortForwardingSession,
+)
+from tests.fake_agent import FakeAgent
+
+TIMEOUT = 5
+
+
+async def wait_until(condition, timeout: float = TIMEOUT):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+class TestClientMessage(unittest.TestCase):
+    def test_round_trip(self):
+        message = ClientMessage(OUTPUT_STREAM_MESSAGE, b"payload", PAYLOAD_OUTPUT, 42, flags=1)
+        parsed = ClientMessage.deserialize(message.serialize())
+        self.assertEqual(
+            (parsed.message_type, parsed.payload, parsed.payload_type, parsed.sequence_number, parsed.flags),
+            (OUTPUT_STREAM_MESSAGE, b"payload", PAYLOAD_OUTPUT, 42, 1),
+        )
+        self.assertEqual(parsed.message_id, message.message_id)
+
+    def test_digest_mismatch(self):
+        data = bytearray(ClientMessage(INPUT_STREAM_MESSAGE, b"payload").serialize())
+        data[-1] ^= 0xFF
+        with self.assertRaises(DataChannelError):
+            ClientMessage.deserialize(bytes(data))
+
+
+class TestPortForwardingSession(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.agent = FakeAgent()
+        await self.agent.start()
+
+    async def asyncTearDown(self):
+        await self.agent.stop()
+
+    async def open_session(self):
+        # Port 0 lets the OS choose, which the server reports once it is listening
+        ready = asyncio.Event()
+        self.session = PortForwardingSession(self.agent.url, "test-token", 0, on_ready=ready.set)
+        self.task = asyncio.create_task(self.session.run())
+        async with asyncio.timeout(TIMEOUT):
+            await ready.wait()
+        return self.session._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def test_handshake(self):
+        await self.open_session()
+        self.assertEqual(self.agent.open_request["TokenValue"], "test-token")  # type: ignore
+        self.assertEqual(self.agent.open_request["ClientVersion"], CLIENT_VERSION)  # type: ignore
+        self.assertEqual(
+            self.agent.handshake_response["ProcessedClientActions"],  # type: ignore
+            [{"ActionType": "SessionType", "ActionStatus": ACTION_SUCCESS}],
+        )
+        # The handshake request and complete are both acknowledged
+        await wait_until(lambda: self.agent.acks == [0, 1])
+        await wait_until(lambda: self.session.channel.unacknowledged == 0)
+
+    async def test_forwards_data_both_ways(self):
+        port = await self.open_session()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"hello over ssm")
+        await writer.drain()
+        async with asyncio.timeout(TIMEOUT):
+            self.assertEqual(await reader.readexactly(14), b"hello over ssm")
+
+        writer.close()
+        await wait_until(lambda: self.agent.flags == [FLAG_DISCONNECT_TO_PORT])
+        await wait_until(lambda: self.session.channel.unacknowledged == 0)
+
+    async def test_channel_closed(self):
+        port = await self.open_session()
+        await self.agent.close_channel()
+        async with asyncio.timeout(TIMEOUT):
+            await self.task
+        with self.assertRaises(OSError):
+            await asyncio.open_connection("127.0.0.1", port)
+
+    async def test_websocket_closed(self):
+        await self.open_session()
+        await self.agent.close_websocket()
+        async with asyncio.timeout(TIMEOUT):
+            await self.task
+
+
+class TestDataChannel(unittest.IsolatedAsyncioTestCase):
+    async def open_channel(self, agent: FakeAgent):
+        await agent.start()
+        self.addAsyncCleanup(agent.stop)
+        self.received = []
+
+        async def on_message(message: ClientMessage):
+            self.received.append(message)
+
+        channel = DataChannel(agent.url, "test-token")
+        await channel.open()
+        task = asyncio.create_task(channel.listen(on_message))
+        self.addAsyncCleanup(channel.close)
+        await wait_until(lambda: self.received)
+        return channel, task
+
+    async def test_sequence_gaps(self):
+        agent = FakeAgent(reorder=True)
+        channel, _ = await self.open_channel(agent)
+        for payload in [b"first", b"second", b"third", b"fourth"]:
+            await channel.send(payload)
+        # The agent echoes each pair of messages in reverse order, and the channel puts them back in order
+        await wait_until(lambda: len(self.received) == 5)
+        self.assertEqual([m.payload for m in self.received[1:]], [b"first", b"second", b"third", b"fourth"])
+        self.assertEqual(sorted(agent.acks), [0, 1, 2, 3, 4])
+
+    async def test_redelivery_is_ignored(self):
+        agent = FakeAgent()
+        channel, _ = await self.open_channel(agent)
+        await channel.send(b"once")
+        await wait_until(lambda: len(self.received) == 2)
+        # Resend the echo, as an agent does when it misses the acknowledgement
+        await agent.send_message(ClientMessage(OUTPUT_STREAM_MESSAGE, b"once", PAYLOAD_OUTPUT, 1))
+        await wait_until(lambda: agent.acks.count(1) == 2)
+        self.assertEqual(len(self.received), 2)
+
+    async def test_resends_until_acknowledged(self):
+        agent = FakeAgent(drop_acks={0})
+        channel, _ = await self.open_channel(agent)
+        await channel.send(b"lost")
+        self.assertEqual(channel.unacknowledged, 1)
+        await wait_until(lambda: channel.unacknowledged == 0)
+        self.assertEqual(agent.deliveries[0], 2)
+        self.assertEqual([m.payload for m in agent.received], [b"lost"])
+
+    async def test_gives_up_when_never_acknowledged(self):
+        agent = FakeAgent(drop_acks={0})
+        attempts, datachannel.RESEND_MAX_ATTEMPTS = datachannel.RESEND_MAX_ATTEMPTS, 1
+        self.addCleanup(setattr, datachannel, "RESEND_MAX_ATTEMPTS", attempts)
+
+        await agent.start()
+        self.addAsyncCleanup(agent.stop)
+        channel = DataChannel(agent.url, "test-token")
+        await channel.open()
+        task = asyncio.create_task(channel.listen(lambda _: asyncio.sleep(0)))
+        await channel.send(b"unanswered")
+        with self.assertRaises(DataChannelError):
+            async with asyncio.timeout(TIMEOUT):
+                await task
+
+    async def test_acknowledgement_updates_round_trip_time(self):
+        agent = FakeAgent()
+        channel, _ = await self.open_channel(agent)
+        await channel.send(b"timed")
+        await wait_until(lambda: channel.unacknowledged == 0)
+        # A local agent answers far quicker than the default estimate
+        self.assertLess(channel.round_trip_time, datachannel.DEFAULT_ROUND_TRIP_TIME)
+        self.assertLessEqual(channel.transmission_timeout, datachannel.MAX_TRANSMISSION_TIMEOUT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from boto3 import Session
+
+from benchmarks.fake_aws import FakeCloud
+from summoner.lib.inventory import Inventory
+
+REGION = "us-east-1"
+
+
+class TestInventoryRefresh(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.inventory = Inventory(Path(folder.name, "inventory.db"))
+
+        self.cloud = FakeCloud(latency=0)
+        self.boto_session = Session(aws_access_key_id="test", aws_secret_access_key="test", region_name=REGION)
+        self.cloud.attach(self.boto_session)
+
+    def states(self) -> dict:
+        return {instance["name"]: instance["state"] for instance in self.inventory.instances([REGION])}
+
+    def test_state_changed_outside_summoner_is_picked_up(self):
+        web = self.cloud.add_instance("web")
+        self.cloud.add_instance("db", state="stopped")
+        self.inventory.refresh_region(self.boto_session, REGION)
+        self.assertEqual(self.states(), {"web": "running", "db": "stopped"})
+
+        # Stopped by someone else, well within the ping status TTL
+        web.transition("stopped", "stopped", 0)
+        self.inventory.refresh_region(self.boto_session, REGION)
+        self.assertEqual(self.states(), {"web": "stopped", "db": "stopped"})
+
+    def test_ping_statuses_are_kept_until_expired(self):
+        self.cloud.add_instance("web")
+        self.inventory.refresh_region(self.boto_session, REGION)
+        self.inventory.refresh_region(self.boto_session, REGION)
+        self.assertEqual(self.cloud.calls["DescribeInstanceInformation"], 1)
+        self.assertEqual(self.cloud.calls["DescribeInstances"], 2)
+        self.assertEqual(self.inventory.instances([REGION])[0]["ping_status"], "Online")
+
+        self.inventory.refresh_region(self.boto_session, REGION, force=True)
+        self.assertEqual(self.cloud.calls["DescribeInstanceInformation"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from threading import Event
+from unittest import mock
+
+from summoner.lib.instance import Instance
+from summoner.lib.pool import TunnelPool
+
+
+class FakeTunnel:
+    def __init__(self, target: Instance):
+        self.target = target
+        self.ready_for_connection = Event()
+        self.stopped = False
+
+    def start(self):
+        self.ready_for_connection.set()
+
+    def is_ready(self) -> bool:
+        return self.ready_for_connection.is_set()
+
+    def is_running(self) -> bool:
+        return not self.stopped
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestTunnelPool(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance("web", "us-east-1", "i-0123456789abcdef0", "ssh", local_port=50000)
+        self.pool = TunnelPool(None, [self.instance], FakeTunnel)  # type: ignore
+        self.addCleanup(self.pool.close)
+
+    def test_reuses_checked_in_tunnel(self):
+        tunnel = self.pool.open(self.instance)
+        self.pool.checkin(self.instance, tunnel)
+        self.assertIs(self.pool.open(self.instance), tunnel)
+
+    def test_checked_out_tunnel_is_not_replaced(self):
+        pooled = self.pool.open(self.instance)
+        with mock.patch("summoner.lib.instance.allocate_port", return_value=50001):
+            extra = self.pool.open(self.instance)
+
+        self.assertIsNot(extra, pooled)
+        self.assertIs(self.pool.tunnels["web"], pooled)
+        self.assertNotEqual(extra.target.local_port, pooled.target.local_port)  # type: ignore
+
+        # The extra tunnel is stopped on checkin, and the pooled one stays checked out until its own checkin
+        self.pool.checkin(self.instance, extra)
+        self.assertTrue(extra.stopped)  # type: ignore
+        self.assertIn("web", self.pool.checked_out)
+        self.pool.checkin(self.instance, pooled)
+        self.assertNotIn("web", self.pool.checked_out)
+        self.assertFalse(pooled.stopped)  # type: ignore
+
+
+if __name__ == "__main__":
+    unittest.main()
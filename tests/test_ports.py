@@ -0,0 +1,92 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from summoner.lib import ports
+from summoner.lib.ports import allocate_port, release_port
+
+KEY = "us-east-1/i-0123456789abcdef0"
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+class TestPortAllocation(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.leases_file = Path(folder.name, "ports.json")
+        patcher = mock.patch.object(ports, "LEASES_FILE", self.leases_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def allocate(self, key: str = KEY) -> int:
+        port = allocate_port(key)
+        self.addCleanup(release_port, key, port)
+        return port
+
+    def leases(self) -> dict:
+        return json.loads(self.leases_file.read_text())
+
+    def test_same_key_gets_the_same_port(self):
+        port = allocate_port(KEY)
+        release_port(KEY, port)
+        self.assertEqual(self.allocate(), port)
+        self.assertEqual(self.leases()[KEY]["pid"], os.getpid())
+
+    def test_busy_port_is_skipped(self):
+        port = allocate_port(KEY)
+        release_port(KEY, port)
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", port))
+            self.assertNotEqual(self.allocate(), port)
+
+    def test_port_in_use_in_this_process_is_borrowed(self):
+        port = self.allocate()
+        borrowed = self.allocate()
+        self.assertNotEqual(borrowed, port)
+        self.assertEqual(self.leases()[KEY]["port"], port)
+        self.assertTrue(self.leases()[f"{KEY}@{os.getpid()}:{borrowed}"]["borrowed"])
+
+    def test_lease_held_by_another_process_is_borrowed(self):
+        port = allocate_port(KEY)
+        release_port(KEY, port)
+        leases = self.leases()
+        # The test runner's parent is alive for as long as the test runs
+        leases[KEY]["pid"] = os.getppid()
+        self.leases_file.write_text(json.dumps(leases))
+
+        borrowed = self.allocate()
+        self.assertNotEqual(borrowed, port)
+        self.assertEqual(self.leases()[KEY], {"port": port, "pid": os.getppid()})
+
+        release_port(KEY, borrowed)
+        self.assertNotIn(f"{KEY}@{os.getpid()}:{borrowed}", self.leases())
+
+    def test_borrows_of_dead_processes_are_cleaned_up(self):
+        pid = dead_pid()
+        stale = f"{KEY}@{pid}:55555"
+        self.leases_file.write_text(json.dumps({stale: {"port": 55555, "pid": pid, "borrowed": True}}))
+        self.allocate("eu-west-1/i-0fedcba9876543210")
+        self.assertNotIn(stale, self.leases())
+
+    def test_ports_leased_to_other_keys_are_skipped(self):
+        other = "eu-west-1/i-0fedcba9876543210"
+        port = allocate_port(KEY)
+        release_port(KEY, port)
+        # The other key starts probing at the first key's port
+        with mock.patch.object(ports.zlib, "crc32", return_value=port - ports.LOCAL_PORT_RANGE.start):
+            self.assertNotEqual(self.allocate(other), port)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from configparser import ConfigParser
+from pathlib import Path
+from unittest import mock
+
+from summoner.lib import profiles
+from summoner.lib.instance import Instance
+from summoner.lib.profiles import render_profile, rtt_tier
+
+
+class TestRttTier(unittest.TestCase):
+    def test_thresholds(self):
+        self.assertEqual(rtt_tier(59.9), "fast")
+        self.assertEqual(rtt_tier(60), "medium")
+        self.assertEqual(rtt_tier(199.9), "medium")
+        self.assertEqual(rtt_tier(200), "slow")
+        self.assertEqual(rtt_tier(None), "medium")
+
+
+class TestRenderProfile(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = Path(folder.name)
+        for name, value in [("SUMMONER_FOLDER", self.folder), ("PROFILES_FOLDER", Path(self.folder, "profiles"))]:
+            patcher = mock.patch.object(profiles, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def render_rdp(self, tier: str = "fast") -> Path:
+        target = Instance("win", "us-east-1", "i-0123456789abcdef0", "rdp", local_port=50000)
+        return render_profile(target, tier, full_username="CORP\\admin", local_port=50000)
+
+    def test_rdp_is_utf16_with_crlf(self):
+        data = self.render_rdp().read_bytes()
+        self.assertTrue(data.startswith(b"\xff\xfe"))
+        content = data.decode("utf-16")
+        self.assertIn("server port:i:50000\r\n", content)
+        self.assertIn("username:s:CORP\\admin\r\n", content)
+        self.assertIn("connection type:i:6\r\n", content)
+        self.assertNotIn("\n", content.replace("\r\n", ""))
+
+    def test_rdp_template_overrides_the_tier(self):
+        Path(self.folder, "win.rdp").write_text("full address:s:localhost\nsession bpp:i:8\n")
+        content = self.render_rdp("fast").read_bytes().decode("utf-16")
+        self.assertIn("session bpp:i:8", content)
+        self.assertNotIn("session bpp:i:32", content)
+        self.assertIn("compression:i:1", content)
+
+    def test_utf16_template_is_read(self):
+        Path(self.folder, "win.rdp").write_text("server port:i:{local_port}\r\n", encoding="utf-16")
+        self.assertIn("server port:i:50000", self.render_rdp().read_bytes().decode("utf-16"))
+
+    def test_vnc_template_overrides_the_tier(self):
+        Path(self.folder, "tv.vnc").write_text("[connection]\nport={local_port}\n[options]\nquality=2\n")
+        target = Instance("tv", "us-east-1", "i-0123456789abcdef0", "vnc", local_port=50001)
+        config = ConfigParser()
+        config.read_string(render_profile(target, "slow", local_port=50001).read_text())
+        self.assertEqual(config["connection"]["port"], "50001")
+        self.assertEqual(config["options"]["quality"], "2")
+        self.assertEqual(config["options"]["compresslevel"], "9")
+
+    def test_unchanged_profile_is_not_rewritten(self):
+        profile = self.render_rdp()
+        os.utime(profile, (0, 0))
+        self.render_rdp()
+        self.assertEqual(profile.stat().st_mtime, 0)
+
+        self.render_rdp("slow")
+        self.assertNotEqual(profile.stat().st_mtime, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
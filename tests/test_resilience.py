@@ -0,0 +1,108 @@
+import unittest
+from unittest import mock
+
+from boto3 import Session
+
+from benchmarks.fake_aws import FakeCloud
+from summoner.lib import boto, resilience
+from summoner.lib.resilience import TokenBucket
+
+REGION = "us-east-1"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(resilience, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bursts_then_paces(self):
+        bucket = TokenBucket(10, capacity=2)
+        for _ in range(4):
+            bucket.acquire()
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.1)
+
+        # Idle time refills the bucket, up to its capacity
+        self.clock.now += 60
+        self.clock.sleeps.clear()
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_throttled_halves_the_rate(self):
+        bucket = TokenBucket(8, min_rate=1)
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 4)
+        self.assertLessEqual(bucket.tokens, 0)
+        for _ in range(5):
+            bucket.throttled()
+        self.assertEqual(bucket.rate, 1)
+
+    def test_succeeded_recovers_the_rate(self):
+        bucket = TokenBucket(20)
+        bucket.throttled()
+        bucket.succeeded()
+        self.assertEqual(bucket.rate, 11)
+        for _ in range(20):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 20)
+
+
+class Throttler:
+    """Answers the first :param:`count` requests with a Throttling error, ahead of the fake cloud."""
+
+    def __init__(self, cloud: FakeCloud, count: int):
+        self.cloud = cloud
+        self.count = count
+
+    def __call__(self, request, **_):
+        if self.count:
+            self.count -= 1
+            return self.cloud._error(request.url, "ec2", "Throttling", "Rate exceeded")
+
+
+class TestRateLimit(unittest.TestCase):
+    def setUp(self):
+        for patcher in [mock.patch.dict(boto._BUCKETS, clear=True), mock.patch.dict(boto.THROTTLE_COUNTS, clear=True)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.cloud = FakeCloud(latency=0)
+        self.boto_session = Session(aws_access_key_id="test", aws_secret_access_key="test", region_name=REGION)
+        self.boto_session._session.register("before-send", Throttler(self.cloud, 1))
+        self.cloud.attach(self.boto_session)
+
+    def test_throttling_is_counted_and_slows_the_bucket(self):
+        client = boto.rate_limit(self.boto_session.client("ec2"))
+        client.describe_instances()
+
+        bucket = boto.get_bucket("ec2", REGION)
+        self.assertEqual(boto.THROTTLE_COUNTS[("ec2", REGION)], 1)
+        # Halved by the throttle, then recovering with the retry's success
+        self.assertEqual(bucket.rate, boto.API_RATES["ec2"] / 2 + boto.API_RATES["ec2"] / 20)
+
+    def test_clients_share_a_bucket_per_service_and_region(self):
+        for _ in range(2):
+            boto.rate_limit(self.boto_session.client("ec2")).describe_instances()
+        self.assertEqual(list(boto._BUCKETS), [("ec2", REGION)])
+        # Halved by the first client's throttle, then recovered by each client's success
+        self.assertEqual(boto.get_bucket("ec2", REGION).rate, boto.API_RATES["ec2"] / 2 + boto.API_RATES["ec2"] / 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
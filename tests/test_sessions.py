@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from summoner.lib import sessions
+
+OWNER = "arn:aws:sts::123456789012:assumed-role/admin/BotoEnhanced"
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestSweepStaleSessions(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.sessions_file = Path(folder.name, "sessions.json")
+        patcher = mock.patch.object(sessions, "SESSIONS_FILE", self.sessions_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.active = []
+        self.terminated = []
+        for name, func in [
+            ("get_caller_arn", lambda _: OWNER),
+            ("get_user_sessions", lambda _, region, owner: [s for s in self.active if s["region"] == region]),
+            ("terminate_session_ids", lambda _, region, ids: self.terminated.extend(ids)),
+        ]:
+            patcher = mock.patch.object(sessions, name, side_effect=func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_registry(self, registry: dict):
+        self.sessions_file.write_text(json.dumps(registry))
+
+    def registry(self) -> dict:
+        return json.loads(self.sessions_file.read_text())
+
+    def session(self, session_id: str, region: str = "us-east-1") -> dict:
+        session = {"SessionId": session_id, "Reason": "Summoner Session", "region": region}
+        self.active.append(session)
+        return session
+
+    def entry(self, pid: int, region: str = "us-east-1", started: float | None = None) -> dict:
+        return {"region": region, "instance_id": "i-0123456789abcdef0", "pid": pid, "started": started or time.time()}
+
+    def test_terminates_only_dead_registered_sessions(self):
+        pid = dead_pid()
+        self.session("crashed")
+        self.session("running-here")
+        self.session("other-machine")
+        self.write_registry({"crashed": self.entry(pid), "running-here": self.entry(os.getpid())})
+
+        self.assertEqual(sessions.sweep_stale_sessions(None), ["crashed"])  # type: ignore
+        self.assertEqual(self.terminated, ["crashed"])
+        self.assertEqual(set(self.registry()), {"running-here"})
+
+    def test_sessions_registered_while_describing_are_kept(self):
+        pid = dead_pid()
+        self.session("crashed")
+        self.session("new")
+        self.write_registry({"crashed": self.entry(pid)})
+
+        def describe(_, region, owner):
+            # Another Summoner registers its session after the registry was first read
+            registry = self.registry()
+            registry["new"] = self.entry(os.getpid())
+            self.write_registry(registry)
+            return list(self.active)
+
+        sessions.get_user_sessions.side_effect = describe  # type: ignore
+        self.assertEqual(sessions.sweep_stale_sessions(None), ["crashed"])  # type: ignore
+        self.assertIn("new", self.registry())
+
+    def test_no_dead_sessions_costs_no_calls(self):
+        self.write_registry({"running-here": self.entry(os.getpid())})
+        self.assertEqual(sessions.sweep_stale_sessions(None), [])  # type: ignore
+        sessions.get_caller_arn.assert_not_called()  # type: ignore
+
+    def test_inactive_dead_entries_are_kept_until_too_old(self):
+        pid = dead_pid()
+        old = time.time() - sessions.SESSION_MAX_AGE - 1
+        self.write_registry({"recent": self.entry(pid), "old": self.entry(pid, started=old)})
+        sessions.sweep_stale_sessions(None)  # type: ignore
+        self.assertEqual(self.terminated, [])
+        self.assertEqual(set(self.registry()), {"recent"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from summoner.lib.instance import Instance
+from summoner.summoner import Summoner
+
+
+class FakeEvocation:
+    def __init__(self, target: Instance):
+        self.target = target
+
+    def open(self) -> bool:
+        return True
+
+
+class TestOpenSessions(unittest.TestCase):
+    def setUp(self):
+        self.summoner = Summoner.__new__(Summoner)
+        self.summoner.boto_session = None
+        self.summoner.evocations = {}
+        self.summoner._evocation = FakeEvocation  # type: ignore
+
+    @mock.patch("summoner.summoner.status_manager", return_value=True)
+    def test_sessions_get_their_own_instance(self, _):
+        instance = Instance("web", "us-east-1", "i-0123456789abcdef0", "ssh", local_port=50000)
+        self.summoner.open_sessions([instance])
+        target = self.summoner.evocations["web"].target
+        # Connecting to the Instance from the Connect menu must not share the session's port
+        self.assertIsNot(target, instance)
+        self.assertEqual((target.name, target.instance_id), (instance.name, instance.instance_id))
+        self.assertIsNone(target._local_port)
+
+
+class TestSelectMode(unittest.TestCase):
+    @mock.patch("summoner.summoner.discover_instance", return_value=None)
+    @mock.patch.object(Summoner, "_load_regions", return_value=["us-east-1"])
+    @mock.patch.object(Summoner, "main_menu")
+    def test_nothing_selected_exits(self, main_menu, *_):
+        Summoner("select", aws_profile="test", region="us-east-1")
+        main_menu.assert_not_called()
+
+
+class TestFleetModes(unittest.TestCase):
+    @mock.patch("summoner.summoner.discover_fleet", return_value=[])
+    @mock.patch.object(Summoner, "_load_regions", return_value=["us-east-1"])
+    def test_names_are_filtered_by_name_tag(self, load_regions, discover_fleet):
+        Summoner("manage", aws_profile="test", names=["web-1", "web-2"], action="stop", dry_run=True)
+        self.assertEqual(load_regions.call_args.args[2], "all")
+        self.assertIn({"Name": "tag:Name", "Values": ["web-1", "web-2"]}, discover_fleet.call_args.args[2])
+
+    @mock.patch.object(Summoner, "_load_regions")
+    def test_no_filter_or_region_is_refused(self, load_regions):
+        self.assertEqual(Summoner("manage", aws_profile="test", action="stop").exit_code, 1)
+        load_regions.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
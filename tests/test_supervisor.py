@@ -0,0 +1,28 @@
+import unittest
+
+from summoner.lib.instance import Instance
+from summoner.lib.ssm import SSMPlugin
+from summoner.lib.supervisor import TunnelSupervisor, get_supervisor
+
+
+class TestTunnelSupervisor(unittest.IsolatedAsyncioTestCase):
+    async def test_runs_again_after_shutdown(self):
+        supervisor = TunnelSupervisor(max_workers=1)
+        self.assertEqual(await supervisor.run_in_executor(sum, [1, 2]), 3)
+        await supervisor.shutdown()
+        self.assertEqual(await supervisor.run_in_executor(sum, [3, 4]), 7)
+        await supervisor.shutdown()
+
+    async def test_shared_supervisor_survives_shutdown(self):
+        await get_supervisor().shutdown()
+        self.assertEqual(await get_supervisor().run_in_executor(max, [1, 2]), 2)
+
+    async def test_stop_before_start(self):
+        target = Instance("test", "us-east-1", "i-0123456789abcdef0", "ssh", local_port=50000)
+        plugin = SSMPlugin(None, target)  # type: ignore
+        await plugin.stop_async()
+        self.assertFalse(plugin.ready_for_connection.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
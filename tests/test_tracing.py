@@ -0,0 +1,19 @@
+import unittest
+
+from summoner.lib.tracing import percentile
+
+
+class TestPercentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        self.assertEqual(percentile([1, 2], 50), 1)
+        self.assertEqual(percentile(list(range(1, 21)), 95), 19)
+        self.assertEqual(percentile([10, 20, 30, 40, 50, 60], 50), 30)
+
+    def test_bounds(self):
+        self.assertEqual(percentile([5], 50), 5)
+        self.assertEqual(percentile([1, 2, 3], 0), 1)
+        self.assertEqual(percentile([1, 2, 3], 100), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
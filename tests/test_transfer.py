@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+from types import SimpleNamespace
+
+from summoner.lib import transfer
+from summoner.lib.instance import Instance
+from summoner.lib.store import locked_json
+from summoner.lib.transfer import BLOCK_SIZE, Transfer, TransferError
+
+
+class FakeTunnel:
+    def __init__(self, port: int, dies_after: int | None = None):
+        self.target = SimpleNamespace(local_port=port)
+        self.dies_after = dies_after
+        self.copied = []
+
+    def is_ready(self) -> bool:
+        return self.dies_after is None or len(self.copied) < self.dies_after
+
+
+class TestStreams(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.state_path = Path(folder.name, "state.json")
+
+        interval, transfer.STREAM_POLL_INTERVAL = transfer.STREAM_POLL_INTERVAL, 0.01
+        self.addCleanup(setattr, transfer, "STREAM_POLL_INTERVAL", interval)
+
+        instance = Instance("web", "us-east-1", "i-0123456789abcdef0", "ssh")
+        self.transfer = Transfer(None, instance, Path("file"), "file", "upload", chunk_size=BLOCK_SIZE)  # type: ignore
+        self.transfer._copy_chunk = self.copy_chunk  # type: ignore
+
+    def copy_chunk(self, tunnel: FakeTunnel, index: int, size: int):
+        if not tunnel.is_ready():
+            raise TransferError("Connection closed.")
+        tunnel.copied.append(index)
+
+    def run_streams(self, tunnels: list, total: int) -> set:
+        chunks = Queue()
+        for index in range(total):
+            chunks.put((index, 0))
+        with ThreadPoolExecutor(max_workers=len(tunnels)) as executor:
+            for tunnel in tunnels:
+                executor.submit(self.transfer._stream, tunnel, chunks, total * BLOCK_SIZE, self.state_path, total)
+        with locked_json(self.state_path) as state:
+            return set(state.get("chunks", []))
+
+    def test_dead_tunnel_hands_its_chunks_to_the_others(self):
+        dead, live = FakeTunnel(1, dies_after=1), FakeTunnel(2)
+        self.assertEqual(self.run_streams([dead, live], 20), set(range(20)))
+        self.assertEqual(len(dead.copied), 1)
+
+    def test_every_tunnel_dead_leaves_chunks_to_resume(self):
+        self.assertEqual(self.run_streams([FakeTunnel(1, dies_after=0)], 5), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
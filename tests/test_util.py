@@ -0,0 +1,21 @@
+import unittest
+from unittest import mock
+
+from summoner import util
+
+
+class TestInstancePickers(unittest.TestCase):
+    @mock.patch.object(util, "get_fleet_status", return_value={})
+    def test_no_instances(self, _):
+        self.assertEqual(util._instance_options([], object()), [])  # type: ignore
+        self.assertEqual(util.get_instances([], object()), [])  # type: ignore
+
+    @mock.patch.object(util, "pick", return_value=("<= Back", 0))
+    @mock.patch.object(util, "get_fleet_status", return_value={})
+    def test_no_instances_offers_back(self, _, pick):
+        self.assertIsNone(util.get_instance([], object()))  # type: ignore
+        self.assertEqual(pick.call_args.args[0], ["<= Back"])
+
+
+if __name__ == "__main__":
+    unittest.main()
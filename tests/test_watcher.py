@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+
+from summoner.lib import watcher
+from summoner.lib.instance import Instance
+from summoner.lib.watcher import StateWatcher
+
+TIMEOUT = 5
+
+
+class TestStateWatcher(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance("web", "us-east-1", "i-0123456789abcdef0", "ssh", local_port=50000)
+        self.watcher = StateWatcher(None)  # type: ignore
+
+    @mock.patch.object(watcher, "get_fleet_status")
+    def test_resolves_once_state_is_reached(self, get_fleet_status):
+        get_fleet_status.return_value = {self.instance.instance_id: "running"}
+        self.assertEqual(self.watcher.watch(self.instance, "running").result(TIMEOUT), "running")
+
+    @mock.patch.object(watcher, "get_fleet_status")
+    def test_poll_error_fails_waits_and_recovers(self, get_fleet_status):
+        get_fleet_status.side_effect = RuntimeError("Could not create client")
+        with self.assertRaises(RuntimeError):
+            self.watcher.watch(self.instance, "running").result(TIMEOUT)
+
+        # The poll thread stops once its waits have failed, and a later wait starts another
+        if thread := self.watcher._thread:
+            thread.join(TIMEOUT)
+        self.assertIsNone(self.watcher._thread)
+        get_fleet_status.side_effect = None
+        get_fleet_status.return_value = {self.instance.instance_id: "stopped"}
+        self.assertEqual(self.watcher.watch(self.instance, "stopped").result(TIMEOUT), "stopped")
+
+
+if __name__ == "__main__":
+    unittest.main()